@@ -0,0 +1,140 @@
+from micropython import const
+import scheduler
+from timekeeping import (
+    RTC_ADDRESS,
+    CONTROL,
+    SQWEN,
+    ALMEN,
+    enable_square_wave,
+    seconds,
+    from_seconds,
+)
+
+# the two alarms of the mcp7940
+ALARM = const(0)  # every day at an hour & minute
+TIMER = const(1)  # once, minutes from when it was started
+
+ALM0SEC = const(0x0A)  # seconds - month of alarm 0, alarm 1 follows 7 on
+ALARM_STRIDE = const(7)
+WKDAY = const(3)  # offset of ALMxWKDAY
+ALMPOL = const(0x80)  # in ALM0WKDAY, for both alarms: the mfp rises
+ALMMSK = const(0x70)  # seconds, minutes, hours, weekday, date & month match
+ALMIF = const(0x08)
+ALMEN_SHIFT = const(4)  # ALM0EN, ALM1EN in CONTROL
+
+
+def _bcd(value):
+    return (value // 10) << 4 | value % 10
+
+
+def after(now, delay):
+    # the datetime delay seconds after now. the weekday counts on from now's,
+    # the rtc only compares it with its own register
+    start = seconds(now)
+    datetime = from_seconds(start + delay)
+    days = (start + delay) // 86400 - start // 86400
+    return datetime[:6] + ((now[6] + days) % 7, datetime[7])
+
+
+def daily(now, hour, minute):
+    # the next hour:minute:00 after now
+    start = seconds(now)
+    delay = hour * 3600 + minute * 60 - start % 86400
+    if delay <= 0:
+        delay += 86400
+    return after(now, delay)
+
+
+class Alarms:
+    # the alarm & the timer are matched by the rtc, which raises the mfp when
+    # one goes off, so nothing is compared on the pico, not even while it
+    # sleeps. both match the full date (the hardware can't ignore only the
+    # date), so the daily alarm is set again for the next day each time. the
+    # mfp is the 1 hz square wave of the timekeeping while neither is set,
+    # there is only one pin for both. the rtc battery keeps the registers.
+    def __init__(self, i2c, mfp, clock):
+        self._i2c = i2c
+        self._mfp = mfp
+        self._clock = clock  # timekeeping.RTCClock, follows the square wave
+        self.enabled = 0  # bit per alarm set in the rtc
+        self.pending = False  # the mfp rose, not taken yet
+        self._flag = scheduler.Flag()
+        self._registers = bytearray(6)  # seconds - month of an alarm
+        self._byte = bytearray(1)
+
+    def _on_alarm(self, pin):
+        self.pending = True
+        self._flag.set()
+
+    def _read(self, register):
+        self._i2c.readfrom_mem_into(RTC_ADDRESS, register, self._byte)
+        return self._byte[0]
+
+    def _write(self, register, value):
+        self._byte[0] = value
+        self._i2c.writeto_mem(RTC_ADDRESS, register, self._byte)
+
+    def start(self):
+        # take over the alarms the rtc kept, returns the bits of the ones that
+        # went off while the pico wasn't running, like take()
+        self.enabled = (self._read(CONTROL) & ALMEN) >> ALMEN_SHIFT
+        weekday = self._read(ALM0SEC + WKDAY)
+        if not weekday & ALMPOL:
+            self._write(ALM0SEC + WKDAY, weekday | ALMPOL)
+        self._route()
+        return self.take()
+
+    def _route(self):
+        # the alarm output on the mfp while an alarm is set, else the square wave
+        if self.enabled:
+            self._clock.square_wave(False)
+            control = self._read(CONTROL) & ~(SQWEN | ALMEN) & 0xFF
+            self._write(CONTROL, control | self.enabled << ALMEN_SHIFT)
+            self._mfp.irq(self._on_alarm, self._mfp.IRQ_RISING)
+        else:
+            enable_square_wave(self._i2c)
+            self._clock.square_wave(True)
+
+    def set(self, alarm, datetime):
+        # go off at datetime, the year doesn't matter
+        registers = self._registers
+        registers[0] = _bcd(datetime[5])
+        registers[1] = _bcd(datetime[4])
+        registers[2] = _bcd(datetime[3])  # 24 hour
+        # clears the flag
+        registers[3] = ALMPOL | ALMMSK | (datetime[6] + 1)
+        registers[4] = _bcd(datetime[2])
+        registers[5] = _bcd(datetime[1])
+        self._i2c.writeto_mem(RTC_ADDRESS, ALM0SEC + alarm * ALARM_STRIDE, registers)
+        self.enabled |= 1 << alarm
+        self._route()
+
+    def cancel(self, alarm):
+        if self.enabled & 1 << alarm:
+            self.enabled &= ~(1 << alarm)
+            self._route()
+
+    def take(self):
+        # returns a bit per alarm that went off, those are no longer set
+        self.pending = False
+        fired = 0
+        for alarm in (ALARM, TIMER):
+            if not self.enabled & 1 << alarm:
+                continue
+            register = ALM0SEC + alarm * ALARM_STRIDE + WKDAY
+            weekday = self._read(register)
+            if weekday & ALMIF:
+                self._write(register, weekday & ~ALMIF)
+                fired |= 1 << alarm
+        if fired:
+            self.enabled &= ~fired
+            self._route()
+        return fired
+
+    async def run(self, handler):
+        # handler(fired) when the mfp rises
+        while True:
+            await self._flag.wait()
+            fired = self.take()
+            if fired:
+                handler(fired)
@@ -0,0 +1,209 @@
+from array import array
+from micropython import const
+import font
+
+# transitions
+NONE = const(0)
+FADE = const(1)
+ROLL = const(2)
+
+MAX_FRAMES = const(2)  # distinct frames per animation
+MAX_SCANS = const(128)  # scans (all digits once) per animation
+FADE_SCANS = const(24)  # ~220 ms at 1000 digit slots per second
+ROLL_SCANS = const(4)  # per step of a roll
+BLINK_SCANS = const(50)  # on, then off
+
+_A = font.SEGMENTS["A"]
+_B = font.SEGMENTS["B"]
+_C = font.SEGMENTS["C"]
+_D = font.SEGMENTS["D"]
+_E = font.SEGMENTS["E"]
+_F = font.SEGMENTS["F"]
+_G = font.SEGMENTS["G"]
+
+
+def _up(word):
+    # the glyph moved up a row, its top row falls off
+    return (
+        (_A if word & _G else 0)
+        | (_G if word & _D else 0)
+        | (_F if word & _E else 0)
+        | (_B if word & _C else 0)
+    )
+
+
+def _down(word):
+    # the glyph moved down a row, its bottom row falls off
+    return (
+        (_G if word & _A else 0)
+        | (_D if word & _G else 0)
+        | (_E if word & _F else 0)
+        | (_C if word & _B else 0)
+    )
+
+
+class Player:
+    # plays transitions on the refresh core. an animation is precomputed on
+    # the main core into encoded frames and a schedule of which frame every
+    # scan shows, so the refresh core only steps an index once per scan.
+    # there are two animation slots: the main core builds into the one that
+    # isn't playing and requests it with a counter only it writes, the
+    # refresh core takes it at the next scan and acknowledges with a counter
+    # only it writes. when an animation ends, the frame buffer shows again.
+    # (a second request within the same scan may show a frame while it is
+    # built, for that scan.) the durations are in scans at 1000 digit slots
+    # per second, at faster refresh rates every scan repeats `repeat` times.
+    def __init__(self, frame, repeat=1):
+        self._frame = frame
+        self._repeat = repeat
+        self._buffers = tuple(
+            tuple(frame.buffer() for _ in range(MAX_FRAMES)) for _ in range(2)
+        )
+        self._views = tuple(
+            tuple(frame.slot_views(buffer) for buffer in buffers)
+            for buffers in self._buffers
+        )
+        self._schedules = (bytearray(MAX_SCANS), bytearray(MAX_SCANS))
+        self._lengths = array("H", [0, 0])
+        self._loops = bytearray(2)
+        self._last = array("I", [0] * frame.digits)  # codes shown last
+
+        # main core
+        self._back = 0  # slot to build into
+        self._next = -1  # slot requested, -1 to stop
+        self._requested = 0
+        # refresh core
+        self._seen = 0
+        self._slot = -1  # playing, -1 for the frame buffer
+        self._step = 0
+        self._scan = 0  # repeats of the step
+        self.playing = False
+
+    # refresh core, or the interrupt of the pio refresh
+
+    def _advance(self):
+        # called after every scan
+        if self._seen != self._requested:
+            self._seen = self._requested
+            self._slot = self._next
+            self._step = 0
+            self._scan = 0
+        elif self._slot >= 0:
+            self._scan += 1
+            if self._scan < self._repeat:
+                return
+            self._scan = 0
+            self._step += 1
+            if self._step >= self._lengths[self._slot]:
+                if self._loops[self._slot]:
+                    self._step = 0
+                else:
+                    self._slot = -1
+        self.playing = self._slot >= 0
+
+    def next(self):
+        # the slot views of the next scan
+        self._advance()
+        slot = self._slot
+        if slot < 0:
+            frame = self._frame
+            return frame.views[frame.front]
+        return self._views[slot][self._schedules[slot][self._step]]
+
+    def next_buffer(self):
+        # the slots of the next scan, a frame.stride apart
+        self._advance()
+        slot = self._slot
+        if slot < 0:
+            frame = self._frame
+            return frame.buffers[frame.front]
+        return self._buffers[slot][self._schedules[slot][self._step]]
+
+    # main core
+
+    def _encode(self, slot, frame, index, code):
+        self._frame.encode(self._buffers[slot][frame], index, code)
+
+    def _start(self, slot, length, loop):
+        self._lengths[slot] = length
+        self._loops[slot] = loop
+        self._next = slot
+        self._requested += 1
+        self._back = slot ^ 1
+
+    def show(self, codes):
+        # no transition, stop whatever plays
+        for index in range(len(self._last)):
+            self._last[index] = codes[index]
+        self.stop()
+
+    def stop(self):
+        self._next = -1
+        self._requested += 1
+
+    def clear(self):
+        # the next transition starts from a dark display
+        for index in range(len(self._last)):
+            self._last[index] = 0
+
+    def fade(self, codes):
+        # cross-fade by showing the new frame in more and more of the scans
+        slot = self._back
+        last = self._last
+        for index in range(len(last)):
+            new = codes[index]
+            self._encode(slot, 0, index, last[index])
+            self._encode(slot, 1, index, new)
+            last[index] = new
+        # spread the scans of the new frame evenly, like bresenham. the first
+        # scan already shows it, so a switch shows at once
+        schedule = self._schedules[slot]
+        error = FADE_SCANS + 1
+        for scan in range(FADE_SCANS):
+            error += scan + 1
+            if error >= FADE_SCANS + 1:
+                error -= FADE_SCANS + 1
+                schedule[scan] = 1
+            else:
+                schedule[scan] = 0
+        self._start(slot, FADE_SCANS, False)
+
+    def roll(self, codes):
+        # the digits that change roll up like a slot machine, the old glyph
+        # moves out at the top as the new one comes in from the bottom
+        slot = self._back
+        last = self._last
+        changed = False
+        for index in range(len(last)):
+            old = last[index]
+            new = codes[index]
+            if new != old:
+                changed = True
+                dot = new & font.DOT
+                self._encode(slot, 0, index, dot | _up(old) | _down(_down(new)))
+                self._encode(slot, 1, index, dot | _up(_up(old)) | _down(new))
+                last[index] = new
+            else:
+                self._encode(slot, 0, index, new)
+                self._encode(slot, 1, index, new)
+        if not changed:
+            self.stop()
+            return
+        schedule = self._schedules[slot]
+        for scan in range(2 * ROLL_SCANS):
+            schedule[scan] = scan // ROLL_SCANS
+        self._start(slot, 2 * ROLL_SCANS, False)
+
+    def blink(self, codes, digits):
+        # the digits in the bit mask blink, starting lit, until stopped
+        slot = self._back
+        last = self._last
+        for index in range(len(last)):
+            new = codes[index]
+            self._encode(slot, 0, index, new)
+            self._encode(slot, 1, index, 0 if digits & (1 << index) else new)
+            last[index] = new
+        schedule = self._schedules[slot]
+        for scan in range(2 * BLINK_SCANS):
+            schedule[scan] = scan // BLINK_SCANS
+        self._start(slot, 2 * BLINK_SCANS, True)
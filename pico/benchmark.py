@@ -0,0 +1,167 @@
+import gc
+from array import array
+from micropython import const
+from scheduler import ticks_us, ticks_add, ticks_diff
+from animation import Player
+from mcp7940 import MCP7940
+from switches import Switches, DEBOUNCE
+from formatter import time_to_display, date_to_display
+from framebuffer import FrameBuffer
+from timekeeping import RTCReader, validate_datetime
+
+# times the display & time hot paths on the pico, compare the output with
+# tools/benchmark.py. the same cases run there on cpython
+
+ITERATIONS = const(1000)  # calls per case
+
+# a second of the time, the dates
+TIMES = ((2024, 2, 29, 23, 59, 58, 3, 60), (2024, 2, 29, 23, 59, 59, 3, 60))
+DATES = ((2024, 2, 31, 12, 0, 0, 5, 62), (2023, 13, 31, 12, 0, 0, 5, 62))
+
+
+class _Pin:
+    # a released switch, its edges are injected with Switches.edge
+    IRQ_FALLING = 1
+    IRQ_RISING = 2
+
+    def value(self):
+        return 1
+
+    def irq(self, handler, trigger):
+        pass
+
+
+class _I2C:
+    # an mcp7940 whose time registers change when `tick` is called
+    def __init__(self):
+        self.registers = bytearray(0x20)
+        self.registers[0:7] = b"\x58\x59\x23\x05\x29\x02\x24"
+
+    def tick(self):
+        self.registers[0] ^= 0x01
+
+    def readfrom_mem(self, address, register, nbytes):
+        return bytes(self.registers[register : register + nbytes])
+
+    def readfrom_mem_into(self, address, register, buffer):
+        registers = self.registers
+        for index in range(len(buffer)):
+            buffer[index] = registers[register + index]
+
+    def writeto_mem(self, address, register, buffer):
+        self.registers[register : register + len(buffer)] = buffer
+
+
+def _alternate(function, arguments):
+    # calls function with the arguments in turn, like second after second
+    state = [0]
+
+    def call():
+        index = state[0] ^ 1
+        state[0] = index
+        function(*arguments[index])
+
+    return call
+
+
+def _ignore(switch, event):
+    pass
+
+
+def cases():
+    # (name, function) of every case, set up for calling
+    codes = [0] * 9
+    frame = FrameBuffer()
+    player = Player(frame)
+    frames = (
+        time_to_display(TIMES[0], [0] * 9),
+        time_to_display(TIMES[1], [0] * 9),
+    )
+
+    i2c = _I2C()
+    mcp = MCP7940(i2c, battery_enabled=False)
+    reader = RTCReader(i2c)
+
+    def new_second():
+        i2c.tick()
+        return reader.read()
+
+    switches = Switches((_Pin(), _Pin(), _Pin()))
+    toggled = array("i", [0, 1])  # ticks & level of the last edge of switch 0
+
+    def press_or_release():
+        # an edge of switch 0 from the interrupt, polled once it settled
+        ticks = ticks_add(toggled[0], 2 * DEBOUNCE)
+        level = toggled[1] ^ 1
+        toggled[0] = ticks
+        toggled[1] = level
+        switches.edge(0, level, ticks)
+        switches.poll(_ignore, ticks_add(ticks, DEBOUNCE))
+
+    times = tuple((datetime, codes) for datetime in TIMES)
+    dates = tuple((datetime, codes) for datetime in DATES)
+    return (
+        ("time_to_display", _alternate(time_to_display, times)),
+        ("date_to_display", _alternate(date_to_display, dates)),
+        (
+            "validate_datetime",
+            _alternate(validate_datetime, ((DATES[0],), (DATES[1],))),
+        ),
+        ("FrameBuffer.show", _alternate(frame.show, ((frames[0],), (frames[1],)))),
+        ("Player.roll", _alternate(player.roll, ((frames[0],), (frames[1],)))),
+        ("MCP7940.time", lambda: mcp.time),
+        ("RTCReader.read", reader.read),
+        ("RTCReader.read new second", new_second),
+        ("RTCReader.probe", reader.probe),
+        ("Switches.poll", lambda: switches.poll(_ignore, toggled[0])),
+        ("Switches.edge & poll", press_or_release),
+    )
+
+
+def measure(function, iterations=ITERATIONS):
+    # ns & bytes allocated per call, without the cost of the loop
+    gc.collect()
+    gc.disable()
+    try:
+        allocated = gc.mem_alloc()
+        start = ticks_us()
+        for _ in range(iterations):
+            function()
+        us = ticks_diff(ticks_us(), start)
+        allocated = gc.mem_alloc() - allocated
+        start = ticks_us()
+        for _ in range(iterations):
+            _nothing()
+        us -= ticks_diff(ticks_us(), start)
+    finally:
+        gc.enable()
+    return max(0, us) * 1000 // iterations, allocated // iterations
+
+
+def _nothing():
+    pass
+
+
+def run(measure=measure):
+    # {name: (ns, bytes)} per call
+    results = {}
+    for name, function in cases():
+        results[name] = measure(function)
+    return results
+
+
+def report(results, platform):
+    lines = ["benchmark on " + platform]
+    for name, (ns, allocated) in results.items():
+        lines.append("{:<28}{:>10} ns/op{:>8} B/op".format(name, ns, allocated))
+    return "\n".join(lines)
+
+
+if __name__ == "__main__":
+    import json
+    import sys
+
+    results = run()
+    print(report(results, sys.implementation.name))
+    # for tools/benchmark.py --report
+    print(json.dumps({"platform": sys.implementation.name, "results": results}))
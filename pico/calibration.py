@@ -0,0 +1,127 @@
+import time
+from array import array
+from micropython import const
+from scheduler import ticks_ms, ticks_us, ticks_add, ticks_diff
+from timekeeping import RTC_ADDRESS, CONTROL, SQWEN, SQWFS, ALMEN
+
+CRSTRIM = const(0x04)  # control register, coarse trim mode (64 hz on the mfp)
+OSCTRIM = const(0x08)
+
+MAX_TRIM = const(127)
+STEP_PPM = 2 / (32768 * 60) * 1000000  # 2 clocks per minute per trim step
+COARSE_PPM = 2 * 128 / 32768 * 1000000  # the same step in coarse trim mode
+
+MAX_EDGES = const(128)
+
+
+def set_control(i2c, square_wave, coarse):
+    # mfp as 1 hz square wave (64 hz in coarse trim mode), alarms off
+    control = i2c.readfrom_mem(RTC_ADDRESS, CONTROL, 1)[0]
+    control &= ~(SQWEN | SQWFS | ALMEN | CRSTRIM) & 0xFF
+    if square_wave:
+        control |= SQWEN
+    if coarse:
+        control |= CRSTRIM
+    i2c.writeto_mem(RTC_ADDRESS, CONTROL, bytes((control,)))
+
+
+def write_trim(i2c, trim):
+    # positive adds clocks (for a slow crystal), negative subtracts
+    value = min(abs(trim), MAX_TRIM) | (0x80 if trim > 0 else 0)
+    i2c.writeto_mem(RTC_ADDRESS, OSCTRIM, bytes((value,)))
+
+
+def trim_for(ppm):
+    # trim that cancels a crystal running ppm too fast
+    trim = -round(ppm / STEP_PPM)
+    return max(-MAX_TRIM, min(MAX_TRIM, trim))
+
+
+def fit(ticks, count, period_us):
+    # least squares line through the edge times, returns the ppm the edges
+    # come too often compared to period_us and the standard error of that.
+    # kept in integers until the end, floats are single precision on the pico
+    if count < 3:
+        return None
+    first = ticks[0]
+    sum_x = sum_y = sum_xx = sum_xy = sum_yy = 0
+    for x in range(count):
+        # deviation from the nominal edge time
+        y = ticks_diff(ticks[x], first) - x * period_us
+        sum_x += x
+        sum_y += y
+        sum_xx += x * x
+        sum_xy += x * y
+        sum_yy += y * y
+    sxx = count * sum_xx - sum_x * sum_x
+    sxy = count * sum_xy - sum_x * sum_y
+    syy = count * sum_yy - sum_y * sum_y
+    slope = sxy / sxx  # us per edge the period is too long
+    residual = max(0, syy - slope * sxy) / (count * (count - 2))
+    error = (residual * count / sxx) ** 0.5
+    period = period_us + slope
+    return -slope / period * 1000000, error / period * 1000000
+
+
+class EdgeTimer:
+    # timestamps the rising edges of a pin (the mfp) from its interrupt
+    def __init__(self, pin):
+        self._pin = pin
+        self.ticks = array("i", [0] * MAX_EDGES)
+        self.count = 0
+
+    def _on_edge(self, pin):
+        if self.count < MAX_EDGES:
+            self.ticks[self.count] = ticks_us()
+            self.count += 1
+
+    def start(self):
+        self.count = 0
+        self._pin.irq(self._on_edge, self._pin.IRQ_RISING)
+
+    def stop(self):
+        self._pin.irq(None)
+
+    def measure(self, period_us, edges):
+        # ppm & standard error over the given number of edges
+        self.start()
+        timeout = ticks_add(ticks_ms(), (edges + 2) * period_us // 1000)
+        while self.count < edges and ticks_diff(timeout, ticks_ms()) > 0:
+            time.sleep_ms(period_us // 2000 or 1)
+        self.stop()
+        return fit(self.ticks, self.count, period_us)
+
+
+def calibrate(i2c, mfp, target_ppm=0.2, max_seconds=120, log=print):
+    # returns the trim for the crystal, measured without trim on the 1 hz
+    # square wave until the estimate is within target_ppm, then checked in
+    # coarse trim mode where the trim shows up 7680 times larger
+    timer = EdgeTimer(mfp)
+    write_trim(i2c, 0)
+    set_control(i2c, True, False)
+
+    edges = 8
+    while True:
+        result = timer.measure(1000000, edges)
+        if result is None:
+            raise OSError("no square wave on the mfp pin")
+        ppm, error = result
+        log("{} s: {:.2f} ppm +- {:.2f}".format(edges - 1, ppm, error))
+        if error <= target_ppm or edges * 2 > min(MAX_EDGES, max_seconds):
+            break
+        edges *= 2
+
+    trim = trim_for(ppm)
+
+    # check the trim register does what it should
+    write_trim(i2c, trim)
+    set_control(i2c, True, True)
+    result = timer.measure(1000000 // 64, 64)
+    set_control(i2c, False, False)
+    if result is None:
+        raise OSError("no coarse trim square wave on the mfp pin")
+    expected = ((1 + ppm / 1000000) * (1 + trim * COARSE_PPM / 1000000) - 1) * 1000000
+    log("trim {}: coarse {:.0f} ppm, expected {:.0f}".format(trim, result[0], expected))
+    if abs(result[0] - expected) > COARSE_PPM / 2:
+        raise OSError("the trim didn't take effect")
+    return trim
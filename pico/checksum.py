@@ -0,0 +1,25 @@
+from array import array
+
+
+def _table():
+    table = array("H", [0] * 256)
+    for byte in range(256):
+        crc = byte << 8
+        for _ in range(8):
+            crc = ((crc << 1) ^ 0x1021 if crc & 0x8000 else crc << 1) & 0xFFFF
+        table[byte] = crc
+    return table
+
+
+_TABLE = _table()
+
+
+def crc16(data, start=0, end=None):
+    # crc-16/ccitt-false, catches torn writes (erased flash reads as 0xff)
+    if end is None:
+        end = len(data)
+    crc = 0xFFFF
+    table = _TABLE
+    for index in range(start, end):
+        crc = ((crc << 8) & 0xFFFF) ^ table[(crc >> 8) ^ data[index]]
+    return crc
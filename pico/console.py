@@ -0,0 +1,64 @@
+import sys
+import select
+import time
+from micropython import const
+import scheduler
+
+POLL_INTERVAL = const(100)  # ms between checks for input
+BUSY_POLL = const(1)  # ms between checks for a while after some input, so a
+BUSY_TIME = const(2000)  # line is taken right away during a time sync
+MAX_LINE = const(80)
+
+try:
+    # cpython, without the read-ahead that would hide input from poll
+    _input = sys.stdin.buffer.raw
+except AttributeError:
+    _input = sys.stdin.buffer
+
+_commands = {}
+
+
+def command(name, function):
+    # function(*arguments) returns the text to print, or None
+    _commands[name] = function
+
+
+def execute(line):
+    words = line.split()
+    if not words:
+        return
+    function = _commands.get(words[0])
+    if function is None:
+        print("commands:", " ".join(sorted(_commands)))
+        return
+    try:
+        result = function(*words[1:])
+    except Exception as ex:
+        print("error:", ex)
+        return
+    if result is not None:
+        print(result)
+
+
+async def run():
+    # read commands from the usb serial without blocking the other tasks
+    poller = select.poll()
+    poller.register(_input, select.POLLIN)
+    line = bytearray()
+    last_input = time.ticks_add(time.ticks_ms(), -BUSY_TIME)
+    while True:
+        while poller.poll(0):
+            last_input = time.ticks_ms()
+            char = _input.read(1)
+            if not char:
+                # input closed
+                return
+            if char in b"\r\n":
+                execute(line.decode())
+                line = bytearray()
+            elif len(line) < MAX_LINE:
+                line.extend(char)
+        if time.ticks_diff(time.ticks_ms(), last_input) < BUSY_TIME:
+            await scheduler.sleep_ms(BUSY_POLL)
+        else:
+            await scheduler.sleep_ms(POLL_INTERVAL)
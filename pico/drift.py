@@ -0,0 +1,135 @@
+from micropython import const
+from calibration import STEP_PPM, MAX_TRIM, trim_for
+
+# reference sources, a better one shuts out a worse one for HOLD seconds
+PICO = const(0)  # the crystal of the pico, through ticks_ms
+SERIAL = const(1)  # time sent over the usb serial
+
+FORGETTING = 0.995  # weight of the older samples per new one, ~200 samples
+NOISE_WEIGHT = 0.0625  # of a new sample in the noise estimate
+PRIOR_PPM = 100  # rate uncertainty before the first samples
+OUTLIER = const(2000)  # ms a sample may be off before the offset is found again
+MIN_SPAN = const(6 * 3600)  # s of samples before the trim changes, and between
+MAX_TRIM_STEP = const(4)  # trim steps per change
+HYSTERESIS = 0.75  # trim steps the rate may be off before it is trimmed
+HOLD = const(2 * 86400)  # s a serial reference keeps the pico one out
+
+
+class DriftEstimator:
+    # recursive least squares fit of the offset and rate between the rtc and a
+    # reference, in constant memory. the offset is kept at the latest sample
+    # (not at the first one), so the numbers stay small enough for the single
+    # precision floats of the pico however long it runs. a trim change moves
+    # the rate by a known amount, so the fit carries on across it.
+    def __init__(self, trim):
+        self.trim = trim
+        self.source = None
+        self.outliers = 0
+        self._reset()
+
+    def _reset(self):
+        self.ppm = 0.0  # rtc too fast, with the current trim
+        self.samples = 0
+        self.span = 0  # s of samples
+        self._since_change = 0  # s
+        self._noise = 1.0  # ms², innovation variance
+        # covariance of offset (ms) & rate (ppm), in units of the noise
+        self._p00 = 1.0
+        self._p01 = 0.0
+        self._p11 = float(PRIOR_PPM * PRIOR_PPM)
+        self._anchored = False
+
+    def restart(self):
+        # the rtc was set (or not followed for a while), keep the rate but
+        # find the offset again
+        self._anchored = False
+
+    def stderr(self):
+        # standard error of the rate, in ppm
+        return (self._p11 * self._noise) ** 0.5
+
+    def add(self, source, reference_ms, rtc_ms):
+        # one sample of both clocks at the same moment. returns the trim to
+        # set, or None to keep it
+        if source != self.source:
+            if (
+                self.source is not None
+                and source < self.source
+                and rtc_ms - self._rtc_ms < HOLD * 1000
+            ):
+                return None
+            # another reference has another rate
+            self.source = source
+            self._reset()
+        y = rtc_ms - reference_ms
+        self.samples += 1
+
+        if not self._anchored:
+            self._anchored = True
+            self._base = y  # int, the offset is relative to it
+            self._offset = 0.0
+            self._p00 = 1.0
+            self._p01 = 0.0
+            self._reference = reference_ms
+            self._rtc_ms = rtc_ms
+            return None
+
+        # move the fit to this sample
+        seconds = (reference_ms - self._reference) / 1000
+        self._reference = reference_ms
+        self._rtc_ms = rtc_ms
+        step = seconds / 1000  # ms of offset per ppm
+        self._offset += self.ppm * step
+        self._p00 += step * (2 * self._p01 + step * self._p11)
+        self._p01 += step * self._p11
+
+        # correct it
+        error = (y - self._base) - self._offset
+        gain = FORGETTING + self._p00
+        if error * error > 25 * gain * self._noise and abs(error) > OUTLIER:
+            # the time jumped
+            self.outliers += 1
+            self._anchored = False
+            return None
+        k0 = self._p00 / gain
+        k1 = self._p01 / gain
+        self._offset += k0 * error
+        self.ppm += k1 * error
+        self._p11 = (self._p11 - k1 * self._p01) / FORGETTING
+        self._p01 = (self._p01 - k0 * self._p01) / FORGETTING
+        self._p00 = (self._p00 - k0 * self._p00) / FORGETTING
+        self._noise += (error * error / gain - self._noise) * NOISE_WEIGHT
+
+        # keep the offset small
+        whole = int(self._offset)
+        self._base += whole
+        self._offset -= whole
+
+        self.span += seconds
+        self._since_change += seconds
+        return self._trim()
+
+    def _trim(self):
+        if self.span < MIN_SPAN or self._since_change < MIN_SPAN:
+            return None
+        if abs(self.ppm) < HYSTERESIS * STEP_PPM or self.stderr() > STEP_PPM / 4:
+            return None
+        change = max(-MAX_TRIM_STEP, min(MAX_TRIM_STEP, trim_for(self.ppm)))
+        trim = max(-MAX_TRIM, min(MAX_TRIM, self.trim + change))
+        if trim == self.trim:
+            return None
+        # positive trim makes the rtc faster
+        self.ppm += (trim - self.trim) * STEP_PPM
+        self.trim = trim
+        self._since_change = 0
+        return trim
+
+    def report(self):
+        return "%.2f ppm +- %.2f at trim %d, %d samples over %d h (%s)" % (
+            self.ppm,
+            self.stderr(),
+            self.trim,
+            self.samples,
+            self.span // 3600,
+            ("pico", "serial")[self.source] if self.source is not None else "none",
+        )
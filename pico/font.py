@@ -0,0 +1,110 @@
+from micropython import const
+from array import array
+
+# MAX6921 outputs driving the grids (d0 - d8)
+GRIDS = (
+    const(1 << 7),
+    const(1 << 0),
+    const(1 << 6),
+    const(1 << 1),
+    const(1 << 5),
+    const(1 << 2),
+    const(1 << 3),
+    const(1 << 4),
+    const(1 << 8),
+)
+
+# MAX6921 outputs driving the segments
+SEGMENTS = {
+    "A": const(1 << 9),
+    "B": const(1 << 11),
+    "C": const(1 << 14),
+    "D": const(1 << 15),
+    "E": const(1 << 13),
+    "F": const(1 << 12),
+    "G": const(1 << 10),
+    "P": const(1 << 16),
+}
+
+DOT = const(1 << 16)
+BLANK = const(0)
+
+# segments lit for each glyph
+#
+#    AAA
+#   F   B
+#    GGG
+#   E   C
+#    DDD  P
+GLYPHS = {
+    " ": "",
+    "-": "G",
+    "_": "D",
+    "=": "DG",
+    ".": "P",
+    "°": "ABFG",
+    "0": "ABCDEF",
+    "1": "BC",
+    "2": "ABDEG",
+    "3": "ABCDG",
+    "4": "BCFG",
+    "5": "ACDFG",
+    "6": "ACDEFG",
+    "7": "ABC",
+    "8": "ABCDEFG",
+    "9": "ABCDFG",
+    "A": "ABCEFG",
+    "b": "CDEFG",
+    "C": "ADEF",
+    "c": "DEG",
+    "d": "BCDEG",
+    "E": "ADEFG",
+    "F": "AEFG",
+    "G": "ACDEF",
+    "H": "BCEFG",
+    "h": "CEFG",
+    "I": "EF",
+    "J": "BCDE",
+    "L": "DEF",
+    "n": "CEG",
+    "o": "CDEG",
+    "P": "ABEFG",
+    "q": "ABCFG",
+    "r": "EG",
+    "S": "ACDFG",
+    "t": "DEFG",
+    "U": "BCDEF",
+    "u": "CDE",
+    "y": "BCDFG",
+}
+
+# flat lookup from character code to segment bitmask (latin-1 range)
+_TABLE = array("I", [0] * 256)
+
+
+def add_glyph(character, segments):
+    mask = 0
+    for segment in segments:
+        mask |= SEGMENTS[segment]
+    _TABLE[ord(character)] = mask
+
+
+def _compile():
+    for character, segments in GLYPHS.items():
+        add_glyph(character, segments)
+
+    # letters only defined in one case fall back to the other one
+    for character in GLYPHS:
+        code = ord(character)
+        if 0x41 <= code <= 0x5A and not _TABLE[code + 0x20]:
+            _TABLE[code + 0x20] = _TABLE[code]
+        elif 0x61 <= code <= 0x7A and not _TABLE[code - 0x20]:
+            _TABLE[code - 0x20] = _TABLE[code]
+
+
+_compile()
+
+
+def glyph(character):
+    code = ord(character)
+    return _TABLE[code] if code < 256 else BLANK
@@ -0,0 +1,71 @@
+import font
+
+# segment masks for the ones & tens digit of 00 - 99. tuples instead of arrays,
+# so looking a mask up never creates a new int object
+ONES = tuple(font.glyph(str(n % 10)) for n in range(100))
+TENS = tuple(font.glyph(str(n // 10)) for n in range(100))
+ONES_DOT = tuple(mask | font.DOT for mask in ONES)
+DASH = font.glyph("-")
+DASH_DOT = DASH | font.DOT
+
+
+def time_to_display(datetime, codes, d8=font.BLANK):
+    # hh-mm-ss, right to left
+    hour = datetime[3]
+    minute = datetime[4]
+    second = datetime[5]
+
+    if second is None:
+        codes[0] = DASH
+        codes[1] = DASH
+    else:
+        codes[0] = ONES[second]
+        codes[1] = TENS[second]
+    codes[2] = DASH
+    if minute is None:
+        codes[3] = DASH
+        codes[4] = DASH
+    else:
+        codes[3] = ONES[minute]
+        codes[4] = TENS[minute]
+    codes[5] = DASH
+    if hour is None:
+        codes[6] = DASH
+        codes[7] = DASH
+    else:
+        codes[6] = ONES[hour]
+        codes[7] = TENS[hour]
+    codes[8] = d8
+    return codes
+
+
+def date_to_display(datetime, codes, d8=font.BLANK):
+    # dd.mm.yyyy, right to left
+    year = datetime[0]
+    month = datetime[1]
+    date = datetime[2]
+
+    if year is None:
+        codes[0] = DASH
+        codes[1] = DASH
+        codes[2] = DASH
+        codes[3] = DASH
+    else:
+        codes[0] = ONES[year % 100]
+        codes[1] = TENS[year % 100]
+        codes[2] = ONES[year // 100]
+        codes[3] = TENS[year // 100]
+    if month is None:
+        codes[4] = DASH_DOT
+        codes[5] = DASH
+    else:
+        codes[4] = ONES_DOT[month]
+        codes[5] = TENS[month]
+    if date is None:
+        codes[6] = DASH_DOT
+        codes[7] = DASH
+    else:
+        codes[6] = ONES_DOT[date]
+        codes[7] = TENS[date]
+    codes[8] = d8
+    return codes
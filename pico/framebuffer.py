@@ -0,0 +1,146 @@
+from array import array
+from micropython import const
+import font
+
+CHIP_BITS = const(20)  # outputs of a MAX6921
+
+
+class FrameBuffer:
+    # the main core encodes into the back buffer and publishes it by flipping
+    # the front index (a single store, so no lock is needed). the refresh
+    # core only ever reads the front buffer through the preallocated slices.
+    # only words that differ from the last ones written are encoded, and the
+    # back buffer catches up on the slots it missed right before it is
+    # written again, so the refresh core is long done with it by then.
+    #
+    # chips are the daisy chained MAX6921s, nearest to the pico first, as
+    # (grid outputs of its digits, segment outputs like font.SEGMENTS or None
+    # if wired the same), see layout.py. the digits of all chips are numbered
+    # on from the first chip's. in every slot each chip lights the digit with
+    # that slot's index, so a scan takes as many slots as the longest tube
+    # has digits, however many chips there are. a slot is the words of all
+    # chips as one big endian number, the nearest chip in the lowest bits,
+    # padded at the front to whole 32 bit words for the dma of pio_refresh.py.
+    def __init__(self, chips=((font.GRIDS, None),)):
+        self.chips = len(chips)
+        self.slots = max(len(grids) for grids, _ in chips)
+        self.slot_bytes = (self.chips * CHIP_BITS + 7) // 8
+        self.stride = (self.slot_bytes + 3) // 4 * 4
+        grids = []
+        segments = []
+        fields = []  # bit offset in its slot per digit
+        slots = []
+        for chip, (chip_grids, chip_segments) in enumerate(chips):
+            for slot, grid in enumerate(chip_grids):
+                grids.append(grid)
+                segments.append(_segment_map(chip_segments))
+                fields.append(chip * CHIP_BITS)
+                slots.append(slot)
+        self.digits = len(grids)
+        self._grids = array("I", grids)
+        self._segments = tuple(segments)
+        self._fields = array("H", fields)
+        self._slots = bytes(slots)
+        self.buffers = (self.buffer(), self.buffer())
+        self.views = tuple(self.slot_views(buffer) for buffer in self.buffers)
+        self.front = 0
+        self._codes = array("I", [0] * self.digits)  # latest code per digit
+        self._dirty = 0  # slots written since the last publish
+        self._stale = 0  # slots the back buffer is behind on
+        # every digit blank, with its grid
+        for buffer in self.buffers:
+            for index in range(self.digits):
+                self.encode(buffer, index, 0)
+
+    def buffer(self):
+        # a frame of all slots, for this chain
+        return bytearray(self.slots * self.stride)
+
+    def slot_views(self, buffer):
+        # the bytes sent for every slot, without the padding
+        stride = self.stride
+        start = stride - self.slot_bytes
+        return tuple(
+            memoryview(buffer)[slot * stride + start : (slot + 1) * stride]
+            for slot in range(self.slots)
+        )
+
+    def encode(self, buffer, index, code):
+        # set the word of a digit, its grid & the segments in code, in buffer
+        word = self._grids[index]
+        segments = self._segments[index]
+        if segments is None:
+            word |= code
+        else:
+            for segment, output in segments:
+                if code & segment:
+                    word |= output
+        field = self._fields[index]
+        shift = field & 7
+        word <<= shift
+        mask = ((1 << CHIP_BITS) - 1) << shift
+        offset = (self._slots[index] + 1) * self.stride - 1 - (field >> 3)
+        for _ in range(3):
+            keep = ~mask & 0xFF
+            buffer[offset] = (buffer[offset] & keep) | (word & 0xFF)
+            word >>= 8
+            mask >>= 8
+            offset -= 1
+        return self._slots[index]
+
+    def write(self, index, code):
+        # returns True if the digit changed
+        if code == self._codes[index]:
+            return False
+        if self._stale:
+            self._catch_up()
+        self._codes[index] = code
+        slot = self.encode(self.buffers[self.front ^ 1], index, code)
+        self._dirty |= 1 << slot
+        return True
+
+    def _catch_up(self):
+        # copy the slots published last time into the back buffer
+        back = self.buffers[self.front ^ 1]
+        front = self.buffers[self.front]
+        stride = self.stride
+        stale = self._stale
+        offset = 0
+        while stale:
+            if stale & 1:
+                for index in range(offset, offset + stride):
+                    back[index] = front[index]
+            stale >>= 1
+            offset += stride
+        self._stale = 0
+
+    def publish(self):
+        # returns False if nothing changed, then the frame stays as it is
+        if not self._dirty:
+            return False
+        self.front ^= 1
+        self._stale = self._dirty
+        self._dirty = 0
+        return True
+
+    def show(self, codes):
+        # write a code per digit & publish, returns False if nothing changed
+        for index in range(self.digits):
+            self.write(index, codes[index])
+        return self.publish()
+
+    def set_digit(self, index, code):
+        # change a single digit & publish, e.g. to blink it. returns False if
+        # it didn't change
+        return self.write(index, code) and self.publish()
+
+    def code(self, index):
+        # the segments of a digit, as last written
+        return self._codes[index]
+
+
+def _segment_map(segments):
+    # (bit in font.SEGMENTS, output) pairs, None if wired like font.SEGMENTS
+    if segments is None:
+        return None
+    return tuple((font.SEGMENTS[name], segments[name]) for name in font.SEGMENTS)
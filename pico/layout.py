@@ -0,0 +1,10 @@
+import font
+
+# the MAX6921s daisy chained on the spi, nearest to the pico first: the grid
+# outputs of its digits in the order of the codes, and its segment outputs
+# like font.SEGMENTS, None if wired the same. the digits of all chips are
+# numbered on from the first chip's, see framebuffer.py
+CHIPS = ((font.GRIDS, None),)
+
+# e.g. a second iv-18 for the seconds & a date line, wired the same:
+# CHIPS = ((font.GRIDS, None), (font.GRIDS, None))
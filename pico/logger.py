@@ -0,0 +1,151 @@
+import os
+import struct
+from micropython import const
+from checksum import crc16
+from scheduler import ticks_ms, ticks_diff
+
+# file layout (read back by tools/read_drift_log.py):
+#   header block: FILE_HEADER, zero padded to BLOCK_SIZE
+#   data blocks: BLOCK_HEADER, up to RECORDS_PER_BLOCK records, zero padded
+# every block is written whole & on its own, so a block torn by a power loss
+# fails its checksum and the reader skips it.
+MAGIC = b"DRFT"
+VERSION = const(1)
+BLOCK_SIZE = const(256)  # one flash page
+FILE_HEADER = "<4sBBHIH"  # magic, version, record size, block size, sequence, checksum
+BLOCK_MAGIC = b"DB"
+BLOCK_HEADER = "<2sHH2x"  # magic, records, checksum of the rest of the block
+BLOCK_HEADER_SIZE = const(8)
+RECORD = "<Iiib3x"  # timestamp, local seconds, rtc seconds, trim
+RECORD_SIZE = const(16)
+RECORDS_PER_BLOCK = const((BLOCK_SIZE - BLOCK_HEADER_SIZE) // RECORD_SIZE)
+
+
+class Logger:
+    # appends fixed size records to a ram ring, which goes to flash a block at
+    # a time once flush_records are waiting or the oldest waited flush_seconds.
+    # files are started for every run & after max_blocks, only the newest
+    # max_files are kept.
+    def __init__(
+        self,
+        prefix="drift",
+        flush_records=RECORDS_PER_BLOCK,
+        flush_seconds=3600,
+        max_blocks=256,
+        max_files=8,
+        ring_records=4 * RECORDS_PER_BLOCK,
+    ):
+        self.prefix = prefix
+        self.flush_records = min(flush_records, ring_records)
+        self.flush_seconds = flush_seconds
+        self.max_blocks = max_blocks
+        self.max_files = max_files
+        self.dropped = 0  # records lost to a full ring
+
+        self._ring = bytearray(ring_records * RECORD_SIZE)
+        self._ring_records = ring_records
+        self._head = 0  # next record to write
+        self._count = 0  # records waiting
+        self._oldest = 0  # ticks of the oldest waiting record
+        self._block = bytearray(BLOCK_SIZE)
+
+        self._sequence = self._last_sequence() + 1
+        self._blocks = 0  # data blocks in the current file
+        self._file = None
+
+    def _name(self, sequence):
+        return "{}-{:04d}.bin".format(self.prefix, sequence)
+
+    def _files(self):
+        # sequence numbers of the existing files, oldest first
+        sequences = []
+        for name in os.listdir():
+            if name.startswith(self.prefix + "-") and name.endswith(".bin"):
+                try:
+                    sequences.append(int(name[len(self.prefix) + 1 : -4]))
+                except ValueError:
+                    pass
+        sequences.sort()
+        return sequences
+
+    def _last_sequence(self):
+        sequences = self._files()
+        return sequences[-1] if sequences else -1
+
+    def append(self, timestamp, local_seconds, rtc_seconds, trim):
+        if self._count == self._ring_records:
+            self.dropped += 1
+            return
+        if not self._count:
+            self._oldest = ticks_ms()
+        struct.pack_into(
+            RECORD,
+            self._ring,
+            self._head * RECORD_SIZE,
+            timestamp,
+            local_seconds,
+            rtc_seconds,
+            trim,
+        )
+        self._head = (self._head + 1) % self._ring_records
+        self._count += 1
+        if (
+            self._count >= self.flush_records
+            or ticks_diff(ticks_ms(), self._oldest) >= self.flush_seconds * 1000
+        ):
+            self.flush()
+
+    def flush(self):
+        # write everything waiting in blocks
+        while self._count:
+            records = min(self._count, RECORDS_PER_BLOCK)
+            tail = (self._head - self._count) % self._ring_records
+            block = self._block
+            for index in range(BLOCK_HEADER_SIZE, BLOCK_SIZE):
+                block[index] = 0
+            for index in range(records):
+                source = ((tail + index) % self._ring_records) * RECORD_SIZE
+                target = BLOCK_HEADER_SIZE + index * RECORD_SIZE
+                block[target : target + RECORD_SIZE] = self._ring[
+                    source : source + RECORD_SIZE
+                ]
+            checksum = crc16(block, BLOCK_HEADER_SIZE)
+            struct.pack_into(BLOCK_HEADER, block, 0, BLOCK_MAGIC, records, checksum)
+            self._write(block)
+            self._count -= records
+        self._oldest = ticks_ms()
+
+    def _write(self, block):
+        if self._file is None or self._blocks >= self.max_blocks:
+            self._start_file()
+        with open(self._file, "ab") as file:
+            file.write(block)
+        self._blocks += 1
+
+    def _start_file(self):
+        if self._file is not None:
+            self._sequence += 1
+        self._file = self._name(self._sequence)
+        self._blocks = 0
+
+        header = bytearray(BLOCK_SIZE)
+        struct.pack_into(
+            FILE_HEADER,
+            header,
+            0,
+            MAGIC,
+            VERSION,
+            RECORD_SIZE,
+            BLOCK_SIZE,
+            self._sequence,
+            0,
+        )
+        size = struct.calcsize(FILE_HEADER)
+        struct.pack_into("<H", header, size - 2, crc16(header, 0, size - 2))
+        with open(self._file, "wb") as file:
+            file.write(header)
+
+        # rotate
+        sequences = self._files()
+        for sequence in sequences[: max(0, len(sequences) - self.max_files)]:
+            os.remove(self._name(sequence))
@@ -1,73 +1,50 @@
+import startup  # first, to time the boot
 from micropython import const
-import os
 import time
-import _thread as thread
 import machine
 from machine import Pin, PWM, I2C, SPI
 from mcp7940 import MCP7940
-from debouncer import Debouncer
+from switches import Switches
+from framebuffer import FrameBuffer
+import animation
+import layout
+import modes
+from modes import OFF, TIME, DATE, RING
+import scheduler
+from timekeeping import (
+    RTCClock,
+    RTCReader,
+    validate_datetime,
+    seconds,
+)
+from alarms import Alarms, ALARM, TIMER, daily, after
+from power import PowerManager, ACTIVE_FREQUENCY, DIMMED
+from settings import Settings
+
+startup.stage("imports")
 
 # set overclock frequency
-machine.freq(270000000)
+machine.freq(ACTIVE_FREQUENCY)
 
 # constants
-OFF, TIME, DATE, SET_HOUR, SET_MINUTE, SET_DAY, SET_MONTH, SET_YEAR, SET_BRIGHTNESS = (
-    const(0),
-    const(1),
-    const(2),
-    const(3),
-    const(4),
-    const(5),
-    const(6),
-    const(7),
-    const(8),
-)
-
-TIME_CHECK_FREQUENCY = const(50)
-SWITCH_CHECK_FREQUENCY = const(100)
-DISPLAY_FREQUENCY = const(1000)
-
-MIN_BRIGHTNESS = 0.5
-MAX_BRIGHTNESS = 0.75
-
-TIME_CHECK_INTERVAL = 1 / TIME_CHECK_FREQUENCY * 1000000
-SWITCH_CHECK_INTERVAL = 1 / SWITCH_CHECK_FREQUENCY * 1000000
-DISPLAY_INTERVAL = 1 / DISPLAY_FREQUENCY * 1000000
-
-MAX6921 = {
-    "D1": const(1 << 7),
-    "D2": const(1 << 0),
-    "D3": const(1 << 6),
-    "D4": const(1 << 1),
-    "D5": const(1 << 5),
-    "D6": const(1 << 2),
-    "D7": const(1 << 3),
-    "D8": const(1 << 4),
-    "D9": const(1 << 8),
-    "A": const(1 << 9),
-    "B": const(1 << 11),
-    "C": const(1 << 14),
-    "D": const(1 << 15),
-    "E": const(1 << 13),
-    "F": const(1 << 12),
-    "G": const(1 << 10),
-    "P": const(1 << 16),
-}
-
-CHARACTERS = {
-    "-": const("G"),
-    "0": const("ABCDEF"),
-    "1": const("BC"),
-    "2": const("ABDEG"),
-    "3": const("ABCDG"),
-    "4": const("BCFG"),
-    "5": const("ACDFG"),
-    "6": const("ACDEFG"),
-    "7": const("ABC"),
-    "8": const("ABCDEFG"),
-    "9": const("ABCDFG"),
-    ".": const("P"),
-}
+DISPLAY_FREQUENCY = const(1000)  # digit slots per second, refreshed by core 1
+PIO_REFRESH = const(1)  # refresh by the pio & dma where possible, 0 always core 1
+PIO_FREQUENCY = const(4000)  # digit slots per second, refreshed by the pio
+DIM_AFTER = const(0)  # ms without a switch event until the display dims, 0 never
+STATS = const(1)  # performance counters, 0 compiles the hooks out
+GC_CONTROL = const(1)  # collect at safe points only, 0 leaves it to micropython
+TRANSITION = animation.ROLL  # of the time & date, NONE, FADE or ROLL
+AUTO_TRIM = const(1)  # follow the rtc drift & adjust its trim
+DRIFT_SAMPLE = const(600000)  # ms between drift samples against the pico crystal
+
+if STATS:
+    import stats
+if GC_CONTROL or STATS:
+    import memory
+if AUTO_TRIM:
+    import drift
+
+DISPLAY_INTERVAL = const(1000000 // DISPLAY_FREQUENCY)  # us
 
 # setup led
 led = Pin("LED", Pin.OUT, value=0)
@@ -76,58 +53,52 @@ led = Pin("LED", Pin.OUT, value=0)
 filament = Pin(18, Pin.OUT, value=0)
 
 # setup switches
-switches = [
-    Debouncer(Pin(26, Pin.IN, Pin.PULL_UP), delay_ms=50),
-    Debouncer(Pin(27, Pin.IN, Pin.PULL_UP), delay_ms=50),
-    Debouncer(Pin(28, Pin.IN, Pin.PULL_UP), delay_ms=50),
-]
-switch_states = [1, 1, 1]
+switches = Switches(
+    (
+        Pin(26, Pin.IN, Pin.PULL_UP),
+        Pin(27, Pin.IN, Pin.PULL_UP),
+        Pin(28, Pin.IN, Pin.PULL_UP),
+    ),
+    debounce_ms=50,
+)
 
 # setup boost converter control
 boost = PWM(Pin(17, Pin.OUT), freq=625000, duty_u16=0)
 
+# setup MAX6921 shift register, clock & data are set up with the refresh
+load = Pin(8, Pin.OUT, value=1)
+blank = Pin(9, Pin.OUT, value=1)
+
+startup.stage("display")
+
 # setup rtc
 i2c = I2C(0, sda=Pin(20), scl=Pin(21), freq=2000000)
 mcp = MCP7940(i2c, battery_enabled=True)
-# set trim
-mcp.set_trim(-46)
+# rtc mfp output, driven as a 1 hz square wave for the timekeeping, or by the
+# alarms while one is set
+mfp = Pin(19, Pin.IN)
+# brightness, trim, mode & alarms from the rtc sram, in one read
+settings = Settings(i2c, brightness=60, trim=-46, mode=TIME)
+settings_source = settings.load()
 # mcp.time = time.localtime()
 
-# setup MAX6921 shift register
-shift = SPI(0, baudrate=1000000, sck=Pin(6), mosi=Pin(7), miso=Pin(4))
-load = Pin(8, Pin.OUT, value=1)
-blank = Pin(9, Pin.OUT, value=1)
+startup.stage("rtc")
 
 
 # functions
-def set_display(d0, d1, d2, d3, d4, d5, d6, d7, d8):
-    global digit_states
-
-    # set each digit
-    lock.acquire()
-    for index, digit in enumerate([d0, d1, d2, d3, d4, d5, d6, d7, d8]):
-        digit_states[index] = MAX6921[f"D{index + 1}"]
-        for character in digit:
-            for segment in CHARACTERS[character]:
-                digit_states[index] |= MAX6921[segment]
-    lock.release()
+def set_display(codes):
+    # encode the digits that changed into the back buffer & show them
+    frame.show(codes)
 
     # turn on boost converter & filament, if off
-    boost.duty_u16(int(brightness * 65535))
+    percent = modes.MIN_BRIGHTNESS if power.state == DIMMED else state.brightness
+    boost.duty_u16(percent * 65535 // 100)
     filament.on()
 
     # enable tube outputs, if off
     blank.off()
 
 
-def set_mode(m):
-    global mode
-
-    lock.acquire()
-    mode = m
-    lock.release()
-
-
 def turn_off_display():
     # turn off boost converter
     boost.duty_u16(0)
@@ -139,360 +110,356 @@ def turn_off_display():
     filament.off()
 
 
-def zfill(s, l):
-    while len(s) < l:
-        s = "0" + s
-    return s
-
-
-def time_to_display(datetime, d8=""):
-    hour = zfill(str(datetime[3]), 2) if datetime[3] is not None else "--"
-    minute = zfill(str(datetime[4]), 2) if datetime[4] is not None else "--"
-    second = zfill(str(datetime[5]), 2) if datetime[5] is not None else "--"
-    return (second[1], second[0], "-", minute[1], minute[0], "-", hour[1], hour[0], d8)
-
-
-def date_to_display(datetime, d8=""):
-    year = zfill(str(datetime[0]), 4) if datetime[0] is not None else "----"
-    month = zfill(str(datetime[1]), 2) if datetime[1] is not None else "--"
-    date = zfill(str(datetime[2]), 2) if datetime[2] is not None else "--"
-    return (
-        year[3],
-        year[2],
-        year[1],
-        year[0],
-        month[1] + ".",
-        month[0],
-        date[1] + ".",
-        date[0],
-        d8,
+def start_refresh():
+    # the pio & dma refresh the tube where they can, else core 1 does
+    if PIO_REFRESH:
+        try:
+            from pio_refresh import PIORefresh
+
+            player = animation.Player(frame, PIO_FREQUENCY // DISPLAY_FREQUENCY)
+            refresh = PIORefresh(
+                player,
+                frame.slots,
+                frame.stride // 4,
+                Pin(6),
+                Pin(7),
+                load,
+                blank,
+                PIO_FREQUENCY,
+                on_scan=stats.scan if STATS else None,
+            )
+            refresh.start()
+            return player, refresh
+        except (ImportError, OSError) as ex:
+            print("refreshing on core 1, no pio:", ex)
+    from refresh import ThreadRefresh
+
+    shift = SPI(0, baudrate=1000000, sck=Pin(6), mosi=Pin(7), miso=Pin(4))
+    player = animation.Player(frame)
+    refresh = ThreadRefresh(
+        player,
+        frame.slots,
+        shift,
+        load,
+        blank,
+        DISPLAY_INTERVAL,
+        stats.refresh if STATS else None,
     )
+    refresh.start()
+    return player, refresh
+
+
+def render():
+    # compose the display for the current mode
+    global last_sample, shown_mode
+    if state.mode == OFF:
+        turn_off_display()
+        power.off()
+        if GC_CONTROL:
+            memory.automatic(True)
+        # fade in when turned on
+        player.clear()
+        shown_mode = OFF
+        return
+    if power.on():
+        if GC_CONTROL:
+            memory.automatic(False)
+        # the time stood still while off
+        state.clock_time = rtc_clock.time
+        if AUTO_TRIM:
+            # nothing was sampled while off
+            last_sample = None
+    modes.render(state, codes)
+    # the transition is ready before the frame is published
+    animate()
+    set_display(codes)
+
+
+def draw():
+    render()
+    if GC_CONTROL:
+        # the frame is out, after a new second nothing is due for a while
+        memory.safe_point()
+
+
+def animate():
+    # blink the field being set, fade to another mode, else the transition
+    global shown_mode
+    mode = state.mode
+    if modes.BLINK[mode]:
+        player.blink(codes, modes.BLINK[mode])
+    elif mode != shown_mode or TRANSITION == animation.FADE:
+        player.fade(codes)
+    elif TRANSITION == animation.ROLL:
+        player.roll(codes)
+    else:
+        player.show(codes)
+    shown_mode = mode
 
 
-def validate_datetime(datetime):
-    year = datetime[0]
-    month = datetime[1]
-    day = datetime[2]
+async def keep_time():
+    while True:
+        if rtc_clock.check():
+            state.clock_time = rtc_clock.time
+            mode = state.mode
+            drawing = mode == TIME or mode == DATE or mode == RING
+            if drawing:
+                redraw.set()
+            if AUTO_TRIM:
+                sample_drift()
+            if GC_CONTROL and not drawing:
+                # draw() collects after the frame, in the other modes it is
+                # done here, the set modes allocate too
+                memory.safe_point()
+
+        await rtc_clock.wait()
+
+
+def sample_drift():
+    # the pico crystal as the reference, on a second that began at a known tick
+    global last_sample, pico_ms
+    if not rtc_clock.precise():
+        return
+    if last_sample is None:
+        estimator.restart()
+        gap = 0
+    else:
+        gap = time.ticks_diff(rtc_clock.anchor, last_sample)
+        if gap < DRIFT_SAMPLE:
+            return
+    last_sample = rtc_clock.anchor
+    pico_ms += gap
+    set_trim(estimator.add(drift.PICO, pico_ms, seconds(rtc_clock.time) * 1000))
+
+
+def reference(unix_time):
+    # a reference time from the serial, as seconds since 1970 with up to
+    # three decimals. the offset to the rtc doesn't matter, only its rate
+    if not rtc_clock.precise():
+        return "not locked to the rtc"
+    rtc_ms = seconds(rtc_clock.time) * 1000 + rtc_clock.elapsed_ms()
+    parts = unix_time.split(".") + [""]
+    reference_ms = int(parts[0]) * 1000 + int((parts[1] + "000")[:3])
+    set_trim(estimator.add(drift.SERIAL, reference_ms, rtc_ms))
+    return estimator.report()
+
+
+def offset(offset_ms):
+    # a reference from tools/timesync.py, the ms the rtc is ahead of the host
+    rtc_ms = timesync.now_ms()
+    if rtc_ms is None:
+        return "not locked to the rtc"
+    set_trim(estimator.add(drift.SERIAL, rtc_ms - whole_ms(offset_ms), rtc_ms))
+    return estimator.report()
+
+
+def set_trim(trim):
+    if trim is None:
+        return
+    mcp.set_trim(trim)
+    settings.trim = trim
+    save.set()
+
+
+def write_time(datetime):
+    mcp.time = datetime
+    rtc_clock.set(datetime)
+    if AUTO_TRIM:
+        estimator.restart()
+    # the alarm is set for a date
+    set_alarm(state.alarm_hour, state.alarm_minute)
+
+
+def set_alarm(hour, minute):
+    # every day at hour:minute, no alarm if hour is -1
+    if hour < 0:
+        alarms.cancel(ALARM)
+    else:
+        alarms.set(ALARM, daily(read_time(), hour, minute))
 
-    if (month < 8 and month % 2 == 0 or month >= 8 and month % 2 == 1) and day > 30:
-        day = 30
-    if MCP7940.is_leap_year(year):
-        if day > 29:
-            day = 29
+
+def set_timer(minutes):
+    # goes off once after the minutes, 0 stops it
+    if minutes:
+        alarms.set(TIMER, after(read_time(), minutes * 60))
     else:
-        if day > 28:
-            day = 28
-
-    if month < 1:
-        month = 1
-    elif month > 12:
-        month = 12
-
-    return (
-        year,
-        month,
-        day,
-        datetime[3],
-        datetime[4],
-        datetime[5],
-        datetime[6],
-        datetime[7],
-    )
+        alarms.cancel(TIMER)
+
 
+def on_alarm(fired):
+    # the mfp woke us, even while off
+    if fired & modes.ALARM_BIT:
+        # again tomorrow
+        set_alarm(state.alarm_hour, state.alarm_minute)
+    modes.ring(state, fired)
+    redraw.set()
 
-def update_display():
-    global digit, last_display_update, last_mode, last_digit_states
 
-    try:
-        while True:
-            current_ticks = time.ticks_us()
+def busy():
+    # keeps the power manager from sleeping
+    return switches.busy() or alarms.pending
 
-            if time.ticks_diff(current_ticks, last_display_update) > DISPLAY_INTERVAL:
-                last_display_update = current_ticks
 
-                if lock.acquire(0):
-                    current_mode = mode
-                    last_mode = mode
+def save_settings():
+    # only the changed bytes are written
+    settings.brightness = state.brightness
+    settings.mode = state.mode
+    settings.alarm_hour = state.alarm_hour
+    settings.alarm_minute = state.alarm_minute
+    settings.timer = state.timer
+    settings.save()
 
-                    current_digit_states = digit_states
-                    last_digit_states = digit_states
 
-                    lock.release()
-                else:
-                    current_mode = last_mode
-                    current_digit_states = last_digit_states
+def reset_stats():
+    stats.reset()
+    memory.reset()
 
-                if current_mode != OFF:
-                    blank.on()
-                    load.off()
-                    shift.write(current_digit_states[digit].to_bytes(3, "big"))
-                    load.on()
-                    blank.off()
-                    digit += 1
 
-                    # iterate through digits
-                    if digit >= len(current_digit_states):
-                        digit = 0
-    except:
-        thread.exit()
+def on_switch(switch, event):
+    # the first press only wakes a dimmed display
+    if power.activity():
+        return
+    if modes.dispatch(state, switch, event):
+        redraw.set()
+        # remember off, time or date for the next boot
+        if state.mode <= DATE and state.mode != settings.mode:
+            save.set()
 
 
 # global variables
-clock_time = mcp.time
-if clock_time != validate_datetime(clock_time):
-    clock_time = validate_datetime(clock_time)
-    mcp.time = clock_time
-mcp.start()
-last_time = clock_time
-set_time = list(clock_time)
-
-mode = TIME
-last_mode = mode
-
-digit = 0  # 0 - 8
-digit_states = [0] * 9
-last_digit_states = digit_states
-
-brightness = 0.6  # 50 - 76 %
-if "brightness.txt" in os.listdir():
-    with open("brightness.txt") as file:
-        brightness = float(file.read())
-else:
-    print("no brightness file was found. using default brightness of 0.6")
-
-last_time_check = time.ticks_us()
-last_switch_check = time.ticks_us()
-last_display_update = time.ticks_us()
-
-# create a global lock
-lock = thread.allocate_lock()
-
-# start display update thread
-update_display_thread = thread.start_new_thread(update_display, ())
+# the time registers in one burst, a new tuple only when they changed
+reader = RTCReader(i2c)
+read_time = reader.read
+if STATS:
+    read_time = stats.timed(stats.I2C_READ, read_time)
+rtc_clock = RTCClock(read_time, mfp, reader.probe)
+# the mfp interrupt, when the rtc matched an alarm
+alarms = Alarms(i2c, mfp, rtc_clock)
+
+frame = FrameBuffer(layout.CHIPS)
+codes = [0] * frame.digits  # segment masks of the frame being composed
+# the tube is refreshed from here on, dark until the first frame
+player, refresh = start_refresh()
+shown_mode = OFF  # the first frame fades in
+
+# events between the main loop tasks
+redraw = scheduler.Event()
+save = scheduler.Event()
+
+# mode, time being set & brightness, changed by the switches
+state = modes.State(
+    rtc_clock.time, settings.brightness, write_time, save.set, set_alarm, set_timer
+)
+if settings.mode <= DATE:
+    # off, time or date, like before the power was lost
+    state.mode = settings.mode
+state.alarm_hour = settings.alarm_hour
+state.alarm_minute = settings.alarm_minute
+state.timer = settings.timer
 
-try:
-    # set display to show time in the beginning
-    set_display(*time_to_display(clock_time))
+power = PowerManager(rtc_clock, refresh, busy, redraw.set, DIM_AFTER)
 
-    # main loop
-    while True:
-        start_ticks_us = time.ticks_us()
-
-        # get current ticks
-        current_ticks = time.ticks_us()
-
-        # update time & set display accordingly
-        if time.ticks_diff(current_ticks, last_time_check) >= TIME_CHECK_INTERVAL:
-            last_time_check = current_ticks
-
-            clock_time = mcp.time
-
-            if clock_time != last_time:
-                last_time = clock_time
-                if mode == TIME:
-                    set_display(*time_to_display(clock_time))
-                elif mode == DATE:
-                    set_display(*date_to_display(clock_time))
-
-        # update debounced switches
-        if time.ticks_diff(current_ticks, last_switch_check) >= SWITCH_CHECK_INTERVAL:
-            last_switch_check = current_ticks
-
-            for switch in switches:
-                switch.update()
-
-            # mode selector
-            values = [switches[i].value() for i in range(3)]
-
-            # switch 1 (high)
-            if not values[0] and switch_states[0]:
-                # set time / date / brighness
-                if mode == TIME or mode == DATE:
-                    set_mode(SET_HOUR)
-                    set_time = list(clock_time)
-                    set_time[5] = 0
-                    set_display(
-                        *time_to_display((None, None, None, set_time[3], None, 0), ".")
-                    )
-                elif mode == SET_HOUR:
-                    set_mode(SET_MINUTE)
-                    set_display(
-                        *time_to_display((None, None, None, None, set_time[4], 0), ".")
-                    )
-                elif mode == SET_MINUTE:
-                    set_mode(SET_DAY)
-                    clock_time = tuple(set_time)
-                    mcp.time = clock_time
-                    last_time = clock_time
-                    set_display(
-                        *date_to_display(
-                            (None, None, set_time[2], None, None, None), "."
-                        )
-                    )
-                elif mode == SET_DAY:
-                    set_mode(SET_MONTH)
-                    set_display(
-                        *date_to_display(
-                            (None, set_time[1], None, None, None, None), "."
-                        )
-                    )
-                elif mode == SET_MONTH:
-                    set_mode(SET_YEAR)
-                    set_display(
-                        *date_to_display(
-                            (set_time[0], None, None, None, None, None), "."
-                        )
-                    )
-                elif mode == SET_YEAR:
-                    set_mode(SET_BRIGHTNESS)
-                    set_display(
-                        *time_to_display(
-                            (None, None, None, None, None, int(brightness * 100)), "."
-                        )
-                    )
-                elif mode == SET_BRIGHTNESS:
-                    set_mode(TIME)
-                    set_time[3:6] = clock_time[3:6]
-                    clock_time = validate_datetime(set_time)
-                    mcp.time = clock_time
-                    last_time = clock_time
-                    with open("brightness.txt", "w") as file:
-                        file.write(str(brightness))
-                    set_display(*time_to_display(set_time))
-
-            # switch 2 (middle)
-            if not values[1] and switch_states[1]:
-                # time / date
-                if mode == TIME:
-                    set_mode(DATE)
-                    set_display(*date_to_display(clock_time))
-                elif mode == DATE:
-                    set_mode(TIME)
-                    set_display(*time_to_display(clock_time))
-                elif mode == SET_HOUR:
-                    set_time[3] += 1
-                    if set_time[3] > 23:
-                        set_time[3] = 0
-                    set_display(
-                        *time_to_display((None, None, None, set_time[3], None, 0), ".")
-                    )
-                elif mode == SET_MINUTE:
-                    set_time[4] += 1
-                    if set_time[4] > 59:
-                        set_time[4] = 0
-                    set_display(
-                        *time_to_display((None, None, None, None, set_time[4], 0), ".")
-                    )
-                elif mode == SET_DAY:
-                    set_time[2] += 1
-                    if set_time[2] > 31:
-                        set_time[2] = 1
-                    set_display(
-                        *date_to_display(
-                            (None, None, set_time[2], None, None, None), "."
-                        )
-                    )
-                elif mode == SET_MONTH:
-                    set_time[1] += 1
-                    if set_time[1] > 12:
-                        set_time[1] = 1
-                    set_display(
-                        *date_to_display(
-                            (None, set_time[1], None, None, None, None), "."
-                        )
-                    )
-                elif mode == SET_YEAR:
-                    set_time[0] += 1
-                    if set_time[0] > 2500:
-                        set_time[0] = 2500
-                    set_display(
-                        *date_to_display(
-                            (set_time[0], None, None, None, None, None), "."
-                        )
-                    )
-                elif mode == SET_BRIGHTNESS:
-                    brightness += 0.01
-                    if brightness > MAX_BRIGHTNESS:
-                        brightness = MAX_BRIGHTNESS
-                    set_display(
-                        *time_to_display(
-                            (None, None, None, None, None, int(brightness * 100), ".")
-                        )
-                    )
-
-            # switch 3 (low)
-            if not values[2] and switch_states[2]:
-                # on / off
-                if mode == TIME or mode == DATE:
-                    set_mode(OFF)
-                    turn_off_display()
-                elif mode == OFF:
-                    set_mode(TIME)
-                    set_display(*time_to_display(clock_time))
-                elif mode == SET_HOUR:
-                    set_time[3] -= 1
-                    if set_time[3] < 0:
-                        set_time[3] = 23
-                    set_display(
-                        *time_to_display((None, None, None, set_time[3], None, 0), ".")
-                    )
-                elif mode == SET_MINUTE:
-                    set_time[4] -= 1
-                    if set_time[4] < 0:
-                        set_time[4] = 59
-                    set_display(
-                        *time_to_display((None, None, None, None, set_time[4], 0), ".")
-                    )
-                elif mode == SET_DAY:
-                    set_time[2] -= 1
-                    if set_time[2] < 1:
-                        set_time[2] = 31
-                    set_display(
-                        *date_to_display(
-                            (None, None, set_time[2], None, None, None), "."
-                        )
-                    )
-                elif mode == SET_MONTH:
-                    set_time[1] -= 1
-                    if set_time[1] < 1:
-                        set_time[1] = 12
-                    set_display(
-                        *date_to_display(
-                            (None, set_time[1], None, None, None, None), "."
-                        )
-                    )
-                elif mode == SET_YEAR:
-                    set_time[0] -= 1
-                    if set_time[0] < 1972:
-                        set_time[0] = 1972
-                    set_display(
-                        *date_to_display(
-                            (set_time[0], None, None, None, None, None), "."
-                        )
-                    )
-                elif mode == SET_BRIGHTNESS:
-                    brightness -= 0.01
-                    if brightness < MIN_BRIGHTNESS:
-                        brightness = MIN_BRIGHTNESS
-                    set_display(
-                        *time_to_display(
-                            (None, None, None, None, None, int(brightness * 100), ".")
-                        )
-                    )
-
-            # set switch states (so they only trigger once per press)
-            for i in range(3):
-                switch_states[i] = values[i]
+if AUTO_TRIM:
+    # rtc drift, against the pico crystal or a reference sent over the serial
+    estimator = drift.DriftEstimator(settings.trim)
+    last_sample = None  # ticks of the last drift sample
+    pico_ms = 0  # ms the pico crystal counted between the drift samples
 
+try:
+    # show the time as early as possible
+    render()
+
+    startup.stage("first frame")
+
+    # everything the first frame doesn't need
+    if settings_source == "defaults":
+        print("no settings were found. using the defaults")
+    elif settings_source == "brightness.txt":
+        print("took the brightness over from brightness.txt")
+    # the alarms the rtc kept, and the ones that went off while the pico wasn't
+    # running (the timer is only started by hand)
+    fired = alarms.start()
+    clock_time = validate_datetime(state.clock_time)
+    if clock_time != state.clock_time:
+        state.clock_time = clock_time
+        write_time(clock_time)
+        redraw.set()
+    mcp.start()
+    # set trim, as measured by auto_calibration.py
+    mcp.set_trim(settings.trim)
+    # again, the rtc forgot it if its battery was empty
+    set_alarm(state.alarm_hour, state.alarm_minute)
+    if fired:
+        modes.ring(state, fired)
+        redraw.set()
+
+    startup.stage("rtc setup")
+
+    import console
+    from timesync import TimeSync, whole_ms
+
+    # ntp like time setting over the serial, see tools/timesync.py
+    timesync = TimeSync(rtc_clock, write_time)
+    if STATS:
+        # time every step of the main loop tasks, and charge what they allocate
+        rtc_clock.check = stats.timed(
+            stats.LOOP, memory.charged(memory.RTC, rtc_clock.check)
+        )
+        on_switch = stats.timed(stats.LOOP, memory.charged(memory.SWITCHES, on_switch))
+        render = stats.timed(stats.LOOP, memory.charged(memory.DISPLAY, render))
+        on_alarm = memory.charged(memory.ALARMS, on_alarm)
+        stats.watch("rtc reads", lambda: rtc_clock.reads)
+        stats.watch("rtc faults", lambda: rtc_clock.faults)
+        stats.watch("switch overflows", lambda: switches.overflows)
+        stats.watch("ms active, dimmed, off", power.times)
+        stats.watch("refresh error", lambda: refresh.error)
+        console.command("stats", stats.report)
+        console.command("reset", reset_stats)
+    console.command("boot", startup.report)
+    if GC_CONTROL or STATS:
+        console.command("memory", memory.report)
+    console.command("sync", timesync.sync)
+    console.command("step", timesync.step)
+    if AUTO_TRIM:
+        console.command("drift", estimator.report)
+        console.command("ref", reference)
+        console.command("offset", offset)
+
+    # main loop tasks
+    scheduler.spawn(console.run)
+    scheduler.spawn(keep_time)
+    scheduler.spawn(switches.run, on_switch)
+    scheduler.spawn(power.run)
+    scheduler.spawn(alarms.run, on_alarm)
+    scheduler.spawn(timesync.run)
+    scheduler.on(redraw, draw)
+    scheduler.on(save, save_settings)
+
+    startup.stage("tasks")
+    print(startup.report())
+
+    if GC_CONTROL:
+        # everything long lived is allocated by now
+        memory.start()
+        if state.mode == OFF:
+            # off since the boot, see render()
+            memory.automatic(True)
+
+    scheduler.run()
 
 except (KeyboardInterrupt, SystemExit):
     print("exiting...")
+    print("ms active, dimmed, off:", power.times())
+
+    refresh.stop()
 
     boost.duty_u16(0)
 
     filament.off()
 
 except Exception as ex:
+    refresh.stop()
+
     boost.duty_u16(0)
 
     filament.off()
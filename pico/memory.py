@@ -0,0 +1,135 @@
+import gc
+from array import array
+import micropython
+from micropython import const
+from scheduler import ticks_ms, ticks_us, ticks_diff
+
+try:
+    from gc import mem_alloc, mem_free
+except ImportError:
+    # cpython, no heap of its own to measure
+    def mem_alloc():
+        return 0
+
+    def mem_free():
+        return HEAP
+
+
+HEAP = const(1 << 20)  # bytes free on cpython
+COLLECT_AFTER = const(16384)  # bytes allocated until a safe point collects
+RESERVE = const(16384)  # bytes free below which a safe point always collects
+EMERGENCY_BUFFER = const(100)  # bytes for the traceback of an exception in an irq
+
+# subsystems the allocations are charged to, the rest counts as other
+RTC = const(0)  # reading the rtc & keeping time
+SWITCHES = const(1)  # switch events & the modes
+DISPLAY = const(2)  # rendering & animating a frame
+ALARMS = const(3)
+SUBSYSTEMS = const(4)
+SUBSYSTEM_NAMES = ("rtc", "switches", "display", "alarms")
+
+# the automatic collection of micropython runs whenever an allocation finds
+# the heap full, in the middle of whatever allocated, and stops everything
+# using the heap while it runs. in steady state it is turned off and the
+# heap is collected at safe points instead (after the frame of a new second
+# is out, when nothing is due for most of a second), at most once per safe
+# point and only after COLLECT_AFTER bytes, so every pause has about the
+# same, bounded amount of garbage to sweep. the long lived buffers are all
+# allocated at boot, start() collects the boot garbage once.
+
+_allocated = array("I", [0] * SUBSYSTEMS)  # bytes charged per subsystem
+_pauses = array("i", [0, 0, 0])  # count, us in total, worst us
+_heap = array("i", [0, 0, 0])  # after the last collection, peak, at start
+_total = 0  # bytes allocated before the last collection, since reset
+_since = ticks_ms()
+
+
+def start():
+    # steady state from here on
+    micropython.alloc_emergency_exception_buf(EMERGENCY_BUFFER)
+    gc.collect()
+    reset()
+    _heap[2] = _heap[0]
+    gc.disable()
+
+
+def automatic(enabled):
+    # while nothing can flicker (the display is off), micropython may collect
+    # whenever it wants. what is allocated meanwhile isn't counted
+    global _total
+
+    if enabled:
+        _total += mem_alloc() - _heap[0]
+        gc.enable()
+    else:
+        gc.disable()
+        _heap[0] = mem_alloc()
+
+
+def collect():
+    global _total
+
+    heap = mem_alloc()
+    _total += heap - _heap[0]
+    _heap[1] = max(_heap[1], heap)
+    started = ticks_us()
+    gc.collect()
+    pause = ticks_diff(ticks_us(), started)
+    _heap[0] = mem_alloc()
+    _pauses[0] += 1
+    _pauses[1] += pause
+    _pauses[2] = max(_pauses[2], pause)
+
+
+def safe_point():
+    # returns True if it collected
+    if mem_alloc() - _heap[0] < COLLECT_AFTER and mem_free() >= RESERVE:
+        return False
+    collect()
+    return True
+
+
+def charged(subsystem, function):
+    # wrap function to charge what every call allocates to subsystem
+    def wrapper(*args):
+        before = mem_alloc()
+        result = function(*args)
+        allocated = mem_alloc() - before
+        # unless micropython collected meanwhile
+        if allocated > 0:
+            _allocated[subsystem] += allocated
+        return result
+
+    return wrapper
+
+
+def reset():
+    global _total, _since
+
+    for subsystem in range(SUBSYSTEMS):
+        _allocated[subsystem] = 0
+    _pauses[0] = _pauses[1] = _pauses[2] = 0
+    _heap[0] = _heap[1] = mem_alloc()
+    _total = 0
+    _since = ticks_ms()
+
+
+def report():
+    seconds = ticks_diff(ticks_ms(), _since) / 1000 or 1
+    total = _total + mem_alloc() - _heap[0]
+    charged_total = sum(_allocated)
+    lines = [
+        "heap: {} B used, {} B free, peak {} B, {} B after boot".format(
+            mem_alloc(), mem_free(), max(_heap[1], mem_alloc()), _heap[2]
+        ),
+        "gc pauses: n={} worst={} us mean={} us".format(
+            _pauses[0], _pauses[2], _pauses[1] // _pauses[0] if _pauses[0] else 0
+        ),
+        "allocated: {:.0f} B/s".format(total / seconds),
+    ]
+    lines.extend(
+        "  {}: {:.0f} B/s".format(name, _allocated[subsystem] / seconds)
+        for subsystem, name in enumerate(SUBSYSTEM_NAMES)
+    )
+    lines.append("  other: {:.0f} B/s".format(max(0, total - charged_total) / seconds))
+    return "\n".join(lines)
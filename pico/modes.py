@@ -0,0 +1,350 @@
+from micropython import const
+import font
+from formatter import time_to_display, date_to_display
+from switches import PRESS, LONG_PRESS, REPEAT
+from timekeeping import validate_datetime
+
+# modes
+OFF = const(0)
+TIME = const(1)
+DATE = const(2)
+SET_HOUR = const(3)
+SET_MINUTE = const(4)
+SET_DAY = const(5)
+SET_MONTH = const(6)
+SET_YEAR = const(7)
+SET_BRIGHTNESS = const(8)
+SET_ALARM_HOUR = const(9)
+SET_ALARM_MINUTE = const(10)
+SET_TIMER = const(11)
+RING = const(12)  # an alarm went off
+MODES = const(13)
+
+SWITCHES = const(3)  # high, middle, low
+EVENTS = const(4)  # see switches.py
+
+MIN_BRIGHTNESS = const(50)  # %
+MAX_BRIGHTNESS = const(75)  # %
+
+# field indexes after the datetime
+BRIGHTNESS = const(8)
+ALARM_HOUR = const(9)  # -1 for no alarm
+ALARM_MINUTE = const(10)
+TIMER = const(11)  # minutes, 0 for no timer
+
+MAX_TIMER = const(99)  # minutes
+
+# alarm bits, see alarms.py
+ALARM_BIT = const(1)
+TIMER_BIT = const(2)
+
+
+class State:
+    def __init__(self, clock_time, brightness, write_time, save, set_alarm, set_timer):
+        self.mode = TIME
+        self.clock_time = clock_time
+        self.set_time = list(clock_time)
+        self.brightness = brightness  # %
+        self.alarm_hour = -1
+        self.alarm_minute = 0
+        self.timer = 0
+        self.ringing = 0  # bits of the alarms that went off
+        self.rang_in = TIME  # mode to go back to once they are stopped
+        # hooks into the hardware
+        self.write_time = write_time
+        self.save = save
+        self.set_alarm = set_alarm
+        self.set_timer = set_timer
+
+    def field(self, index):
+        if index == BRIGHTNESS:
+            return self.brightness
+        if index == ALARM_HOUR:
+            return self.alarm_hour
+        if index == ALARM_MINUTE:
+            return self.alarm_minute
+        if index == TIMER:
+            return self.timer
+        return self.set_time[index]
+
+    def set_field(self, index, value):
+        if index == BRIGHTNESS:
+            self.brightness = value
+        elif index == ALARM_HOUR:
+            self.alarm_hour = value
+        elif index == ALARM_MINUTE:
+            self.alarm_minute = value
+        elif index == TIMER:
+            self.timer = value
+        else:
+            self.set_time[index] = value
+
+
+# renderers
+
+
+def show_time(state, codes):
+    return time_to_display(state.clock_time, codes)
+
+
+def show_date(state, codes):
+    return date_to_display(state.clock_time, codes)
+
+
+def show_hour(state, codes):
+    return time_to_display(
+        (None, None, None, state.set_time[3], None, 0), codes, font.DOT
+    )
+
+
+def show_minute(state, codes):
+    return time_to_display(
+        (None, None, None, None, state.set_time[4], 0), codes, font.DOT
+    )
+
+
+def show_day(state, codes):
+    return date_to_display(
+        (None, None, state.set_time[2], None, None, None), codes, font.DOT
+    )
+
+
+def show_month(state, codes):
+    return date_to_display(
+        (None, state.set_time[1], None, None, None, None), codes, font.DOT
+    )
+
+
+def show_year(state, codes):
+    return date_to_display(
+        (state.set_time[0], None, None, None, None, None), codes, font.DOT
+    )
+
+
+def show_brightness(state, codes):
+    return time_to_display(
+        (None, None, None, None, None, state.brightness), codes, font.DOT
+    )
+
+
+# d8 of the alarm being set, hh-mm-00 or dashes if off, and the timer, --mm-00,
+# without the dot while one goes off
+ALARM_MARK = font.glyph("A")
+TIMER_MARK = font.glyph("t")
+NOTHING = (None, None, None, None, None, None)
+
+
+def show_alarm(state, codes):
+    if state.alarm_hour < 0:
+        return time_to_display(NOTHING, codes, ALARM_MARK | font.DOT)
+    alarm = (None, None, None, state.alarm_hour, state.alarm_minute, 0)
+    return time_to_display(alarm, codes, ALARM_MARK | font.DOT)
+
+
+def show_timer(state, codes):
+    if not state.timer:
+        return time_to_display(NOTHING, codes, TIMER_MARK | font.DOT)
+    return time_to_display(
+        (None, None, None, None, state.timer, 0), codes, TIMER_MARK | font.DOT
+    )
+
+
+def show_ringing(state, codes):
+    mark = ALARM_MARK if state.ringing & ALARM_BIT else TIMER_MARK
+    return time_to_display(state.clock_time, codes, mark)
+
+
+# field descriptors of the set modes: field index, lowest & highest value,
+# whether to wrap around at the ends (otherwise stop) and the mode after it
+FIELDS = (
+    None,  # OFF
+    None,  # TIME
+    None,  # DATE
+    (3, 0, 23, True, SET_MINUTE),  # SET_HOUR
+    (4, 0, 59, True, SET_DAY),  # SET_MINUTE
+    (2, 1, 31, True, SET_MONTH),  # SET_DAY
+    (1, 1, 12, True, SET_YEAR),  # SET_MONTH
+    (0, 1972, 2500, False, SET_BRIGHTNESS),  # SET_YEAR
+    (BRIGHTNESS, MIN_BRIGHTNESS, MAX_BRIGHTNESS, False, TIME),  # SET_BRIGHTNESS
+    (ALARM_HOUR, -1, 23, True, SET_ALARM_MINUTE),  # SET_ALARM_HOUR
+    (ALARM_MINUTE, 0, 59, True, SET_TIMER),  # SET_ALARM_MINUTE
+    (TIMER, 0, MAX_TIMER, True, TIME),  # SET_TIMER
+    None,  # RING
+)
+
+# digits of the field being set, which blink (see animation.py)
+BLINK = (
+    0,  # OFF
+    0,  # TIME
+    0,  # DATE
+    0b011000000,  # SET_HOUR
+    0b000011000,  # SET_MINUTE
+    0b011000000,  # SET_DAY
+    0b000110000,  # SET_MONTH
+    0b000001111,  # SET_YEAR
+    0b000000011,  # SET_BRIGHTNESS
+    0b011000000,  # SET_ALARM_HOUR
+    0b000011000,  # SET_ALARM_MINUTE
+    0b000011000,  # SET_TIMER
+    0b011111111,  # RING, all but the mark
+)
+
+RENDERERS = (
+    None,  # OFF
+    show_time,
+    show_date,
+    show_hour,
+    show_minute,
+    show_day,
+    show_month,
+    show_year,
+    show_brightness,
+    show_alarm,  # SET_ALARM_HOUR
+    show_alarm,  # SET_ALARM_MINUTE
+    show_timer,
+    show_ringing,
+)
+
+
+# handlers
+
+
+def show_other(state):
+    state.mode = DATE if state.mode == TIME else TIME
+
+
+def turn_off(state):
+    state.mode = OFF
+
+
+def turn_on(state):
+    state.mode = TIME
+
+
+def start_setting(state):
+    state.mode = SET_HOUR
+    state.set_time = list(state.clock_time)
+    state.set_time[5] = 0
+
+
+def start_alarms(state):
+    # a long press while setting the time skips to the alarms
+    state.mode = SET_ALARM_HOUR
+
+
+def ring(state, fired):
+    # an alarm went off (not a switch event), see alarms.py
+    if state.mode != RING:
+        state.rang_in = state.mode
+        state.mode = RING
+    state.ringing |= fired
+
+
+def stop_ringing(state):
+    state.mode = state.rang_in
+    state.ringing = 0
+
+
+def next_field(state):
+    mode = state.mode
+    state.mode = FIELDS[mode][4]
+
+    if mode == SET_ALARM_HOUR:
+        if state.alarm_hour < 0:
+            # no alarm, so no minute to set
+            state.mode = SET_TIMER
+            state.set_alarm(-1, state.alarm_minute)
+            state.save()
+    elif mode == SET_ALARM_MINUTE:
+        state.set_alarm(state.alarm_hour, state.alarm_minute)
+        state.save()
+    elif mode == SET_TIMER:
+        state.set_timer(state.timer)
+        state.save()
+    elif mode == SET_MINUTE:
+        # the time is done, so it starts running from here
+        state.clock_time = tuple(state.set_time)
+        state.write_time(state.clock_time)
+    elif mode == SET_BRIGHTNESS:
+        # the date is done, keep the time that has passed since
+        state.set_time[3:6] = state.clock_time[3:6]
+        state.clock_time = validate_datetime(state.set_time)
+        state.write_time(state.clock_time)
+        state.save()
+
+
+def step(state, direction):
+    index, lowest, highest, wrap, _ = FIELDS[state.mode]
+    value = state.field(index) + direction
+    if value > highest:
+        value = lowest if wrap else highest
+    elif value < lowest:
+        value = highest if wrap else lowest
+    state.set_field(index, value)
+
+
+def increment(state):
+    step(state, 1)
+
+
+def decrement(state):
+    step(state, -1)
+
+
+def _table():
+    table = [None] * (MODES * SWITCHES * EVENTS)
+
+    def add(modes, switch, events, handler):
+        for mode in modes:
+            for event in events:
+                table[(mode * SWITCHES + switch) * EVENTS + event] = handler
+
+    setting = (
+        SET_HOUR,
+        SET_MINUTE,
+        SET_DAY,
+        SET_MONTH,
+        SET_YEAR,
+        SET_BRIGHTNESS,
+        SET_ALARM_HOUR,
+        SET_ALARM_MINUTE,
+        SET_TIMER,
+    )
+
+    # switch 1 (high): set time / date / brightness, held: alarm & timer
+    add((TIME, DATE), 0, (PRESS,), start_setting)
+    add((SET_HOUR,), 0, (LONG_PRESS,), start_alarms)
+    add(setting, 0, (PRESS,), next_field)
+    # switch 2 (middle): time / date, up
+    add((TIME, DATE), 1, (PRESS,), show_other)
+    add(setting, 1, (PRESS, REPEAT), increment)
+    # switch 3 (low): on / off, down
+    add((TIME, DATE), 2, (PRESS,), turn_off)
+    add((OFF,), 2, (PRESS,), turn_on)
+    add(setting, 2, (PRESS, REPEAT), decrement)
+    # any switch stops the alarm
+    for switch in range(SWITCHES):
+        add((RING,), switch, (PRESS,), stop_ringing)
+
+    return tuple(table)
+
+
+# handler for every (mode, switch, event), None if nothing happens
+TRANSITIONS = _table()
+
+
+def dispatch(state, switch, event):
+    # returns True if something changed
+    handler = TRANSITIONS[(state.mode * SWITCHES + switch) * EVENTS + event]
+    if handler is None:
+        return False
+    handler(state)
+    return True
+
+
+def render(state, codes):
+    # returns the codes to show, or None if the display is off
+    renderer = RENDERERS[state.mode]
+    if renderer is None:
+        return None
+    return renderer(state, codes)
@@ -0,0 +1,156 @@
+from array import array
+from machine import Pin
+from micropython import const
+import rp2
+from uctypes import addressof
+
+SLOT_FREQUENCY = const(4000)  # slots per second
+SHIFT_FREQUENCY = const(8000000)  # state machine clock, 2 per bit
+WORD_CYCLES = const(67)  # per 32 bit word shifted out
+SETUP_CYCLES = const(21)  # per slot, besides the words & the hold loop
+DREQ_PIO0_TX0 = const(0)
+READ_ADDR_TRIG = const(15)  # dma register alias 3, sets the read address & starts
+
+
+def _program(words):
+    # one slot of `words` words from the tx fifo: shift them out msb first
+    # while the last slot is still lit (the latch holds while load is low),
+    # then blank for 2 us around the latch & light it for isr + 1 cycles.
+    # the first slot starts blanked. set pins: load, blank. side set: clock.
+    # out: data. words is a closure variable, as asm_pio swaps the globals
+    @rp2.asm_pio(
+        out_init=rp2.PIO.OUT_LOW,
+        set_init=(rp2.PIO.OUT_HIGH, rp2.PIO.OUT_HIGH),
+        sideset_init=rp2.PIO.OUT_LOW,
+        out_shiftdir=rp2.PIO.SHIFT_LEFT,
+    )
+    def max6921():
+        set(pins, 0b10).side(0)
+        wrap_target()
+        set(x, words - 1).side(0)
+        label("word")
+        pull(block).side(0)
+        set(y, 31).side(0)
+        label("bit")
+        out(pins, 1).side(0)
+        jmp(y_dec, "bit").side(1)
+        jmp(x_dec, "word").side(0)
+        set(pins, 0b10).side(0)[7]
+        set(pins, 0b11).side(0)[7]
+        set(pins, 0b01).side(0)
+        mov(y, isr).side(0)
+        label("hold")
+        jmp(y_dec, "hold").side(0)
+        set(pins, 0b00).side(0)
+        wrap()
+
+    return max6921
+
+
+class PIORefresh:
+    # refreshes the tubes without the cpu: a pio state machine shifts the
+    # slots out & sequences load & blank with exact timing, fed by a dma
+    # channel that reads one scan of slots (`words` 32 bit words each, byte
+    # swapped so the big endian slot comes out msb first). a second dma
+    # channel then restarts it from the address in self._address, which the
+    # interrupt at the end of every scan sets to the frame the player has
+    # next, so a new frame starts with the scan after next. on_scan is
+    # called from it with the slots of a scan.
+    def __init__(
+        self,
+        player,
+        slots,
+        words,
+        sck,
+        mosi,
+        load,
+        blank,
+        slot_frequency=SLOT_FREQUENCY,
+        state_machine=0,
+        on_scan=None,
+    ):
+        self._player = player
+        self._slots = slots
+        self._words = words
+        self._program = _program(words)
+        self._sck = sck
+        self._mosi = mosi
+        self._load = load
+        self._blank = blank
+        self._slot_frequency = slot_frequency
+        self._id = state_machine
+        self._scanned = on_scan
+        self._address = array("I", [0])
+        self._data = None
+        self._control = None
+        self._sm = None
+        self.parked = True
+        self.error = None
+
+    def start(self):
+        self.resume()
+
+    def _on_scan(self, dma):
+        self._address[0] = addressof(self._player.next_buffer())
+        if self._scanned is not None:
+            self._scanned(self._slots)
+
+    def resume(self):
+        if not self.parked:
+            return
+        self.parked = False
+        sm = rp2.StateMachine(
+            self._id,
+            self._program,
+            freq=SHIFT_FREQUENCY,
+            sideset_base=self._sck,
+            out_base=self._mosi,
+            set_base=self._load,
+        )
+        # the hold loop makes up the rest of the slot
+        cycles = SETUP_CYCLES + WORD_CYCLES * self._words
+        sm.put(SHIFT_FREQUENCY // self._slot_frequency - cycles)
+        sm.exec("pull()")
+        sm.exec("mov(isr, osr)")
+        self._sm = sm
+
+        data = self._data = rp2.DMA()
+        control = self._control = rp2.DMA()
+        self._address[0] = addressof(self._player.next_buffer())
+        data.config(
+            write=sm,
+            count=self._slots * self._words,
+            ctrl=data.pack_ctrl(
+                size=2,
+                inc_write=False,
+                treq_sel=DREQ_PIO0_TX0 + self._id,
+                chain_to=control.channel,
+                bswap=True,
+                irq_quiet=False,
+            ),
+        )
+        data.irq(self._on_scan, hard=True)
+        control.config(
+            read=self._address,
+            write=data.registers[READ_ADDR_TRIG:],
+            count=1,
+            ctrl=control.pack_ctrl(size=2, inc_read=False, inc_write=False),
+        )
+        sm.active(1)
+        control.active(1)
+
+    def pause(self):
+        # stop with the tube blanked, the pins back with the cpu
+        if self.parked:
+            return
+        self.parked = True
+        self._data.irq(None)
+        # closing aborts the channels, they are claimed again by resume
+        self._control.close()
+        self._data.close()
+        self._sm.active(0)
+        self._blank.init(Pin.OUT, value=1)
+        self._load.init(Pin.OUT, value=1)
+
+    def stop(self):
+        self.pause()
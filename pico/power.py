@@ -0,0 +1,99 @@
+import time
+from array import array
+import machine
+from micropython import const
+import scheduler
+
+# states
+ACTIVE = const(0)
+DIMMED = const(1)
+OFF = const(2)
+STATES = const(3)
+
+ACTIVE_FREQUENCY = const(270000000)  # overclocked for the display refresh
+OFF_FREQUENCY = const(48000000)  # the lowest that keeps usb working
+SETTLE = const(10)  # ms between checks while the switches settle
+OFF_SLEEP = const(100)  # ms of light sleep while off, the console's poll interval
+
+
+class PowerManager:
+    # active: display on, overclocked. dimmed: display on at the lowest
+    # brightness, after dim_after_ms without a switch event (0 never dims).
+    # off: display off, refresh paused, rtc not read, lower clock & light
+    # sleep until a switch interrupt, waking every OFF_SLEEP ms to give the
+    # console & the other tasks their turn. the pwm, bus & pio clocks scale
+    # with the system clock, so it is only lowered while nothing uses them.
+    def __init__(self, clock, refresh, busy, changed, dim_after_ms=0):
+        self.state = ACTIVE
+        self._clock = clock  # timekeeping.RTCClock, paused while off
+        self._refresh = refresh  # refresh.ThreadRefresh or pio_refresh.PIORefresh
+        self._busy = busy  # returns True while the switches need polling
+        self._changed = changed  # called when the display has to follow
+        self._dim_after_ms = dim_after_ms
+        self._flag = scheduler.Flag()
+        self._activity = time.ticks_ms()
+        self._entered = self._activity
+        self._times = array("i", [0] * STATES)  # ms in every state before this one
+
+    def _enter(self, state):
+        now = time.ticks_ms()
+        self._times[self.state] += time.ticks_diff(now, self._entered)
+        self._entered = now
+        self.state = state
+        self._flag.set()
+
+    def times(self):
+        # ms spent in every state, including the current one
+        times = list(self._times)
+        times[self.state] += time.ticks_diff(time.ticks_ms(), self._entered)
+        return times
+
+    def off(self):
+        # the display is already off
+        if self.state == OFF:
+            return
+        self._enter(OFF)
+        self._clock.pause()
+        self._refresh.pause()
+        machine.freq(OFF_FREQUENCY)
+
+    def on(self):
+        # before the display is turned on again, returns True if it was off
+        if self.state != OFF:
+            return False
+        machine.freq(ACTIVE_FREQUENCY)
+        self._refresh.resume()
+        self._clock.resume()
+        self._activity = time.ticks_ms()
+        self._enter(ACTIVE)
+        return True
+
+    def activity(self):
+        # a switch was used, returns True if that only woke the display
+        self._activity = time.ticks_ms()
+        if self.state != DIMMED:
+            return False
+        self._enter(ACTIVE)
+        self._changed()
+        return True
+
+    async def run(self):
+        while True:
+            if self.state == OFF:
+                if self._busy():
+                    # let the switches take the edge that woke us & settle
+                    await scheduler.sleep_ms(SETTLE)
+                else:
+                    machine.lightsleep(OFF_SLEEP)
+                    await scheduler.sleep_ms(0)
+            elif self.state == ACTIVE and self._dim_after_ms:
+                idle = time.ticks_diff(time.ticks_ms(), self._activity)
+                if idle >= self._dim_after_ms:
+                    self._enter(DIMMED)
+                    self._changed()
+                else:
+                    await scheduler.wait_for_ms(
+                        self._flag.wait(), self._dim_after_ms - idle
+                    )
+            else:
+                await self._flag.wait()
@@ -0,0 +1,101 @@
+import time
+import _thread as thread
+from micropython import const
+
+SLOT = const(1000)  # us per slot
+
+
+class ThreadRefresh:
+    # refreshes the tubes from core 1: shift the words of the next slot out
+    # with the spi while the last one is still lit, then blank, latch & light
+    # them until the next slot, so the duty doesn't depend on the length of
+    # the chain. the frames come from the player, a new one only ever starts
+    # with a scan. the same interface as pio_refresh.PIORefresh, for when it
+    # isn't there.
+    def __init__(self, player, slots, spi, load, blank, slot_us=SLOT, on_slot=None):
+        self._player = player
+        self._slots = slots
+        self._spi = spi
+        self._load = load
+        self._blank = blank
+        self._slot_us = slot_us
+        self._on_slot = on_slot  # called with the us to wait before every slot
+        self._park = thread.allocate_lock()
+        self._waiting = False
+        self.parked = False
+        self.error = None  # that stopped the refresh
+
+    def start(self):
+        thread.start_new_thread(self._run, ())
+
+    def pause(self):
+        # stop with the tube blanked, once the refresh core is waiting
+        if self.parked:
+            return
+        self._park.acquire()
+        self.parked = True
+        while not self._waiting and self.error is None:
+            time.sleep_us(100)
+        self._blank.on()
+
+    def resume(self):
+        if not self.parked:
+            return
+        self.parked = False
+        self._park.release()
+
+    def stop(self):
+        # core 1 can't be stopped from core 0, it stays parked
+        self.pause()
+
+    def _run(self):
+        player = self._player
+        slots = self._slots
+        spi = self._spi
+        load = self._load
+        blank = self._blank
+        on_slot = self._on_slot
+        slot = 0
+        views = player.next()
+        next_slot = time.ticks_us()
+
+        try:
+            while True:
+                if self.parked:
+                    # display off, wait without spinning
+                    self._waiting = True
+                    self._park.acquire()
+                    self._park.release()
+                    self._waiting = False
+                    next_slot = time.ticks_us()
+                    slot = 0
+                    views = player.next()
+                    continue
+
+                # wait for the next slot (sleep_us busy-waits on the pico, so
+                # this keeps the timing of the old polling loop without drifting)
+                delay = time.ticks_diff(next_slot, time.ticks_us())
+                if on_slot is not None:
+                    on_slot(delay)
+                if delay > 0:
+                    time.sleep_us(delay)
+                next_slot = time.ticks_add(next_slot, self._slot_us)
+                if self.parked:
+                    continue
+
+                # the latch holds while load is low
+                load.off()
+                spi.write(views[slot])
+                blank.on()
+                load.on()
+                blank.off()
+                slot += 1
+
+                # iterate through the slots, frames only change between scans
+                if slot >= slots:
+                    slot = 0
+                    views = player.next()
+        except Exception as ex:
+            # never leave a single digit lit at full duty
+            blank.on()
+            self.error = ex
@@ -0,0 +1,114 @@
+import time
+
+try:
+    import asyncio
+except ImportError:
+    import uasyncio as asyncio
+
+try:
+    from time import ticks_ms, ticks_us, ticks_add, ticks_diff
+except ImportError:
+    # cpython
+    def ticks_ms():
+        return time.monotonic_ns() // 1000000
+
+    def ticks_us():
+        return time.monotonic_ns() // 1000
+
+    def ticks_add(ticks, delta):
+        return ticks + delta
+
+    def ticks_diff(ticks1, ticks2):
+        return ticks1 - ticks2
+
+
+Event = asyncio.Event
+
+if hasattr(asyncio, "ThreadSafeFlag"):
+    # can be set from interrupt handlers
+    Flag = asyncio.ThreadSafeFlag
+else:
+    # cpython
+    class Flag:
+        def __init__(self):
+            self._event = asyncio.Event()
+
+        def set(self):
+            self._event.set()
+
+        def clear(self):
+            self._event.clear()
+
+        async def wait(self):
+            await self._event.wait()
+            self._event.clear()
+
+
+_tasks = []
+
+
+def sleep_ms(ms):
+    if hasattr(asyncio, "sleep_ms"):
+        return asyncio.sleep_ms(ms)
+    return asyncio.sleep(ms / 1000)
+
+
+async def wait_for_ms(awaitable, timeout_ms):
+    # returns False if the timeout passed first
+    try:
+        if hasattr(asyncio, "wait_for_ms"):
+            await asyncio.wait_for_ms(awaitable, timeout_ms)
+        else:
+            await asyncio.wait_for(awaitable, timeout_ms / 1000)
+        return True
+    except asyncio.TimeoutError:
+        return False
+
+
+async def sleep_until(deadline):
+    delay = ticks_diff(deadline, ticks_ms())
+    if delay > 0:
+        await sleep_ms(delay)
+    else:
+        # still give the other tasks a turn
+        await sleep_ms(0)
+
+
+async def _periodic(interval_ms, callback):
+    deadline = ticks_ms()
+    while True:
+        callback()
+        deadline = ticks_add(deadline, interval_ms)
+        # don't try to catch up on missed deadlines, skip them
+        if ticks_diff(deadline, ticks_ms()) < 0:
+            deadline = ticks_ms()
+        await sleep_until(deadline)
+
+
+async def _on_event(event, callback):
+    while True:
+        await event.wait()
+        event.clear()
+        callback()
+
+
+def every(interval_ms, callback):
+    _tasks.append((_periodic, (interval_ms, callback)))
+
+
+def on(event, callback):
+    _tasks.append((_on_event, (event, callback)))
+
+
+def spawn(coroutine_function, *args):
+    _tasks.append((coroutine_function, args))
+
+
+async def _main():
+    running = [asyncio.create_task(function(*args)) for function, args in _tasks]
+    # tasks run forever, so this only returns by an exception
+    await asyncio.gather(*running)
+
+
+def run():
+    asyncio.run(_main())
@@ -0,0 +1,122 @@
+import struct
+from micropython import const
+from checksum import crc16
+from timekeeping import RTC_ADDRESS
+
+SRAM = const(0x20)  # 64 bytes, kept by the rtc battery
+
+# layout, append new options before the checksum & bump the version
+MAGIC = const(0xC5)
+VERSION = const(2)
+# magic, version, brightness %, trim, mode, alarm hour & minute, timer minutes,
+# reserved, crc
+LAYOUT = "<BBBbBbBB6xH"
+SIZE = const(16)
+
+FILENAME = "settings.bin"  # flash copy, for when the rtc battery was empty
+BRIGHTNESS_FILENAME = "brightness.txt"  # the brightness before there were settings
+
+
+class Settings:
+    # settings in the battery backed sram of the rtc, so routine changes don't
+    # wear the flash & they survive reflashing the pico. saving only writes the
+    # bytes that changed. the flash copy is only written when asked to, for
+    # settings that have to survive an empty battery (like the trim).
+    def __init__(
+        self, i2c, brightness=60, trim=0, mode=1, alarm_hour=-1, alarm_minute=0, timer=0
+    ):
+        self._i2c = i2c
+        self.brightness = brightness
+        self.trim = trim
+        self.mode = mode
+        self.alarm_hour = alarm_hour  # -1 for no alarm
+        self.alarm_minute = alarm_minute
+        self.timer = timer  # minutes last set
+        self._image = bytearray(SIZE)  # what the sram holds
+        self._pending = bytearray(SIZE)
+
+    def _unpack(self, image):
+        # returns False if the image isn't valid
+        fields = struct.unpack(LAYOUT, image)
+        magic, version, brightness, trim, mode = fields[:5]
+        if (
+            magic != MAGIC
+            or not 1 <= version <= VERSION
+            or crc16(image, 0, SIZE - 2) != fields[-1]
+        ):
+            return False
+        self.brightness = brightness
+        self.trim = trim
+        self.mode = mode
+        if version >= 2:
+            # version 1 had no alarms, keep the defaults
+            self.alarm_hour, self.alarm_minute, self.timer = fields[5:8]
+        return True
+
+    def _pack(self, image):
+        struct.pack_into(
+            LAYOUT,
+            image,
+            0,
+            MAGIC,
+            VERSION,
+            self.brightness,
+            self.trim,
+            self.mode,
+            self.alarm_hour,
+            self.alarm_minute,
+            self.timer,
+            0,
+        )
+        struct.pack_into("<H", image, SIZE - 2, crc16(image, 0, SIZE - 2))
+
+    def load(self):
+        # returns where the settings came from: "sram", "flash", "brightness.txt"
+        # or "defaults"
+        self._i2c.readfrom_mem_into(RTC_ADDRESS, SRAM, self._image)
+        if self._unpack(self._image):
+            return "sram"
+        try:
+            with open(FILENAME, "rb") as file:
+                image = file.read(SIZE)
+            if len(image) == SIZE and self._unpack(image):
+                self.save()
+                return "flash"
+        except OSError:
+            pass
+        if self._migrate():
+            # into the flash copy too, so it is only ever taken over once
+            self.save(flash=True)
+            return BRIGHTNESS_FILENAME
+        self.save()
+        return "defaults"
+
+    def _migrate(self):
+        # returns True if the brightness file of older versions was found
+        try:
+            with open(BRIGHTNESS_FILENAME) as file:
+                self.brightness = round(float(file.read()) * 100)
+        except (OSError, ValueError):
+            return False
+        return True
+
+    def save(self, flash=False):
+        pending = self._pending
+        image = self._image
+        self._pack(pending)
+
+        # write every run of changed bytes
+        index = 0
+        while index < SIZE:
+            if pending[index] == image[index]:
+                index += 1
+                continue
+            start = index
+            while index < SIZE and pending[index] != image[index]:
+                index += 1
+            self._i2c.writeto_mem(RTC_ADDRESS, SRAM + start, pending[start:index])
+        image[:] = pending
+
+        if flash:
+            with open(FILENAME, "wb") as file:
+                file.write(image)
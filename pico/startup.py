@@ -0,0 +1,30 @@
+from array import array
+from micropython import const
+from scheduler import ticks_us, ticks_diff
+
+# times the stages of the boot. the ticks start at zero with the pico, so the
+# first stage covers starting the interpreter until main.py imports this
+MAX_STAGES = const(16)
+
+_names = []
+_ends = array("i", [0] * MAX_STAGES)  # us since the ticks started
+
+
+def stage(name):
+    # the stage called name ends now
+    if len(_names) < MAX_STAGES:
+        _ends[len(_names)] = ticks_us()
+        _names.append(name)
+
+
+def report():
+    lines = []
+    start = 0
+    for index, name in enumerate(_names):
+        end = _ends[index]
+        lines.append("{}: {} us (at {} us)".format(name, ticks_diff(end, start), end))
+        start = end
+    return "\n".join(lines)
+
+
+stage("interpreter")
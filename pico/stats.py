@@ -0,0 +1,153 @@
+from array import array
+from micropython import const
+from scheduler import ticks_ms, ticks_us, ticks_diff
+
+# counters
+SLOTS = const(0)  # refresh slots
+LATE_SLOTS = const(1)  # slots more than LATE us late, on core 1 (the pio is exact)
+COUNTERS = const(2)
+COUNTER_NAMES = ("slots", "late slots")
+
+LATE = const(100)  # us
+
+# counts wrap to 0 at 2^30, above the largest small int a value would need the
+# heap, which is locked in the hard irq of the pio refresh. that's 3 days of
+# slots at 4000/s, stats.reset() before measuring for longer
+MAX_COUNT = const(0x3FFFFFFF)
+
+# histograms
+REFRESH = const(0)  # us a refresh slot started late
+I2C_READ = const(1)  # us per rtc time read
+LOOP = const(2)  # us per main loop task step
+HISTOGRAMS = const(3)
+HISTOGRAM_NAMES = ("refresh late us", "i2c read us", "loop us")
+
+# upper bucket limits, everything above goes to a last bucket
+LIMITS = (
+    (0, 2, 5, 10, 20, 50, 100, 500),
+    (50, 100, 150, 200, 300, 500, 1000),
+    (100, 250, 500, 1000, 2500, 5000, 10000),
+)
+
+
+def _count(counts, index, amount=1):
+    # counts[index] += amount, wrapped without going through a larger int
+    value = counts[index] - MAX_COUNT + amount
+    counts[index] = value - 1 if value > 0 else value + MAX_COUNT
+
+
+class Histogram:
+    # fixed buckets, so recording doesn't allocate (on either core)
+    def __init__(self, limits):
+        self.limits = limits
+        self.buckets = array("I", [0] * (len(limits) + 1))
+        self.extremes = array("i", [0, 0])  # min, max
+        self.count = 0
+
+    def add(self, value):
+        limits = self.limits
+        index = 0
+        while index < len(limits) and value > limits[index]:
+            index += 1
+        _count(self.buckets, index)
+        extremes = self.extremes
+        if not self.count or value < extremes[0]:
+            extremes[0] = value
+        if not self.count or value > extremes[1]:
+            extremes[1] = value
+        self.count = self.count + 1 if self.count < MAX_COUNT else 0
+
+    def reset(self):
+        for index in range(len(self.buckets)):
+            self.buckets[index] = 0
+        self.count = 0
+
+    def report(self):
+        if not self.count:
+            return "-"
+        return "n={} min={} max={} | {} >{}:{}".format(
+            self.count,
+            self.extremes[0],
+            self.extremes[1],
+            " ".join(
+                "<={}:{}".format(limit, count)
+                for limit, count in zip(self.limits, self.buckets)
+            ),
+            self.limits[-1],
+            self.buckets[-1],
+        )
+
+
+counters = array("I", [0] * COUNTERS)
+histograms = tuple(Histogram(limits) for limits in LIMITS)
+_watched = []  # (name, function) of values kept elsewhere
+_since = ticks_ms()
+
+
+# hooks, the callers guard them with a const so they compile out when unused
+
+
+def refresh(delay):
+    # called by the refresh core with the us left until its slot
+    _count(counters, SLOTS)
+    late = -delay if delay < 0 else 0
+    histograms[REFRESH].add(late)
+    if late > LATE:
+        _count(counters, LATE_SLOTS)
+
+
+def scan(slots):
+    # called by the pio refresh after every scan, its slots are never late
+    _count(counters, SLOTS, slots)
+
+
+def add(histogram, value):
+    histograms[histogram].add(value)
+
+
+def timed(histogram, function):
+    # wrap function to record how many us every call takes
+    histogram = histograms[histogram]
+
+    def wrapper(*args):
+        started = ticks_us()
+        result = function(*args)
+        histogram.add(ticks_diff(ticks_us(), started))
+        return result
+
+    return wrapper
+
+
+def watch(name, function):
+    # include function() in the report
+    _watched.append((name, function))
+
+
+# reporting
+
+
+def reset():
+    global _since
+
+    for counter in range(COUNTERS):
+        counters[counter] = 0
+    for histogram in histograms:
+        histogram.reset()
+    _since = ticks_ms()
+
+
+def report():
+    seconds = ticks_diff(ticks_ms(), _since) / 1000
+    lines = ["seconds: {:.1f}".format(seconds)]
+    lines.extend(
+        "{}: {}".format(name, counters[counter])
+        for counter, name in enumerate(COUNTER_NAMES)
+    )
+    if seconds:
+        lines.append("refresh: {:.1f} slots/s".format(counters[SLOTS] / seconds))
+    lines.extend(
+        "{}: {}".format(name, histogram.report())
+        for name, histogram in zip(HISTOGRAM_NAMES, histograms)
+    )
+    lines.extend("{}: {}".format(name, function()) for name, function in _watched)
+    return "\n".join(lines)
@@ -0,0 +1,164 @@
+import time
+from array import array
+from micropython import const
+import scheduler
+
+# events
+PRESS = const(0)
+RELEASE = const(1)
+LONG_PRESS = const(2)
+REPEAT = const(3)
+
+QUEUE_SIZE = const(32)  # raw edges buffered between two polls
+DEBOUNCE = const(50)  # ms the contacts are ignored after a change
+LONG_PRESS_TIME = const(600)  # ms held until a long press, and the first repeat
+REPEAT_START = const(250)  # ms between the first repeats
+REPEAT_MIN = const(40)  # ms between repeats at full speed
+
+
+class Switches:
+    # switches to ground with pull-ups. the pin interrupts only push the
+    # timestamped edges into a preallocated ring, poll() turns them into
+    # events. a change is taken on its first edge and the contact is then
+    # ignored for the debounce time, so nothing is polled while idle and a
+    # press isn't delayed by the debouncing.
+    def __init__(self, pins, debounce_ms=DEBOUNCE):
+        self._pins = pins
+        self._debounce_ms = debounce_ms
+        count = len(pins)
+
+        # edge ring, written by the interrupts
+        self._edge_ticks = array("i", [0] * QUEUE_SIZE)
+        self._edge_switch = bytearray(QUEUE_SIZE)
+        self._edge_level = bytearray(QUEUE_SIZE)
+        self._head = 0
+        self._tail = 0
+        self.overflows = 0
+
+        # per switch state
+        self._raw = bytearray(pin.value() for pin in pins)
+        self._state = bytearray(self._raw)
+        self._locked_until = array("i", [0] * count)
+        self._locked = bytearray(count)
+        self._pressed_at = array("i", [0] * count)
+        self._next_repeat = array("i", [0] * count)
+        self._interval = array("i", [0] * count)
+        self._long = bytearray(count)
+
+        self.flag = scheduler.Flag()
+
+        for index, pin in enumerate(pins):
+            pin.irq(
+                lambda pin, index=index: self.edge(index, pin.value()),
+                pin.IRQ_FALLING | pin.IRQ_RISING,
+            )
+
+    def edge(self, index, level, ticks=None):
+        # called from the pin interrupts, or to inject edges
+        head = self._head
+        following = (head + 1) % QUEUE_SIZE
+        if following == self._tail:
+            self.overflows += 1
+            return
+        self._edge_ticks[head] = time.ticks_ms() if ticks is None else ticks
+        self._edge_switch[head] = index
+        self._edge_level[head] = level
+        self._head = following
+        self.flag.set()
+
+    def busy(self):
+        # True while edges wait to be polled or a switch hasn't settled
+        return self._head != self._tail or self.timeout() is not None
+
+    def value(self, index):
+        return self._state[index]
+
+    def poll(self, handler, now=None):
+        # call handler(switch, event) for everything that happened
+        if now is None:
+            now = time.ticks_ms()
+
+        while self._tail != self._head:
+            tail = self._tail
+            self._take(
+                self._edge_switch[tail],
+                self._edge_level[tail],
+                self._edge_ticks[tail],
+                handler,
+            )
+            self._tail = (tail + 1) % QUEUE_SIZE
+
+        for index in range(len(self._pins)):
+            if self._locked[index]:
+                if time.ticks_diff(now, self._locked_until[index]) < 0:
+                    continue
+                self._locked[index] = 0
+                # settled on something else while locked
+                if self._raw[index] != self._state[index]:
+                    self._change(index, self._raw[index], now, handler)
+                    continue
+
+            if self._state[index]:
+                continue
+            # held down
+            if not self._long[index]:
+                if time.ticks_diff(now, self._pressed_at[index]) >= LONG_PRESS_TIME:
+                    self._long[index] = 1
+                    self._interval[index] = REPEAT_START
+                    self._next_repeat[index] = time.ticks_add(now, REPEAT_START)
+                    handler(index, LONG_PRESS)
+                    handler(index, REPEAT)
+            elif time.ticks_diff(now, self._next_repeat[index]) >= 0:
+                # repeat faster the longer it is held
+                interval = max(REPEAT_MIN, self._interval[index] * 3 // 4)
+                self._interval[index] = interval
+                self._next_repeat[index] = time.ticks_add(now, interval)
+                handler(index, REPEAT)
+
+    def _take(self, index, level, ticks, handler):
+        self._raw[index] = level
+        if self._locked[index] or level == self._state[index]:
+            return
+        self._change(index, level, ticks, handler)
+
+    def _change(self, index, level, ticks, handler):
+        self._state[index] = level
+        self._locked[index] = 1
+        self._locked_until[index] = time.ticks_add(ticks, self._debounce_ms)
+        if level:
+            handler(index, RELEASE)
+        else:
+            self._pressed_at[index] = ticks
+            self._long[index] = 0
+            handler(index, PRESS)
+
+    def timeout(self, now=None):
+        # ms until poll() has something to do without a new edge, or None
+        if now is None:
+            now = time.ticks_ms()
+        timeout = None
+        for index in range(len(self._pins)):
+            if self._locked[index]:
+                due = self._locked_until[index]
+            elif self._state[index]:
+                continue
+            elif not self._long[index]:
+                due = time.ticks_add(self._pressed_at[index], LONG_PRESS_TIME)
+            else:
+                due = self._next_repeat[index]
+            remaining = max(0, time.ticks_diff(due, now))
+            if timeout is None or remaining < timeout:
+                timeout = remaining
+        return timeout
+
+    async def run(self, handler):
+        # poll whenever an edge arrives or something is due
+        while True:
+            self.poll(handler)
+            timeout = self.timeout()
+            if timeout is None:
+                await self.flag.wait()
+            elif timeout:
+                await scheduler.wait_for_ms(self.flag.wait(), timeout)
+            else:
+                await scheduler.sleep_ms(0)
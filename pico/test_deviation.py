@@ -1,8 +1,10 @@
 from machine import Pin, I2C
 from mcp7940 import MCP7940
 import time
+from logger import Logger
 
-FILENAME = "calibration.txt"
+# binary drift log, decode with tools/read_drift_log.py
+log = Logger("drift")
 
 # setup led
 led = Pin("LED", Pin.OUT, value=0)
@@ -12,8 +14,9 @@ i2c = I2C(0, sda=Pin(20), scl=Pin(21), freq=2000000)
 mcp = MCP7940(i2c)
 
 # SET THE TRIM
-# mcp.set_trim(-127)
-mcp.set_trim(-29)
+# TRIM = -127
+TRIM = -29
+mcp.set_trim(TRIM)
 
 
 def time_diff_seconds(datetime1, datetime2):
@@ -36,8 +39,7 @@ local_sec = time_diff_seconds(local_time, start_time)
 rtc_sec = time_diff_seconds(rtc_time, start_time)
 printout = f"START - sec local: {local_sec}, sec rtc: {rtc_sec}, delta (rtc_sec - local_sec): {rtc_sec - local_sec}, trim: {mcp.get_trim()}"
 print(printout)
-with open(FILENAME, "w") as file:
-    file.write(f"{printout}\n")
+log.append(time.time(), local_sec, rtc_sec, TRIM)
 try:
     while True:
         local_time = time.localtime()
@@ -54,12 +56,12 @@ try:
             trimval = ppm * (32768 * 60) / (1000000 * 2)
             printout = f"sec local: {local_sec}, sec rtc: {rtc_sec}, delta (rtc_sec - local_sec): {rtc_sec - local_sec}, ppm: {ppm}, trimval: {trimval}"
             print(printout)
-            with open(FILENAME, "a") as file:
-                file.write(f"{printout}\n")
+            log.append(time.time(), local_sec, rtc_sec, TRIM)
 
             if ppm != 0:
                 led.on()
 
         time.sleep_ms(1)
 except KeyboardInterrupt:
+    log.flush()
     raise SystemExit
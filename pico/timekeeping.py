@@ -0,0 +1,332 @@
+import time
+from micropython import const
+import scheduler
+
+RTC_ADDRESS = const(0x6F)
+RTCSEC = const(0x00)
+CONTROL = const(0x07)
+SQWEN = const(0x40)
+SQWFS = const(0x03)
+ALMEN = const(0x30)
+
+MARGIN = const(1)  # ms after an expected rollover to read the rtc
+EARLY = const(3)  # ms before an expected rollover to start a phase check
+RETRY = const(1)  # ms between reads while waiting for a rollover
+POLL = const(20)  # ms between reads while not locked to the rtc
+TOLERANCE = const(20)  # ms a second may be off before the rtc counts as faulty
+PHASE_CHECK = const(10)  # seconds between phase checks
+
+
+def enable_square_wave(i2c):
+    # 1 hz square wave on the mfp pin, rising with every new second
+    control = i2c.readfrom_mem(RTC_ADDRESS, CONTROL, 1)[0]
+    control = (control | SQWEN) & ~(SQWFS | ALMEN) & 0xFF
+    i2c.writeto_mem(RTC_ADDRESS, CONTROL, bytes((control,)))
+
+
+def is_leap_year(year):
+    return (year % 4 == 0 and year % 100 != 0) or year % 400 == 0
+
+
+# value of every bcd byte, digits above 9 count as 0
+_BCD = bytes(
+    (byte >> 4) * 10 + (byte & 0x0F if byte & 0x0F < 10 else 0) for byte in range(256)
+)
+# days in the months before, in a year without a leap day (masked month 0 - 19,
+# the ones that don't exist have 31 like in the driver)
+_DAYS_BEFORE = tuple(
+    sum(28 if m == 2 else 30 if m in (4, 6, 9, 11) else 31 for m in range(1, month))
+    for month in range(20)
+)
+
+
+class RTCReader:
+    # reads the time registers of the mcp7940 in one burst into a buffer,
+    # and only builds a new datetime tuple when they changed, so polling the
+    # rtc doesn't allocate. the same tuples as mcp7940.MCP7940.time
+    def __init__(self, i2c):
+        self._i2c = i2c
+        self.raw = bytearray(7)  # rtcsec - rtcyear of the last read
+        self._previous = bytearray(7)
+        self._second = bytearray(1)
+        self._time = None
+
+    def read(self):
+        raw = self._previous
+        self._i2c.readfrom_mem_into(RTC_ADDRESS, RTCSEC, raw)
+        # the buffers swap, so the last read is kept without copying
+        self._previous = self.raw
+        self.raw = raw
+        if self._time is None or raw != self._previous:
+            self._time = self._decode(raw)
+        return self._time
+
+    def probe(self):
+        # only the seconds register, 0 - 59
+        self._i2c.readfrom_mem_into(RTC_ADDRESS, RTCSEC, self._second)
+        return _BCD[self._second[0] & 0x7F]
+
+    def _decode(self, raw):
+        year = 2000 + _BCD[raw[6]]
+        month = _BCD[raw[5] & 0x1F]
+        day = _BCD[raw[4] & 0x3F]
+        yday = _DAYS_BEFORE[month] + day
+        if month > 2 and is_leap_year(year):
+            yday += 1
+        return (
+            year,
+            month,
+            day,
+            _BCD[raw[2] & 0x3F],
+            _BCD[raw[1] & 0x7F],
+            _BCD[raw[0] & 0x7F],
+            (raw[3] & 0x07) - 1,
+            yday,
+        )
+
+
+def seconds(datetime):
+    # seconds since 2000-01-01 00:00:00
+    year, month, day = datetime[0], datetime[1], datetime[2]
+    # days since 2000-03-01, with the leap day at the end of the year
+    if month < 3:
+        year -= 1
+        month += 12
+    days = (
+        365 * (year - 2000)
+        + (year - 2000) // 4
+        - (year - 2000) // 100
+        + (year - 2000) // 400
+        + (153 * (month - 3) + 2) // 5
+        + day
+        - 1
+    )
+    return ((days + 60) * 24 + datetime[3]) * 3600 + datetime[4] * 60 + datetime[5]
+
+
+def from_seconds(value):
+    # the datetime tuple of seconds since 2000-01-01 00:00:00
+    days, value = divmod(value, 86400)
+    weekday = (days + 5) % 7  # a saturday
+    # days since 2000-03-01 in a 400 year cycle, with the leap day at the end
+    # of every year
+    cycles, days = divmod(days - 60, 146097)
+    years = (days - days // 1460 + days // 36524 - days // 146096) // 365
+    days -= 365 * years + years // 4 - years // 100
+    months = (5 * days + 2) // 153  # since march
+    day = days - (153 * months + 2) // 5 + 1
+    month = months + 3 if months < 10 else months - 9
+    year = 2000 + 400 * cycles + years + (1 if month < 3 else 0)
+    yday = _DAYS_BEFORE[month] + day
+    if month > 2 and is_leap_year(year):
+        yday += 1
+    hour, value = divmod(value, 3600)
+    return (year, month, day, hour, value // 60, value % 60, weekday, yday)
+
+
+def validate_datetime(datetime):
+    year = datetime[0]
+    month = datetime[1]
+    day = datetime[2]
+
+    if (month < 8 and month % 2 == 0 or month >= 8 and month % 2 == 1) and day > 30:
+        day = 30
+    if is_leap_year(year):
+        if day > 29:
+            day = 29
+    else:
+        if day > 28:
+            day = 28
+
+    if month < 1:
+        month = 1
+    elif month > 12:
+        month = 12
+
+    return (
+        year,
+        month,
+        day,
+        datetime[3],
+        datetime[4],
+        datetime[5],
+        datetime[6],
+        datetime[7],
+    )
+
+
+class RTCClock:
+    # keeps time with ticks_ms, anchored to the second rollovers of the rtc.
+    # once locked, the rtc is only read right after a rollover is due (or when
+    # the mfp square wave says it happened) and every PHASE_CHECK seconds a
+    # little before, to follow the drift between the two crystals. probe,
+    # if given, reads only the seconds, which is enough to tell that the
+    # second didn't change since a read less than a second ago.
+    def __init__(self, read, mfp=None, probe=None):
+        self._read = read
+        self._probe = probe
+        self.time = read()
+        self.anchor = time.ticks_ms()  # ticks of the last rollover
+        self.locked = False
+        self.reads = 1
+        self.faults = 0
+        self._last_read = self.anchor
+        self._uncertainty = POLL  # ms the anchor may be late
+        self._seconds = 0  # since the last phase check
+        self._retrying = False
+        self._deadline = time.ticks_add(self.anchor, POLL)
+        self._edge = None
+        self._flag = scheduler.Flag()
+        self._mfp = mfp
+        self._square_wave = mfp is not None
+        self.paused = False
+        if mfp is not None:
+            mfp.irq(self._on_edge, mfp.IRQ_RISING)
+
+    def _on_edge(self, pin):
+        self._edge = time.ticks_ms()
+        self._flag.set()
+
+    def set(self, datetime):
+        # the rtc was written, so lock to it again
+        self.time = datetime
+        self.anchor = time.ticks_ms()
+        self._unlock(self.anchor)
+        # the square wave restarts with the write, stop waiting for an edge
+        self._flag.set()
+
+    def square_wave(self, enabled):
+        # follow the square wave on the mfp, or leave the pin to the alarms.
+        # the lock holds either way
+        if self._mfp is None or enabled == self._square_wave:
+            return
+        self._square_wave = enabled
+        handler = self._on_edge if enabled and not self.paused else None
+        self._mfp.irq(handler, self._mfp.IRQ_RISING)
+        # stop waiting for an edge
+        self._flag.set()
+
+    def pause(self):
+        # stop reading the rtc (and waking up for the square wave)
+        self.paused = True
+        if self._square_wave:
+            self._mfp.irq(None)
+        self._unlock(time.ticks_ms())
+        self._flag.set()
+
+    def resume(self):
+        # catch up & lock to the rtc again
+        self.paused = False
+        if self._square_wave:
+            self._mfp.irq(self._on_edge, self._mfp.IRQ_RISING)
+        self.time = self._read()
+        self.reads += 1
+        self._last_read = time.ticks_ms()
+        self._unlock(self._last_read)
+        self._flag.set()
+
+    def _unlock(self, now):
+        self.locked = False
+        self._retrying = False
+        self._edge = None
+        self._deadline = time.ticks_add(now, POLL)
+
+    def _fault(self, now):
+        self.faults += 1
+        self._unlock(now)
+
+    def precise(self):
+        # True if the current second started at a known tick (a square wave
+        # edge or a rollover caught between two quick reads)
+        return self.locked and self._uncertainty <= RETRY
+
+    def elapsed_ms(self):
+        # ms since the current second started
+        return time.ticks_diff(time.ticks_ms(), self.anchor)
+
+    def check(self):
+        # read the rtc, returns True if a new second started
+        now = time.ticks_ms()
+        gap = time.ticks_diff(now, self._last_read)
+        if self._probe is not None and gap < 1000 and self._probe() == self.time[5]:
+            current = self.time
+        else:
+            current = self._read()
+        self.reads += 1
+        self._last_read = now
+
+        if current == self.time:
+            if not self.locked:
+                self._deadline = time.ticks_add(now, POLL)
+            elif time.ticks_diff(now, self.anchor) > 1000 + TOLERANCE:
+                # stuck
+                self._fault(now)
+            else:
+                self._retrying = True
+                self._deadline = time.ticks_add(now, RETRY)
+            return False
+
+        step = (current[5] - self.time[5]) % 60
+        if self._edge is not None and time.ticks_diff(now, self._edge) <= TOLERANCE:
+            rollover = self._edge
+            uncertainty = 0
+        elif gap < 2 * POLL:
+            # reading in short intervals, so it just rolled over
+            rollover = now
+            uncertainty = gap
+        elif self.locked and not self._retrying and self._seconds:
+            # the single read after the predicted rollover
+            rollover = time.ticks_add(self.anchor, 1000)
+            uncertainty = self._uncertainty
+        else:
+            # rolled over before a phase check began
+            rollover = None
+        self._edge = None
+        self._retrying = False
+        self.time = current
+
+        if rollover is None or (
+            self.locked
+            and (
+                step != 1
+                or abs(time.ticks_diff(rollover, self.anchor) - 1000) > TOLERANCE
+            )
+        ):
+            # skipped, or a second of the wrong length
+            self.anchor = now
+            self._fault(now)
+            return True
+
+        self.anchor = rollover
+        self._uncertainty = uncertainty
+        self.locked = True
+        self._seconds += 1
+        if uncertainty > RETRY or self._seconds >= PHASE_CHECK:
+            self._seconds = 0
+            self._deadline = time.ticks_add(
+                rollover, 1000 - uncertainty - EARLY - RETRY
+            )
+        else:
+            self._deadline = time.ticks_add(rollover, 1000 + MARGIN)
+        return True
+
+    async def wait(self):
+        # sleep until the rtc should be read again
+        if self._square_wave and self.locked and not self._retrying:
+            if self._edge is not None:
+                # already rolled over again
+                return
+            self._flag.clear()
+            if not await scheduler.wait_for_ms(self._flag.wait(), 1000 + TOLERANCE):
+                # no square wave (unless paused or set meanwhile), follow the
+                # rtc with the ticks from now on
+                if self.locked:
+                    self._square_wave = False
+                    self._fault(time.ticks_ms())
+            elif not self._square_wave and self.locked:
+                # the alarms took the mfp, the rollover is due as predicted
+                await scheduler.sleep_until(self._deadline)
+        else:
+            await scheduler.sleep_until(self._deadline)
+        while self.paused:
+            await self._flag.wait()
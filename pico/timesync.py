@@ -0,0 +1,58 @@
+import time
+import scheduler
+from timekeeping import seconds, from_seconds
+
+
+def whole_ms(text):
+    # ms as an int, floats on the pico can't hold ms since 2000
+    return int(text.split(".")[0])
+
+
+class TimeSync:
+    # sets the rtc from a host over the serial console, like ntp: the host
+    # sends `sync t1` with its time, the pico answers `sync t1 t2 t3` with
+    # its own when the line came in and when it answered, and the host notes
+    # t4 when the answer came back. times are ms since 2000-01-01 00:00:00,
+    # the pico's from the rtc seconds & the ticks since the last rollover.
+    # the host keeps the offset of the exchange with the shortest round trip
+    # (see tools/timesync.py) and sends `step offset`, then the rtc is set at
+    # the host's next second edge, as writing the seconds restarts the rtc's
+    # second. `offset offset` only follows the drift (in main.py).
+    def __init__(self, clock, write_time):
+        self._clock = clock  # timekeeping.RTCClock
+        self._write_time = write_time
+        self._offset = 0  # ms the rtc is ahead of the host, to step by
+        self._flag = scheduler.Flag()
+
+    def now_ms(self):
+        # ms since 2000 by the rtc, None unless its second is known to the ms
+        if not self._clock.precise():
+            return None
+        return seconds(self._clock.time) * 1000 + self._clock.elapsed_ms()
+
+    def sync(self, t1):
+        t2 = self.now_ms()
+        if t2 is None:
+            return "sync not locked to the rtc"
+        return "sync %s %d %d" % (t1, t2, self.now_ms())
+
+    def step(self, offset_ms):
+        # the answer comes at the second edge, from run()
+        self._offset = whole_ms(offset_ms)
+        self._flag.set()
+
+    async def run(self):
+        while True:
+            await self._flag.wait()
+            now = self.now_ms()
+            if now is None:
+                print("step not locked to the rtc")
+                continue
+            # the host's time, and ms until its next second
+            host = now - self._offset
+            wait = 1000 - host % 1000
+            deadline = time.ticks_add(time.ticks_ms(), wait)
+            await scheduler.sleep_until(deadline)
+            late = time.ticks_diff(time.ticks_ms(), deadline)
+            self._write_time(from_seconds((host + wait) // 1000))
+            print("step %d ms, %d ms late" % (-self._offset, late))
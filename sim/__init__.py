@@ -0,0 +1,254 @@
+"""Host-side simulator for the pico firmware.
+
+Runs the scripts in pico/ on CPython against fake `machine`, `_thread`,
+`rp2`, `uctypes` and `mcp7940` modules. Everything happens on a virtual
+clock, so hours of clock operation take seconds, and every SPI word, pin
+edge and PWM duty change is recorded with its timestamp in
+`Simulation.trace`.
+
+    from sim import Simulation
+
+    simulation = Simulation(start=(2024, 1, 1, 12, 0, 0))
+    simulation.press(27, at=2.0)
+    simulation.run("main.py", seconds=5)
+    print(simulation.trace.refresh_rate())
+"""
+
+import asyncio
+import datetime
+import gc
+import os
+import runpy
+import sys
+import tempfile
+import time
+
+from . import machine, micropython, mcp7940, rp2, thread, uctypes
+from .clock import SimulationEnd, VirtualClock
+from .loop import VirtualEventLoopPolicy
+from .max6921 import MAX6921Model
+from .rtc import ADDRESS, RTCSEC, ST, MCP7940Model
+from .trace import Trace
+
+PICO = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "pico")
+
+TICKS_PERIOD = 1 << 30
+
+# pins of the clock, see pico/main.py
+SWITCH_PINS = (26, 27, 28)
+FILAMENT_PIN = 18
+BOOST_PIN = 17
+SCK_PIN = 6
+MOSI_PIN = 7
+LOAD_PIN = 8
+BLANK_PIN = 9
+MFP_PIN = 19
+
+
+class Simulation:
+    def __init__(
+        self,
+        start=(2024, 1, 1, 12, 0, 0),
+        rtc_ppm=0.0,
+        mfp_pin=MFP_PIN,
+        tick_cost_us=1,
+        trace_kinds=None,
+        trace_maxlen=None,
+        files=None,
+        chips=1,
+        realtime=False,
+    ):
+        self.clock = VirtualClock(tick_cost_us, realtime)
+        self.trace = Trace(trace_kinds, trace_maxlen)
+        self.pins = {}
+        self.i2c_devices = {}
+        self.threads = []
+        self.irq_count = 0
+        self.irq_count_at_sleep = 0
+        self.start = datetime.datetime(*start[:6])
+
+        # the rtc kept running on its battery
+        self.rtc = MCP7940Model(self.clock, rtc_ppm, self.start)
+        self.rtc.regs[RTCSEC] |= ST
+        self.i2c_devices[ADDRESS] = self.rtc
+        self.mfp_pin = mfp_pin
+
+        # the chain of MAX6921s on the spi or the pio, and the pio & dma
+        self.shift_register = MAX6921Model(
+            self.trace, SCK_PIN, MOSI_PIN, LOAD_PIN, chips
+        )
+        self.memory = uctypes.Memory()
+        self.state_machines = {}
+        self.dma_channels = []
+
+        # flash file system, as files in a scratch directory. modules there
+        # take the place of the firmware's, e.g. a layout.py for more tubes
+        self.directory = tempfile.mkdtemp(prefix="pico-sim-")
+        for name, content in (files or {}).items():
+            mode = "wb" if isinstance(content, bytes) else "w"
+            with open(os.path.join(self.directory, name), mode) as file:
+                file.write(content)
+
+        self._inputs = []
+        self._saved = None
+
+    # inputs
+
+    def at(self, seconds, callback):
+        self._inputs.append((seconds, callback))
+
+    def set_pin(self, pin, level, at):
+        self.at(at, lambda: self.pins[pin].drive(level))
+
+    def press(self, pin, at, duration_ms=100, bounce_ms=0):
+        # a switch to ground with a pull-up, optionally bouncing on contact
+        if bounce_ms:
+            for i in range(4):
+                self.set_pin(pin, i % 2, at + i * bounce_ms / 4000)
+        self.set_pin(pin, 0, at + bounce_ms / 1000)
+        self.set_pin(pin, 1, at + duration_ms / 1000)
+
+    def pio_output(self, pin, level, when):
+        # a pin driven by a state machine
+        pin = machine.Pin(pin)
+        if level == pin._level:
+            return
+        pin._level = level
+        self.shift_register.edge(pin._id, level, when)
+        if self.shift_register.traced(pin._id):
+            self.trace.record(when, "pin", pin._id, level)
+
+    # fake modules
+
+    def _ticks_us(self):
+        self.clock.spend()
+        return self.clock.now % TICKS_PERIOD
+
+    def _ticks_ms(self):
+        self.clock.spend()
+        return self.clock.now // 1000 % TICKS_PERIOD
+
+    def _localtime(self, secs=None):
+        if secs is None:
+            now = self.start + datetime.timedelta(microseconds=self.clock.now)
+        else:
+            now = datetime.datetime(1970, 1, 1) + datetime.timedelta(seconds=secs)
+        return (
+            now.year,
+            now.month,
+            now.day,
+            now.hour,
+            now.minute,
+            now.second,
+            now.weekday(),
+            now.timetuple().tm_yday,
+        )
+
+    def _time(self):
+        now = self.start + datetime.timedelta(microseconds=self.clock.now)
+        return int((now - datetime.datetime(1970, 1, 1)).total_seconds())
+
+    def install(self):
+        clock = self.clock
+        machine._sim = self
+        thread._sim = self
+        rp2._sim = self
+        uctypes._sim = self
+
+        functions = {
+            "ticks_us": self._ticks_us,
+            "ticks_ms": self._ticks_ms,
+            "ticks_cpu": self._ticks_us,
+            "ticks_add": lambda ticks, delta: (ticks + delta) % TICKS_PERIOD,
+            "ticks_diff": lambda ticks1, ticks2: (
+                (ticks1 - ticks2 + TICKS_PERIOD // 2) % TICKS_PERIOD
+            )
+            - TICKS_PERIOD // 2,
+            "sleep": lambda seconds: clock.sleep(seconds * 1000000),
+            "sleep_ms": lambda ms: clock.sleep(ms * 1000),
+            "sleep_us": lambda us: clock.sleep(us),
+            "localtime": self._localtime,
+            "time": self._time,
+        }
+        modules = {
+            "machine": machine,
+            "_thread": thread,
+            "mcp7940": mcp7940,
+            "micropython": micropython,
+            "rp2": rp2,
+            "uctypes": uctypes,
+        }
+        self._saved = (
+            {name: getattr(time, name, None) for name in functions},
+            {name: sys.modules.get(name) for name in modules},
+            asyncio.get_event_loop_policy(),
+            list(sys.path),
+            os.getcwd(),
+        )
+        for name, function in functions.items():
+            setattr(time, name, function)
+        sys.modules.update(modules)
+        asyncio.set_event_loop_policy(VirtualEventLoopPolicy(clock))
+        sys.path.insert(0, PICO)
+        sys.path.insert(0, self.directory)
+        self._forget_firmware()
+        os.chdir(self.directory)
+
+        clock.attach()
+        for seconds, callback in self._inputs:
+            clock.schedule(round(seconds * 1000000), callback)
+        for pin in SWITCH_PINS:
+            machine.Pin(pin, machine.Pin.IN, machine.Pin.PULL_UP)
+        if self.mfp_pin is not None:
+            self.rtc.mfp = machine.Pin(
+                self.mfp_pin, machine.Pin.IN, machine.Pin.PULL_UP
+            )
+            self.rtc._schedule()
+
+    def uninstall(self):
+        functions, modules, policy, path, cwd = self._saved
+        for name, function in functions.items():
+            if function is None:
+                delattr(time, name)
+            else:
+                setattr(time, name, function)
+        for name, module in modules.items():
+            if module is None:
+                sys.modules.pop(name, None)
+            else:
+                sys.modules[name] = module
+        asyncio.set_event_loop_policy(policy)
+        # main.py turns the collector off, see pico/memory.py
+        gc.enable()
+        sys.path[:] = path
+        os.chdir(cwd)
+        self._forget_firmware()
+
+    def _forget_firmware(self):
+        # firmware modules keep state, so every run imports them fresh
+        for name, module in list(sys.modules.items()):
+            path = getattr(module, "__file__", None) or ""
+            if os.path.dirname(os.path.abspath(path)) in (PICO, self.directory):
+                del sys.modules[name]
+
+    # running
+
+    def run(self, script="main.py", seconds=1.0):
+        # run a pico script until `seconds` of virtual time have passed
+        self.install()
+        self.clock.limit = self.clock.now + round(seconds * 1000000)
+        try:
+            runpy.run_path(os.path.join(PICO, script), run_name="__main__")
+        except SimulationEnd:
+            pass
+        finally:
+            self.clock._end()
+            self.uninstall()
+        return self
+
+    def file(self, name):
+        path = os.path.join(self.directory, name)
+        if not os.path.exists(path):
+            return None
+        with open(path) as file:
+            return file.read()
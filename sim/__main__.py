@@ -0,0 +1,45 @@
+"""Run pico/main.py in the simulator and report display timing.
+
+python -m sim [seconds]
+"""
+
+import sys
+import time
+
+from . import BLANK_PIN, SWITCH_PINS, Simulation
+
+
+def main():
+    seconds = float(sys.argv[1]) if len(sys.argv) > 1 else 5.0
+    # between two second rollovers, so the change comes from the press
+    press_at = min(2.3, seconds / 2)
+
+    simulation = Simulation()
+    # toggle time / date once
+    simulation.press(SWITCH_PINS[1], at=press_at)
+
+    started = time.perf_counter()
+    simulation.run("main.py", seconds=seconds)
+    elapsed = time.perf_counter() - started
+
+    trace = simulation.trace
+    slots, frames = trace.refresh_rate()
+    shortest, mean, longest = trace.refresh_jitter()
+    on_times = trace.digit_on_times(BLANK_PIN)
+    latency = trace.latency(round(press_at * 1000000))
+
+    print(f"simulated {seconds:g} s in {elapsed:.2f} s")
+    print(f"refresh: {slots:.1f} digits/s, {frames:.1f} frames/s")
+    print(f"slot period: min {shortest} us, mean {mean:.1f} us, max {longest} us")
+    print(
+        "on-time per digit: "
+        + ", ".join(f"{on_time / seconds / 1000:.1f}" for on_time in on_times)
+        + " ms/s"
+    )
+    print(
+        "button to display: "
+        + ("no change" if latency is None else f"{latency / 1000:.1f} ms")
+    )
+
+
+main()
@@ -0,0 +1,186 @@
+import heapq
+import threading
+
+# before the simulation replaces time.sleep
+from time import perf_counter, sleep as wall_sleep
+
+
+class SimulationEnd(BaseException):
+    # derived from BaseException, so the `except Exception` handlers of the
+    # code under simulation don't swallow it
+    pass
+
+
+class VirtualClock:
+    """Virtual microsecond clock shared by all simulated cores.
+
+    Only one thread runs at a time. A thread hands over control whenever it
+    sleeps or spends time, and the thread (or scheduled event) with the
+    earliest wake-up time runs next. With the same inputs a simulation is
+    therefore fully deterministic, and idle time costs nothing.
+
+    With `realtime` the virtual time doesn't run ahead of the wall clock, for
+    talking to programs outside the simulation, e.g. over a pty.
+    """
+
+    def __init__(self, tick_cost_us=1, realtime=False):
+        self.now = 0
+        self.realtime = realtime
+        self._wall_start = None
+        self.limit = None
+        self.ended = False
+        # virtual time spent by every call to a ticks function
+        self.tick_cost_us = tick_cost_us
+        self._cond = threading.Condition(threading.RLock())
+        self._owner = None
+        self._waiting = {}
+        self._interruptible = set()
+        self._events = []
+        self._seq = 0
+        self._in_event = False
+
+    # threads
+
+    def attach(self):
+        # the calling thread becomes the running one
+        self._owner = threading.get_ident()
+
+    def spawn(self, function, args=()):
+        ready = threading.Event()
+
+        def run():
+            ident = threading.get_ident()
+            with self._cond:
+                self._waiting[ident] = (self.now, self._next_seq())
+                ready.set()
+                self._wait_for_turn(ident)
+            try:
+                function(*args)
+            except (SimulationEnd, SystemExit):
+                pass
+            finally:
+                self._retire(ident)
+
+        thread = threading.Thread(target=run, daemon=True)
+        thread.start()
+        ready.wait()
+        return thread
+
+    def _next_seq(self):
+        self._seq += 1
+        return self._seq
+
+    def _wait_for_turn(self, ident):
+        while self._owner != ident and not self.ended:
+            self._cond.wait()
+        self._waiting.pop(ident, None)
+        if self.ended:
+            raise SimulationEnd
+
+    def _retire(self, ident):
+        with self._cond:
+            self._waiting.pop(ident, None)
+            if self._owner == ident and not self.ended:
+                self._dispatch()
+
+    def _dispatch(self):
+        # run due events and pass control to the next thread, in time order
+        while True:
+            thread = min(self._waiting.items(), key=lambda item: item[1], default=None)
+            if self._events and (thread is None or self._events[0][:2] <= thread[1]):
+                when, _, callback = heapq.heappop(self._events)
+                self._advance(when)
+                self._in_event = True
+                try:
+                    callback()
+                finally:
+                    self._in_event = False
+                continue
+            if thread is None:
+                # nothing left to run
+                self._end()
+                return
+            self._advance(thread[1][0])
+            self._owner = thread[0]
+            self._cond.notify_all()
+            return
+
+    def _advance(self, when):
+        if when > self.now:
+            if self.limit is not None and when > self.limit:
+                self.now = self.limit
+                self._end()
+                raise SimulationEnd
+            self.now = when
+            if self.realtime:
+                self._keep_pace()
+
+    def _keep_pace(self):
+        # wait until the wall clock caught up with the virtual time
+        if self._wall_start is None:
+            self._wall_start = perf_counter() - self.now / 1000000
+        delay = self._wall_start + self.now / 1000000 - perf_counter()
+        if delay > 0:
+            wall_sleep(delay)
+
+    def _end(self):
+        with self._cond:
+            self.ended = True
+            self._cond.notify_all()
+
+    def sleep_until(self, when, interruptible=False):
+        # an interruptible sleep ends early when interrupt() is called
+        if self.ended:
+            raise SimulationEnd
+        if self._in_event:
+            # events (interrupt handlers) take no time
+            return
+        when = max(when, self.now)
+        # fast path: nobody else is due before us
+        if (not self._events or self._events[0][0] > when) and all(
+            wake > when for wake, _ in self._waiting.values()
+        ):
+            self._advance(when)
+            return
+        ident = threading.get_ident()
+        with self._cond:
+            self._waiting[ident] = (when, self._next_seq())
+            if interruptible:
+                self._interruptible.add(ident)
+            self._owner = None
+            try:
+                self._dispatch()
+                self._wait_for_turn(ident)
+            finally:
+                self._waiting.pop(ident, None)
+                self._interruptible.discard(ident)
+
+    def sleep(self, us, interruptible=False):
+        self.sleep_until(self.now + int(us), interruptible)
+
+    def interrupt(self):
+        # wake interruptible sleepers now, like an interrupt wakes a core
+        for ident in self._interruptible:
+            if ident in self._waiting and self._waiting[ident][0] > self.now:
+                self._waiting[ident] = (self.now, self._next_seq())
+
+    def spend(self, us=None):
+        self.sleep(self.tick_cost_us if us is None else us)
+
+    # events
+
+    def schedule(self, when, callback):
+        # run callback at virtual time `when` (in whichever thread is active)
+        heapq.heappush(self._events, (int(when), self._next_seq(), callback))
+
+    def after(self, us, callback):
+        self.schedule(self.now + us, callback)
+
+    def run(self, until):
+        # let virtual time pass on the calling thread
+        self.limit = until
+        try:
+            self.sleep_until(until)
+        except SimulationEnd:
+            pass
+        self._end()
@@ -0,0 +1,36 @@
+import asyncio
+import selectors
+
+
+class VirtualSelector(selectors.DefaultSelector):
+    # waiting for io becomes sleeping on the virtual clock
+    def __init__(self, clock):
+        super().__init__()
+        self._clock = clock
+
+    def select(self, timeout=None):
+        if not self._clock.ended:
+            if timeout is None:
+                # nothing scheduled, wait for an interrupt
+                timeout = 3600
+            if timeout > 0:
+                self._clock.sleep(round(timeout * 1000000), interruptible=True)
+        return super().select(0)
+
+
+class VirtualEventLoop(asyncio.SelectorEventLoop):
+    def __init__(self, clock):
+        super().__init__(VirtualSelector(clock))
+        self._clock = clock
+
+    def time(self):
+        return self._clock.now / 1000000
+
+
+class VirtualEventLoopPolicy(asyncio.DefaultEventLoopPolicy):
+    def __init__(self, clock):
+        super().__init__()
+        self._clock = clock
+
+    def new_event_loop(self):
+        return VirtualEventLoop(self._clock)
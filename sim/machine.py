@@ -0,0 +1,262 @@
+"""Fake `machine` module running on the simulation's virtual clock."""
+
+_sim = None  # the active Simulation, set by Simulation.install()
+
+_freq = 125000000
+
+
+def freq(hz=None):
+    global _freq
+    if hz is None:
+        return _freq
+    _freq = hz
+    _sim.trace.record(_sim.clock.now, "freq", None, hz)
+
+
+def idle():
+    _sim.clock.spend()
+
+
+def lightsleep(time_ms=None):
+    # sleep until the timeout or until any pin interrupt fires
+    clock = _sim.clock
+    deadline = None if time_ms is None else clock.now + time_ms * 1000
+    _sim.irq_count_at_sleep = _sim.irq_count
+    while _sim.irq_count == _sim.irq_count_at_sleep:
+        if deadline is not None and clock.now >= deadline:
+            break
+        step = 1000 if deadline is None else min(1000, deadline - clock.now)
+        clock.sleep(step, interruptible=True)
+
+
+def deepsleep(time_ms=None):
+    lightsleep(time_ms)
+    reset()
+
+
+def reset():
+    raise SystemExit("machine.reset()")
+
+
+def unique_id():
+    return b"\xe6\x61\x38\x52\x13\x4f\x2c\x2d"
+
+
+class Pin:
+    IN = 0
+    OUT = 1
+    OPEN_DRAIN = 2
+    ALT = 3
+    PULL_UP = 1
+    PULL_DOWN = 2
+    IRQ_FALLING = 4
+    IRQ_RISING = 8
+
+    def __new__(cls, id, *args, **kwargs):
+        # pins are shared by id, like the real hardware
+        pin = _sim.pins.get(id)
+        if pin is None:
+            pin = super().__new__(cls)
+            pin._id = id
+            pin._mode = cls.IN
+            pin._pull = None
+            pin._level = 0
+            pin._handler = None
+            pin._trigger = 0
+            pin._pio = False  # driven by a state machine
+            _sim.pins[id] = pin
+        return pin
+
+    def __init__(self, id, mode=-1, pull=-1, value=None, **kwargs):
+        self.init(mode, pull, value)
+
+    def init(self, mode=-1, pull=-1, value=None, **kwargs):
+        if mode != -1:
+            # back from the pio
+            self._mode = mode
+            self._pio = False
+        if pull != -1:
+            self._pull = pull
+            if pull == Pin.PULL_UP:
+                self._level = 1
+            elif pull == Pin.PULL_DOWN:
+                self._level = 0
+        if value is not None:
+            self.value(value)
+
+    def __repr__(self):
+        return f"Pin({self._id!r})"
+
+    def __call__(self, value=None):
+        return self.value(value)
+
+    def value(self, value=None):
+        if value is None:
+            return self._level
+        level = 1 if value else 0
+        if self._pio:
+            # the pio has it, the cpu's output level doesn't reach the pin
+            return
+        if self._mode == Pin.OUT:
+            if level != self._level:
+                _sim.trace.record(_sim.clock.now, "pin", self._id, level)
+                self._level = level
+                _sim.shift_register.edge(self._id, level, _sim.clock.now)
+            self._level = level
+        else:
+            # remembered for when the pin is switched to output
+            self._level = level
+
+    def on(self):
+        self.value(1)
+
+    def off(self):
+        self.value(0)
+
+    def high(self):
+        self.value(1)
+
+    def low(self):
+        self.value(0)
+
+    def toggle(self):
+        self.value(not self._level)
+
+    def irq(self, handler=None, trigger=IRQ_FALLING | IRQ_RISING, hard=False):
+        self._handler = handler
+        self._trigger = trigger if handler is not None else 0
+
+    # driven by the simulation
+
+    def drive(self, level):
+        # change the level of an input from outside, firing interrupts
+        level = 1 if level else 0
+        if level == self._level:
+            return
+        self._level = level
+        edge = Pin.IRQ_RISING if level else Pin.IRQ_FALLING
+        if self._handler is not None and self._trigger & edge:
+            _sim.irq_count += 1
+            self._handler(self)
+            _sim.clock.interrupt()
+
+
+class PWM:
+    def __init__(self, pin, freq=None, duty_u16=None, **kwargs):
+        self._pin = pin
+        self._freq = 0
+        self._duty = 0
+        if freq is not None:
+            self.freq(freq)
+        if duty_u16 is not None:
+            self.duty_u16(duty_u16)
+
+    def freq(self, value=None):
+        if value is None:
+            return self._freq
+        self._freq = value
+
+    def duty_u16(self, value=None):
+        if value is None:
+            return self._duty
+        value = int(value)
+        if value != self._duty:
+            _sim.trace.record(_sim.clock.now, "pwm", self._pin._id, value)
+        self._duty = value
+
+    def deinit(self):
+        self.duty_u16(0)
+
+
+class SPI:
+    MSB = 0
+    LSB = 1
+
+    def __init__(self, id, baudrate=1000000, **kwargs):
+        self._id = id
+        self._baudrate = baudrate
+
+    def init(self, baudrate=None, **kwargs):
+        if baudrate is not None:
+            self._baudrate = baudrate
+
+    def write(self, buf):
+        data = bytes(buf)
+        _sim.trace.record(_sim.clock.now, "spi", self._id, data)
+        if self._id == 0:
+            _sim.shift_register.write(data)
+        # time on the wire
+        _sim.clock.spend(len(data) * 8 * 1000000 // self._baudrate)
+
+    def deinit(self):
+        pass
+
+
+class I2C:
+    def __init__(self, id, freq=400000, **kwargs):
+        self._id = id
+        self._freq = freq
+
+    def _device(self, addr):
+        device = _sim.i2c_devices.get(addr)
+        if device is None:
+            raise OSError(5)  # EIO, nobody acknowledged
+        return device
+
+    def _transfer(self, nbytes):
+        # address + register + data bytes, 9 clocks each
+        _sim.clock.spend((nbytes + 2) * 9 * 1000000 // self._freq)
+
+    def scan(self):
+        return sorted(_sim.i2c_devices)
+
+    def readfrom_mem(self, addr, memaddr, nbytes, addrsize=8):
+        device = self._device(addr)
+        self._transfer(nbytes)
+        return bytes(device.read(memaddr, nbytes))
+
+    def readfrom_mem_into(self, addr, memaddr, buf, addrsize=8):
+        device = self._device(addr)
+        self._transfer(len(buf))
+        buf[:] = device.read(memaddr, len(buf))
+
+    def writeto_mem(self, addr, memaddr, buf, addrsize=8):
+        device = self._device(addr)
+        self._transfer(len(buf))
+        device.write(memaddr, bytes(buf))
+
+    def readfrom(self, addr, nbytes, stop=True):
+        return self.readfrom_mem(addr, 0, nbytes)
+
+    def writeto(self, addr, buf, stop=True):
+        if len(buf):
+            self.writeto_mem(addr, buf[0], buf[1:])
+        return len(buf)
+
+
+class Timer:
+    ONE_SHOT = 0
+    PERIODIC = 1
+
+    def __init__(self, id=-1, **kwargs):
+        self._generation = 0
+        if kwargs:
+            self.init(**kwargs)
+
+    def init(self, mode=PERIODIC, freq=None, period=None, callback=None, **kwargs):
+        self.deinit()
+        interval = 1000000 // freq if freq is not None else period * 1000
+        generation = self._generation
+
+        def fire():
+            if generation != self._generation:
+                return
+            if mode == Timer.PERIODIC:
+                _sim.clock.after(interval, fire)
+            if callback is not None:
+                callback(self)
+
+        _sim.clock.after(interval, fire)
+
+    def deinit(self):
+        self._generation += 1
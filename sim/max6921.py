@@ -0,0 +1,48 @@
+class MAX6921Model:
+    """Shift registers & latches of a chain of MAX6921s.
+
+    Bits come in from the spi writes or, for the pio refresh, on rising
+    clock edges. On the rising edge of load the chain takes the word in its
+    shift registers, which is recorded as ("latch", "max6921", bytes): the
+    words of all chips as a big endian number, the chip nearest to the pico
+    in the lowest 20 bits, if anything was shifted in since the last time.
+    The clock and data edges are too many to trace.
+    """
+
+    CHIP_BITS = 20
+
+    def __init__(self, trace, clock_pin, data_pin, load_pin, chips=1):
+        self.trace = trace
+        self.clock_pin = clock_pin
+        self.data_pin = data_pin
+        self.load_pin = load_pin
+        self.chips = chips
+        self.latched = 0
+        self._bits = chips * self.CHIP_BITS
+        self._shift = 0
+        self._shifted = False
+        self._data = 0
+
+    def traced(self, pin):
+        return pin != self.clock_pin and pin != self.data_pin
+
+    def _shift_in(self, bit):
+        self._shift = ((self._shift << 1) | bit) & ((1 << self._bits) - 1)
+        self._shifted = True
+
+    def write(self, data):
+        # spi, msb first
+        for byte in data:
+            for bit in range(7, -1, -1):
+                self._shift_in((byte >> bit) & 1)
+
+    def edge(self, pin, level, when):
+        if pin == self.data_pin:
+            self._data = level
+        elif pin == self.clock_pin and level:
+            self._shift_in(self._data)
+        elif pin == self.load_pin and level and self._shifted:
+            self._shifted = False
+            self.latched = self._shift
+            data = self._shift.to_bytes((self._bits + 7) // 8, "big")
+            self.trace.record(when, "latch", "max6921", data)
@@ -0,0 +1,97 @@
+"""Stand-in for the micropython-mcp7940 driver (pico/lib/micropython-mcp7940).
+
+Talks to the register model over the fake I2C bus, the same way the real
+driver talks to the chip.
+"""
+
+
+def bcd_to_int(bcd):
+    return (bcd >> 4) * 10 + (bcd & 0x0F)
+
+
+def int_to_bcd(i):
+    return (i // 10) << 4 | i % 10
+
+
+class MCP7940:
+    ADDRESS = 0x6F
+    RTCSEC = 0x00
+    ST = 7
+    RTCWKDAY = 0x03
+    VBATEN = 3
+    OSCTRIM = 0x08
+
+    def __init__(self, i2c, status=True, battery_enabled=True):
+        self._i2c = i2c
+        if battery_enabled:
+            self.battery_backup_enable(1)
+
+    def start(self):
+        self._set_bit(MCP7940.RTCSEC, MCP7940.ST, 1)
+
+    def stop(self):
+        self._set_bit(MCP7940.RTCSEC, MCP7940.ST, 0)
+
+    def is_started(self):
+        return self._read_bit(MCP7940.RTCSEC, MCP7940.ST)
+
+    def battery_backup_enable(self, enable):
+        self._set_bit(MCP7940.RTCWKDAY, MCP7940.VBATEN, enable)
+
+    def is_battery_backup_enabled(self):
+        return self._read_bit(MCP7940.RTCWKDAY, MCP7940.VBATEN)
+
+    def _set_bit(self, register, bit, value):
+        mask = 1 << bit
+        current = self._i2c.readfrom_mem(MCP7940.ADDRESS, register, 1)
+        updated = (current[0] & ~mask) | ((value << bit) & mask)
+        self._i2c.writeto_mem(MCP7940.ADDRESS, register, bytes([updated]))
+
+    def _read_bit(self, register, bit):
+        register_val = self._i2c.readfrom_mem(MCP7940.ADDRESS, register, 1)
+        return (register_val[0] & (1 << bit)) >> bit
+
+    @property
+    def time(self):
+        return self._get_time()
+
+    @time.setter
+    def time(self, t):
+        year, month, date, hours, minutes, seconds, wday, yday = t
+        # keep the oscillator & battery bits, like the fork of the driver
+        control = self._i2c.readfrom_mem(MCP7940.ADDRESS, 0x00, 4)
+        time_reg = [seconds, minutes, hours, wday + 1, date, month, year % 100]
+        reg_filter = (0x7F, 0x7F, 0x3F, 0x07, 0x3F, 0x3F, 0xFF)
+        t = [int_to_bcd(reg) & filt for reg, filt in zip(time_reg, reg_filter)]
+        t[0] |= control[0] & 0x80
+        t[3] |= control[3] & 0x08
+        self._i2c.writeto_mem(MCP7940.ADDRESS, 0x00, bytes(t))
+
+    def _get_time(self, start_reg=0x00):
+        time_reg = self._i2c.readfrom_mem(MCP7940.ADDRESS, start_reg, 7)
+        reg_filter = (0x7F, 0x7F, 0x3F, 0x07, 0x3F, 0x1F, 0xFF)
+        t = [bcd_to_int(reg & filt) for reg, filt in zip(time_reg, reg_filter)]
+        year = 2000 + t[6]
+        month = t[5]
+        date = t[4]
+        yday = date + sum(MCP7940._days_in_month(year, m) for m in range(1, month))
+        return (year, month, date, t[2], t[1], t[0], t[3] - 1, yday)
+
+    def set_trim(self, trim):
+        # each step adds (positive) or subtracts 2 clocks per minute
+        value = min(abs(int(trim)), 127) | (0x80 if trim >= 0 else 0)
+        self._i2c.writeto_mem(MCP7940.ADDRESS, MCP7940.OSCTRIM, bytes([value]))
+
+    def get_trim(self):
+        value = self._i2c.readfrom_mem(MCP7940.ADDRESS, MCP7940.OSCTRIM, 1)[0]
+        return value & 0x7F if value & 0x80 else -(value & 0x7F)
+
+    @staticmethod
+    def is_leap_year(year):
+        return (year % 4 == 0 and year % 100 != 0) or year % 400 == 0
+
+    @staticmethod
+    def _days_in_month(year, month):
+        if month == 2:
+            return 29 if MCP7940.is_leap_year(year) else 28
+        return 30 if month in (4, 6, 9, 11) else 31
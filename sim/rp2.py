@@ -0,0 +1,502 @@
+"""Fake `rp2` module: the pio assembler, an emulated state machine and dma.
+
+`asm_pio` assembles the program from the same Python syntax as on the pico.
+A `StateMachine` runs it instruction by instruction on the virtual clock,
+at its own clock frequency. Loops of a jmp onto itself are skipped in one
+go, so a state machine holding a digit for thousands of cycles costs no
+more than one that doesn't. The pins it drives are handed to
+`Simulation.pio_output`, where the MAX6921 model takes the words it shifts
+in. `DMA` channels copy words from the buffers (see `uctypes`) into a state
+machine's tx fifo as fast as it pulls them, chain to each other and call
+their interrupt handler when done.
+
+Only the instructions and options the firmware uses are implemented.
+"""
+
+import math
+import types
+from collections import deque
+
+from . import machine
+
+_sim = None  # the active Simulation, set by Simulation.install()
+
+FIFO_DEPTH = 4
+TREQ_PERMANENT = 0x3F
+
+
+class PIO:
+    IN_LOW = 0
+    IN_HIGH = 1
+    OUT_LOW = 2
+    OUT_HIGH = 3
+    SHIFT_LEFT = 0
+    SHIFT_RIGHT = 1
+    JOIN_NONE = 0
+    JOIN_TX = 1
+    JOIN_RX = 2
+
+
+# assembler
+
+
+class Instruction:
+    def __init__(self, op, *args):
+        self.op = op
+        self.args = args
+        self.side_value = None
+        self.delay_cycles = 0
+
+    def side(self, value):
+        self.side_value = value
+        return self
+
+    def delay(self, cycles):
+        self.delay_cycles = cycles
+        return self
+
+    def __getitem__(self, cycles):
+        return self.delay(cycles)
+
+    def __repr__(self):
+        return f"{self.op}{self.args} side {self.side_value} [{self.delay_cycles}]"
+
+
+class Program:
+    def __init__(self, options):
+        self.options = options
+        self.instructions = []
+        self.labels = {}
+        self.wrap_target = 0
+        self.wrap = None
+
+    def target(self, label):
+        return label if isinstance(label, int) else self.labels[label]
+
+
+def _operands(program):
+    # the names the program sees, like the globals asm_pio gives it on the pico
+    def emit(op):
+        def instruction(*args):
+            emitted = Instruction(op, *args)
+            program.instructions.append(emitted)
+            return emitted
+
+        return instruction
+
+    def label(name):
+        program.labels[name] = len(program.instructions)
+
+    def wrap_target():
+        program.wrap_target = len(program.instructions)
+
+    def wrap():
+        program.wrap = len(program.instructions) - 1
+
+    names = {
+        "label": label,
+        "wrap_target": wrap_target,
+        "wrap": wrap,
+        "nop": lambda: emit("mov")("y", "y"),
+    }
+    for op in ("jmp", "wait", "in_", "out", "push", "pull", "mov", "irq", "set"):
+        names[op] = emit(op)
+    for name in (
+        "pins",
+        "x",
+        "y",
+        "null",
+        "pindirs",
+        "pc",
+        "isr",
+        "osr",
+        "status",
+        "block",
+        "noblock",
+        "x_dec",
+        "y_dec",
+        "not_x",
+        "not_y",
+        "x_not_y",
+        "pin",
+        "not_osre",
+    ):
+        names[name] = name
+    return names
+
+
+def asm_pio(**options):
+    def assemble(function):
+        program = Program(options)
+        names = dict(function.__globals__)
+        names.update(_operands(program))
+        types.FunctionType(function.__code__, names, closure=function.__closure__)()
+        if program.wrap is None:
+            program.wrap = len(program.instructions) - 1
+        return program
+
+    return assemble
+
+
+def _pin_count(init):
+    if init is None:
+        return 0
+    return len(init) if isinstance(init, (tuple, list)) else 1
+
+
+def _pin_id(pin):
+    return pin._id if isinstance(pin, machine.Pin) else pin
+
+
+# state machine
+
+
+class StateMachine:
+    def __new__(cls, id, *args, **kwargs):
+        # shared by id, like the real hardware
+        machines = _sim.state_machines
+        sm = machines.get(id)
+        if sm is None:
+            sm = super().__new__(cls)
+            sm._id = id
+            sm._active = False
+            sm._stalled = True
+            sm._generation = 0
+            machines[id] = sm
+        return sm
+
+    def __init__(self, id, program=None, freq=-1, **kwargs):
+        if program is not None:
+            self.init(program, freq, **kwargs)
+
+    def init(
+        self,
+        program,
+        freq=-1,
+        *,
+        in_base=None,
+        out_base=None,
+        set_base=None,
+        jmp_pin=None,
+        sideset_base=None,
+        **kwargs,
+    ):
+        self.active(0)
+        self._program = program
+        self._freq = freq if freq > 0 else machine.freq()
+        options = program.options
+        self._out = _pin_id(out_base), _pin_count(options.get("out_init"))
+        self._set = _pin_id(set_base), _pin_count(options.get("set_init"))
+        self._sideset = _pin_id(sideset_base), _pin_count(options.get("sideset_init"))
+        self._shift_left = (
+            options.get("out_shiftdir", PIO.SHIFT_RIGHT) == PIO.SHIFT_LEFT
+        )
+        self._fifo = deque()
+        self._dma = None  # channel paced by this tx fifo
+        self.x = self.y = self.isr = self.osr = 0
+        self._osr_count = 32  # empty
+        self._pc = 0
+        self._origin = _sim.clock.now
+        self._cycles = 0
+        self._levels = {}
+        # the pins are taken over from the cpu, with their initial levels
+        bases = {
+            "out_init": self._out[0],
+            "set_init": self._set[0],
+            "sideset_init": self._sideset[0],
+        }
+        for key, base in bases.items():
+            init = options.get(key)
+            if init is None:
+                continue
+            inits = init if isinstance(init, (tuple, list)) else (init,)
+            for offset, mode in enumerate(inits):
+                pin = machine.Pin(base + offset)
+                pin._pio = True
+                self._drive(
+                    base + offset, 1 if mode == PIO.OUT_HIGH else 0, _sim.clock.now
+                )
+
+    def active(self, value=None):
+        if value is None:
+            return self._active
+        self._active = bool(value)
+        self._generation += 1
+        self._stalled = True
+        self._wake()
+
+    def restart(self):
+        self._pc = 0
+        self._osr_count = 32
+
+    def put(self, value, shift=0):
+        self._fifo.append((value << shift) & 0xFFFFFFFF)
+        self._wake()
+
+    def tx_fifo(self):
+        return len(self._fifo)
+
+    def exec(self, text):
+        program = Program({})
+        instruction = eval(text, _operands(program))
+        program.wrap = 0
+        # out of the program, no cycles spent
+        pc, cycles = self._pc, self._cycles
+        self._execute(instruction, program, _sim.clock.now)
+        self._pc, self._cycles = pc, cycles
+
+    # emulation
+
+    def _wake(self):
+        # run from now, if stalled on a pull
+        if self._active and self._stalled:
+            self._stalled = False
+            self._origin = _sim.clock.now
+            self._cycles = 0
+            generation = self._generation
+            _sim.clock.schedule(_sim.clock.now, lambda: self._run(generation))
+
+    def _time(self):
+        return self._origin + self._cycles * 1000000 / self._freq
+
+    def _run(self, generation):
+        clock = _sim.clock
+        program = self._program
+        while self._active and generation == self._generation:
+            when = self._time()
+            if when > clock.now:
+                clock.schedule(math.ceil(when), lambda: self._run(generation))
+                return
+            instruction = program.instructions[self._pc]
+            if not self._execute(instruction, program, when):
+                self._stalled = True
+                return
+
+    def _drive(self, pin, level, when):
+        if self._levels.get(pin) != level:
+            self._levels[pin] = level
+            _sim.pio_output(pin, level, round(when))
+
+    def _write_pins(self, group, value, when):
+        base, count = group
+        for bit in range(count):
+            self._drive(base + bit, (value >> bit) & 1, when)
+
+    def _source(self, name):
+        if name == "null":
+            return 0
+        if name == "pins":
+            return machine.Pin(self._out[0]).value()
+        return getattr(self, name)
+
+    def _store(self, name, value, when, group):
+        value &= 0xFFFFFFFF
+        if name == "pins":
+            self._write_pins(group, value, when)
+        elif name == "pc":
+            self._pc = value
+            return True
+        elif name == "osr":
+            self.osr = value
+            self._osr_count = 0
+        elif name != "null":
+            setattr(self, name, value)
+        return False
+
+    def _execute(self, instruction, program, when):
+        # returns False if the instruction stalls
+        op = instruction.op
+        args = instruction.args
+        following = self._pc + 1
+        cycles = 1 + instruction.delay_cycles
+
+        if op == "pull":
+            block = "noblock" not in args
+            if not self._fifo and self._dma is not None:
+                self._dma._service()
+            if self._fifo:
+                self.osr = self._fifo.popleft()
+                self._osr_count = 0
+                if self._dma is not None:
+                    self._dma._service()
+            elif block:
+                return False
+            else:
+                self.osr = self.x
+                self._osr_count = 0
+
+        if instruction.side_value is not None:
+            self._write_pins(self._sideset, instruction.side_value, when)
+
+        if op == "jmp":
+            condition, label = args if len(args) == 2 else (None, args[0])
+            target = program.target(label)
+            if condition in ("x_dec", "y_dec") and target == self._pc:
+                # a loop onto itself, all at once
+                register = condition[0]
+                cycles *= getattr(self, register) + 1
+                setattr(self, register, 0xFFFFFFFF)
+            else:
+                jump = condition is None
+                if condition == "not_x":
+                    jump = self.x == 0
+                elif condition == "not_y":
+                    jump = self.y == 0
+                elif condition in ("x_dec", "y_dec"):
+                    register = condition[0]
+                    value = getattr(self, register)
+                    jump = value != 0
+                    setattr(self, register, (value - 1) & 0xFFFFFFFF)
+                elif condition == "x_not_y":
+                    jump = self.x != self.y
+                elif condition == "not_osre":
+                    jump = self._osr_count < 32
+                if jump:
+                    following = target
+        elif op == "out":
+            destination, bits = args
+            bits = bits or 32
+            if self._shift_left:
+                value = self.osr >> (32 - bits)
+                self.osr = (self.osr << bits) & 0xFFFFFFFF
+            else:
+                value = self.osr & ((1 << bits) - 1)
+                self.osr >>= bits
+            self._osr_count = min(32, self._osr_count + bits)
+            if self._store(destination, value, when, self._out):
+                following = self._pc
+        elif op == "set":
+            destination, value = args
+            self._store(destination, value, when, self._set)
+        elif op == "mov":
+            destination, source = args
+            if self._store(destination, self._source(source), when, self._out):
+                following = self._pc
+        elif op != "pull":
+            raise NotImplementedError(f"pio instruction {instruction}")
+
+        if following == program.wrap + 1:
+            following = program.wrap_target
+        self._pc = following
+        self._cycles += cycles
+        return True
+
+
+# dma
+
+
+class _Register:
+    # a register of a channel, as a write target
+    def __init__(self, channel, index):
+        self.channel = channel
+        self.index = index
+
+
+class _Registers:
+    def __init__(self, channel):
+        self._channel = channel
+
+    def __getitem__(self, index):
+        start = index.start if isinstance(index, slice) else index
+        return _Register(self._channel, start)
+
+
+class DMA:
+    def __init__(self):
+        # the lowest free channel
+        channels = _sim.dma_channels
+        if None in channels:
+            self.channel = channels.index(None)
+            channels[self.channel] = self
+        else:
+            self.channel = len(channels)
+            channels.append(self)
+        self.registers = _Registers(self)
+        self._ctrl = self.pack_ctrl()
+        self._read = 0
+        self._write = None
+        self._count = 0
+        self._remaining = 0
+        self._active = False
+        self._handler = None
+
+    def pack_ctrl(self, default=None, **kwargs):
+        ctrl = dict(
+            enable=True,
+            size=2,
+            inc_read=True,
+            inc_write=True,
+            chain_to=self.channel,
+            treq_sel=TREQ_PERMANENT,
+            irq_quiet=True,
+            bswap=False,
+        )
+        if default is not None:
+            ctrl.update(default)
+        ctrl.update(kwargs)
+        return ctrl
+
+    def config(self, read=None, write=None, count=None, ctrl=None, trigger=False):
+        if read is not None:
+            self._read = read if isinstance(read, int) else _sim.memory.address(read)
+        if write is not None:
+            self._write = write
+            if isinstance(write, StateMachine):
+                write._dma = self
+        if count is not None:
+            self._count = count
+        if ctrl is not None:
+            self._ctrl = ctrl
+        if trigger:
+            self._trigger()
+
+    def irq(self, handler=None, hard=False):
+        self._handler = handler
+
+    def active(self, value=None):
+        if value is None:
+            return self._active
+        if value:
+            self._trigger()
+        else:
+            self._active = False
+
+    def close(self):
+        self._active = False
+        self._handler = None
+        _sim.dma_channels[self.channel] = None
+
+    def _trigger(self):
+        self._active = True
+        self._remaining = self._count
+        self._service()
+
+    def _service(self):
+        # move words while the target takes them, paced like the dreq
+        ctrl = self._ctrl
+        while self._active and self._remaining:
+            target = self._write
+            if isinstance(target, StateMachine) and len(target._fifo) >= FIFO_DEPTH:
+                return
+            word = _sim.memory.read32(self._read)
+            if ctrl["bswap"]:
+                word = int.from_bytes(word.to_bytes(4, "little"), "big")
+            if ctrl["inc_read"]:
+                self._read += 4
+            self._remaining -= 1
+            if isinstance(target, StateMachine):
+                target._fifo.append(word)
+                target._wake()
+            elif isinstance(target, _Register) and target.index == 15:
+                # read address, trigger
+                target.channel._read = word
+                target.channel._trigger()
+            else:
+                raise NotImplementedError(f"dma write to {target!r}")
+        if self._active and not self._remaining:
+            self._active = False
+            # the chain starts before the interrupt is taken
+            if ctrl["chain_to"] != self.channel:
+                _sim.dma_channels[ctrl["chain_to"]]._trigger()
+            if not ctrl["irq_quiet"] and self._handler is not None:
+                self._handler(self)
@@ -0,0 +1,244 @@
+import datetime
+
+ADDRESS = 0x6F
+
+# registers
+RTCSEC = 0x00
+RTCWKDAY = 0x03
+CONTROL = 0x07
+OSCTRIM = 0x08
+ALM0SEC = 0x0A
+ALM1SEC = 0x11
+ALM_SIZE = 7
+SRAM = 0x20
+SRAM_SIZE = 0x40
+
+# bits
+ST = 0x80  # RTCSEC, oscillator start
+OSCRUN = 0x20  # RTCWKDAY, oscillator running
+VBATEN = 0x08  # RTCWKDAY, battery backup
+OUT = 0x80  # CONTROL, mfp level in general purpose output mode
+SQWEN = 0x40  # CONTROL, square wave output
+ALM1EN = 0x20  # CONTROL
+ALM0EN = 0x10  # CONTROL
+CRSTRIM = 0x04  # CONTROL, coarse trim mode
+ALMPOL = 0x80  # ALMxWKDAY, alarm polarity
+ALMIF = 0x08  # ALMxWKDAY, alarm interrupt flag
+
+EPOCH = datetime.datetime(2000, 1, 1)
+
+SQW_FREQUENCIES = (1, 4096, 8192, 32768)
+
+
+def bcd(value):
+    return (value // 10) << 4 | value % 10
+
+
+def unbcd(value):
+    return (value >> 4) * 10 + (value & 0x0F)
+
+
+class MCP7940Model:
+    """Register level model of the MCP7940N on the virtual clock.
+
+    The oscillator runs `ppm` too fast (negative: too slow) before the
+    digital trim in OSCTRIM is applied. Alarms and the square wave are
+    driven out on `mfp`, a simulated input Pin of the Pico, if connected.
+    """
+
+    def __init__(self, clock, ppm=0.0, now=None):
+        self.clock = clock
+        self.ppm = ppm
+        self.mfp = None
+        self.regs = bytearray(0x60)
+        self.reads = 0
+        self._anchor_us = clock.now  # virtual time of the last re-anchoring
+        self._rtc_us = 0.0  # rtc time since EPOCH at the anchor
+        self._wkday = 1
+        self._matched = [False, False]
+        self._event_generation = 0
+        if now is not None:
+            self.set_datetime(now)
+
+    # time keeping
+
+    def running(self):
+        return bool(self.regs[RTCSEC] & ST)
+
+    def trim_ppm(self):
+        trim = self.regs[OSCTRIM]
+        # each step adds or subtracts 2 clocks per minute
+        steps = trim & 0x7F
+        sign = 1 if trim & 0x80 else -1
+        if self.regs[CONTROL] & CRSTRIM:
+            # applied 128 times a second instead of once a minute
+            return sign * steps * 2 * 128 / 32768 * 1000000
+        return sign * steps * 2 / (32768 * 60) * 1000000
+
+    def rate(self):
+        return (1 + self.ppm / 1000000) * (1 + self.trim_ppm() / 1000000)
+
+    def rtc_us(self):
+        if not self.running():
+            return self._rtc_us
+        return self._rtc_us + (self.clock.now - self._anchor_us) * self.rate()
+
+    def _reanchor(self):
+        self._wkday = self._current_wkday()
+        self._rtc_us = self.rtc_us()
+        self._anchor_us = self.clock.now
+
+    def _current_wkday(self):
+        days = int(self.rtc_us() // 86400000000) - int(self._rtc_us // 86400000000)
+        return (self._wkday - 1 + days) % 7 + 1
+
+    def datetime(self):
+        return EPOCH + datetime.timedelta(microseconds=int(self.rtc_us()))
+
+    def set_datetime(self, value):
+        # set the time registers directly, like the battery kept them
+        if isinstance(value, tuple):
+            value = datetime.datetime(*value[:6])
+        self._rtc_us = (value - EPOCH) / datetime.timedelta(microseconds=1)
+        self._anchor_us = self.clock.now
+        self._wkday = value.isoweekday()
+        self._schedule()
+
+    def _encode_time(self):
+        now = self.datetime()
+        wkday = self._current_wkday()
+        regs = self.regs
+        regs[RTCSEC] = (regs[RTCSEC] & ST) | bcd(now.second)
+        regs[0x01] = bcd(now.minute)
+        regs[0x02] = bcd(now.hour)
+        regs[RTCWKDAY] = (regs[RTCWKDAY] & (VBATEN | OSCRUN)) | wkday
+        if self.running():
+            regs[RTCWKDAY] |= OSCRUN
+        else:
+            regs[RTCWKDAY] &= ~OSCRUN & 0xFF
+        regs[0x04] = bcd(now.day)
+        leap = 0x20 if now.year % 4 == 0 else 0
+        regs[0x05] = leap | bcd(now.month)
+        regs[0x06] = bcd(now.year % 100)
+
+    def _decode_time(self):
+        regs = self.regs
+        value = datetime.datetime(
+            2000 + unbcd(regs[0x06]),
+            max(1, unbcd(regs[0x05] & 0x1F)),
+            max(1, unbcd(regs[0x04] & 0x3F)),
+            unbcd(regs[0x02] & 0x3F),
+            unbcd(regs[0x01] & 0x7F),
+            unbcd(regs[RTCSEC] & 0x7F),
+        )
+        # writing the seconds resets the prescaler
+        self._rtc_us = (value - EPOCH) / datetime.timedelta(microseconds=1)
+        self._anchor_us = self.clock.now
+        self._wkday = (regs[RTCWKDAY] & 0x07) or 1
+
+    # i2c device interface
+
+    def read(self, memaddr, nbytes):
+        self.reads += 1
+        if memaddr < 0x07:
+            self._encode_time()
+        return bytes(self.regs[(memaddr + i) % 0x60] for i in range(nbytes))
+
+    def write(self, memaddr, data):
+        if memaddr <= OSCTRIM:
+            self._reanchor()
+            self._encode_time()
+        for i, value in enumerate(data):
+            self.regs[(memaddr + i) % 0x60] = value
+        if memaddr < 0x07:
+            self._decode_time()
+        self._schedule()
+
+    # mfp output
+
+    def _mfp_level(self):
+        control = self.regs[CONTROL]
+        if control & SQWEN:
+            return None  # handled by the square wave events
+        if control & (ALM0EN | ALM1EN):
+            level = 0
+            for base, enable in ((ALM0SEC, ALM0EN), (ALM1SEC, ALM1EN)):
+                if control & enable and self.regs[base + 3] & ALMIF:
+                    level = 1
+            polarity = self.regs[ALM0SEC + 3] & ALMPOL
+            # an active-low alarm output idles high
+            return level if polarity else 1 - level
+        return 1 if control & OUT else 0
+
+    def _update_mfp(self):
+        level = self._mfp_level()
+        if level is not None and self.mfp is not None:
+            self.mfp.drive(level)
+
+    def _schedule(self):
+        # (re)schedule the next second / square wave edge
+        self._event_generation += 1
+        self._update_mfp()
+        if not self.running():
+            return
+        generation = self._event_generation
+        control = self.regs[CONTROL]
+        if control & SQWEN:
+            frequency = 64 if control & CRSTRIM else SQW_FREQUENCIES[control & 0x03]
+            edges = frequency * 2
+        else:
+            edges = 1
+        rtc_us = self.rtc_us()
+        step = 1000000 / edges
+        index = int(rtc_us // step) + 1
+        delay = (index * step - rtc_us) / self.rate()
+        self.clock.after(
+            max(1, round(delay)), lambda: self._edge(generation, edges, index)
+        )
+
+    def _edge(self, generation, edges, index):
+        # index counts the edges (half periods) since EPOCH, so rounding of
+        # the virtual time can't skip or repeat one
+        if generation != self._event_generation:
+            return
+        if self.regs[CONTROL] & SQWEN and self.mfp is not None:
+            # high during the first half of every period
+            self.mfp.drive(index % 2 == 0)
+        if index % edges == 0:
+            self._check_alarms()
+        self._schedule()
+
+    def _check_alarms(self):
+        self._encode_time()
+        control = self.regs[CONTROL]
+        for index, (base, enable) in enumerate(((ALM0SEC, ALM0EN), (ALM1SEC, ALM1EN))):
+            mask = (self.regs[base + 3] >> 4) & 0x07
+            matched = bool(control & enable) and self._alarm_matches(base, mask)
+            # the flag is set when the match starts, not while it lasts
+            if matched and not self._matched[index]:
+                self.regs[base + 3] |= ALMIF
+            self._matched[index] = matched
+
+    def _alarm_matches(self, base, mask):
+        # fields compared for every ALMxMSK setting
+
+        regs = self.regs
+        seconds = regs[RTCSEC] & 0x7F == regs[base] & 0x7F
+        minutes = regs[0x01] & 0x7F == regs[base + 1] & 0x7F
+        hours = regs[0x02] & 0x3F == regs[base + 2] & 0x3F
+        wkday = regs[RTCWKDAY] & 0x07 == regs[base + 3] & 0x07
+        date = regs[0x04] & 0x3F == regs[base + 4] & 0x3F
+        month = regs[0x05] & 0x1F == regs[base + 5] & 0x1F
+        if mask == 0:
+            return seconds
+        if mask == 1:
+            return minutes
+        if mask == 2:
+            return hours
+        if mask == 3:
+            return wkday
+        if mask == 4:
+            return date
+        if mask == 7:
+            return seconds and minutes and hours and wkday and date and month
+        return False
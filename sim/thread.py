@@ -0,0 +1,61 @@
+"""Fake `_thread` module, core 1 becomes a thread on the virtual clock."""
+
+_sim = None  # the active Simulation, set by Simulation.install()
+
+
+class LockType:
+    # a lock that waits in virtual time, so it can't deadlock the clock
+    def __init__(self):
+        self._locked = False
+        _sim.clock.interrupt()
+
+    def acquire(self, waitflag=1, timeout=-1):
+        clock = _sim.clock
+        deadline = None if timeout < 0 else clock.now + int(timeout * 1000000)
+        while self._locked:
+            if not waitflag or (deadline is not None and clock.now >= deadline):
+                return False
+            # woken early by release()
+            step = 1000 if deadline is None else min(1000, deadline - clock.now)
+            clock.sleep(step, interruptible=True)
+        self._locked = True
+        return True
+
+    def release(self):
+        if not self._locked:
+            raise RuntimeError("release unlocked lock")
+        self._locked = False
+
+    def locked(self):
+        return self._locked
+
+    def __enter__(self):
+        self.acquire()
+        return self
+
+    def __exit__(self, *args):
+        self.release()
+
+
+def allocate_lock():
+    return LockType()
+
+
+def start_new_thread(function, args, kwargs=None):
+    thread = _sim.clock.spawn(function, tuple(args))
+    _sim.threads.append(thread)
+    return thread.ident
+
+
+def exit():
+    raise SystemExit
+
+
+def get_ident():
+    import threading
+
+    return threading.get_ident()
+
+
+def stack_size(size=None):
+    return 0
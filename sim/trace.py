@@ -0,0 +1,141 @@
+from collections import deque
+
+# MAX6921 grid bits of the iv-18 digits d0 - d8, see pico/font.py
+GRIDS = (1 << 7, 1 << 0, 1 << 6, 1 << 1, 1 << 5, 1 << 2, 1 << 3, 1 << 4, 1 << 8)
+GRID_MASK = sum(GRIDS)
+
+
+class Trace:
+    """Timestamped record of everything the firmware drives.
+
+    Entries are (time_us, kind, key, value) tuples:
+
+    - ("spi", bus, bytes) for every SPI write
+    - ("latch", "max6921", bytes) for every word the MAX6921s latch, the
+      chip nearest to the pico in the lowest 20 bits (see sim/max6921.py)
+    - ("pin", pin id, level) for every output level change
+    - ("pwm", pin id, duty_u16) for every PWM duty change
+    - ("freq", None, hz) for every system clock change
+    """
+
+    def __init__(self, kinds=None, maxlen=None):
+        self.kinds = kinds
+        self.entries = deque(maxlen=maxlen)
+
+    def record(self, when, kind, key, value):
+        if self.kinds is None or kind in self.kinds:
+            self.entries.append((when, kind, key, value))
+
+    def select(self, kind, key=None, start=0, end=None):
+        for entry in self.entries:
+            if (
+                entry[1] == kind
+                and (key is None or entry[2] == key)
+                and entry[0] >= start
+                and (end is None or entry[0] < end)
+            ):
+                yield entry
+
+    # display analysis
+
+    def words(self, start=0, end=None):
+        # (time, word) of every word the MAX6921s latched, the digit of the
+        # first chip in the lowest 20 bits
+        for when, _, _, data in self.select("latch", start=start, end=end):
+            yield when, int.from_bytes(data, "big")
+
+    def refresh_rate(self, start=0, end=None):
+        # digit slots and whole frames per second
+        times = [when for when, _ in self.words(start, end)]
+        if len(times) < 2:
+            return 0.0, 0.0
+        slots = (len(times) - 1) / ((times[-1] - times[0]) / 1000000)
+        return slots, slots / len(GRIDS)
+
+    def refresh_jitter(self, start=0, end=None):
+        # min, mean & max time between digit slots in us
+        times = [when for when, _ in self.words(start, end)]
+        periods = [b - a for a, b in zip(times, times[1:])]
+        if not periods:
+            return 0, 0.0, 0
+        return min(periods), sum(periods) / len(periods), max(periods)
+
+    def scans(self, start=0, end=None):
+        # (time, words) of every complete scan through the digits d0 - d8
+        words = None
+        for when, word in self.words(start, end):
+            index = _digit(word)
+            if index == 0:
+                began = when
+                words = [word]
+            elif words is not None and index == len(words):
+                words.append(word)
+                if len(words) == len(GRIDS):
+                    yield began, tuple(words)
+                    words = None
+            else:
+                words = None
+
+    def frames(self, start=0, end=None):
+        # (time, words, scans) of every frame shown, as long as it lasted
+        current = None
+        for when, words in self.scans(start, end):
+            if current is not None and current[1] == words:
+                current[2] += 1
+                continue
+            if current is not None:
+                yield tuple(current)
+            current = [when, words, 1]
+        if current is not None:
+            yield tuple(current)
+
+    def digit_on_times(self, blank_pin, start=0, end=None):
+        # total time every digit of the first chip was lit (blank low), in us
+        on_times = [0] * len(GRIDS)
+        word = 0
+        lit_since = None
+        for when, kind, key, value in self.entries:
+            if when < start or (end is not None and when >= end):
+                continue
+            if kind == "latch":
+                word = int.from_bytes(value, "big")
+                continue
+            if kind != "pin" or key != blank_pin:
+                continue
+            if value == 0:
+                lit_since = when
+            elif lit_since is not None:
+                for index, grid in enumerate(GRIDS):
+                    if word & grid:
+                        on_times[index] += when - lit_since
+                lit_since = None
+        return on_times
+
+    def frame_at(self, when):
+        # the last word sent for every digit before `when`
+        frame = [None] * len(GRIDS)
+        for _, word in self.words(end=when):
+            for index, grid in enumerate(GRIDS):
+                if word & grid:
+                    frame[index] = word
+        return frame
+
+    def first_change_after(self, when):
+        # time the tube first showed something new after `when`
+        frame = self.frame_at(when)
+        for sent, word in self.words(start=when):
+            for index, grid in enumerate(GRIDS):
+                if word & grid and frame[index] is not None and frame[index] != word:
+                    return sent
+        return None
+
+    def latency(self, when):
+        change = self.first_change_after(when)
+        return None if change is None else change - when
+
+
+def _digit(word):
+    for index, grid in enumerate(GRIDS):
+        if word & grid:
+            return index
+    return None
@@ -0,0 +1,38 @@
+"""Fake `uctypes` module, only `addressof`.
+
+Buffers get made up addresses in the pico's sram, so the fake dma in
+`rp2` can read them back.
+"""
+
+_sim = None  # the active Simulation, set by Simulation.install()
+
+SRAM = 0x20000000
+
+
+class Memory:
+    def __init__(self):
+        self._buffers = []  # (address, buffer)
+        self._next = SRAM
+
+    def address(self, buffer):
+        for address, known in self._buffers:
+            if known is buffer:
+                return address
+        address = self._next
+        size = memoryview(buffer).nbytes
+        # word aligned, with a gap so an overrun doesn't land in the next one
+        self._next += (size + 3) // 4 * 4 + 64
+        self._buffers.append((address, buffer))
+        return address
+
+    def read32(self, address):
+        for start, buffer in self._buffers:
+            data = memoryview(buffer).cast("B")
+            if start <= address and address + 4 <= start + len(data):
+                offset = address - start
+                return int.from_bytes(data[offset : offset + 4], "little")
+        raise MemoryError(f"dma read from unmapped address 0x{address:08x}")
+
+
+def addressof(buffer):
+    return _sim.memory.address(buffer)
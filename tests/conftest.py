@@ -0,0 +1,52 @@
+import os
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path[:0] = [ROOT, os.path.join(ROOT, "pico")]
+
+from sim import Simulation, machine, micropython  # noqa: E402
+
+# for the firmware modules the tests import themselves, the simulator only
+# installs its fake modules while it runs
+sys.modules.setdefault("machine", machine)
+sys.modules.setdefault("micropython", micropython)
+
+SLOTS = {"pio": 4000, "core 1": 1000}  # refresh slots per second
+REFRESHES = sorted(SLOTS)
+# without a pio_refresh.py, main.py refreshes the tube on core 1
+CORE_1 = {"pio_refresh.py": "raise ImportError('core 1')"}
+
+
+def at_us(seconds):
+    # the trace's timestamps
+    return round(seconds * 1000000)
+
+
+class SimRun:
+    # a pico script in the simulator, refreshed by the pio or on core 1, with
+    # what note() saw of its globals while it ran. options go to Simulation
+    def __init__(self, refresh="pio", files=None, **options):
+        files = dict(files or {})
+        if refresh == "core 1":
+            files.update(CORE_1)
+        self.refresh = refresh
+        self.simulation = Simulation(files=files, **options)
+        self.trace = self.simulation.trace
+        self.seen = {}
+
+    def note(self, name, at, function):
+        # seen[name] = function(the globals of the script) at `at` seconds
+        def note():
+            self.seen[name] = function(sys.modules["__main__"])
+
+        self.simulation.at(at, note)
+
+    def run(self, seconds, script="main.py"):
+        # main.py polls its console on stdin, which pytest replaces with one
+        # that can't be polled
+        with open(os.devnull) as stdin, pytest.MonkeyPatch.context() as patch:
+            patch.setattr(sys, "stdin", stdin)
+            self.simulation.run(script, seconds)
+        return self
@@ -0,0 +1,98 @@
+import pytest
+
+import font
+from alarms import ALM0SEC, after, daily
+from conftest import SimRun, at_us
+from framebuffer import CHIP_BITS
+from modes import ALARM_MARK, RING, TIME
+from sim import SWITCH_PINS
+
+HIGH, MIDDLE, LOW = SWITCH_PINS
+DIGIT_MASK = (1 << CHIP_BITS) - 1 - sum(font.GRIDS)
+MONDAY = (2024, 1, 1, 12, 0, 0, 0, 1)
+RINGS_AT = 60.0  # s, 12:01:00 from 12:00:00
+STOP_AT = 63.0
+END = 66.0
+
+
+@pytest.mark.parametrize(
+    "now, delay, expected",
+    [
+        (MONDAY, 60, (2024, 1, 1, 12, 1, 0, 0, 1)),
+        (MONDAY, 12 * 3600, (2024, 1, 2, 0, 0, 0, 1, 2)),
+        ((2024, 2, 28, 23, 30, 0, 2, 59), 3600, (2024, 2, 29, 0, 30, 0, 3, 60)),
+        ((2023, 12, 31, 23, 59, 59, 6, 365), 1, (2024, 1, 1, 0, 0, 0, 0, 1)),
+    ],
+)
+def test_after(now, delay, expected):
+    assert after(now, delay) == expected
+
+
+def test_after_counts_the_weekday_on_from_now():
+    # the rtc's weekday is only compared with itself, whatever day it calls it
+    now = MONDAY[:6] + (4,) + MONDAY[7:]
+    assert after(now, 3 * 86400)[6] == 0
+    assert after(now, 60)[6] == 4
+
+
+@pytest.mark.parametrize(
+    "hour, minute, expected",
+    [
+        (12, 1, (2024, 1, 1, 12, 1, 0, 0, 1)),
+        (23, 59, (2024, 1, 1, 23, 59, 0, 0, 1)),
+        (12, 0, (2024, 1, 2, 12, 0, 0, 1, 2)),  # now, so tomorrow
+        (7, 30, (2024, 1, 2, 7, 30, 0, 1, 2)),
+    ],
+)
+def test_daily(hour, minute, expected):
+    assert daily(MONDAY, hour, minute) == expected
+
+
+@pytest.fixture(scope="module")
+def alarm_run():
+    # main.py with its alarm set to 12:01 by the switches, as in the readme,
+    # stopped by the low switch a few seconds after it rang
+    alarm_run = SimRun("core 1")
+    simulation = alarm_run.simulation
+    simulation.press(HIGH, 1, 1000)
+    for index in range(13):
+        simulation.press(MIDDLE, 3 + index / 3)
+    for pin, at in ((HIGH, 9), (MIDDLE, 10), (HIGH, 11), (HIGH, 12)):
+        simulation.press(pin, at)
+    simulation.press(LOW, STOP_AT)
+    for name, at in (
+        ("set", RINGS_AT - 1),
+        ("ringing", RINGS_AT + 1),
+        ("stopped", END - 1),
+    ):
+        alarm_run.note(name, at, alarm)
+    return alarm_run.run(END)
+
+
+def alarm(main):
+    return main.state.mode, main.state.alarm_hour, main.state.alarm_minute
+
+
+def d8(alarm_run, start, end):
+    # what d8 showed in the frames between start & end
+    frames = alarm_run.trace.frames(at_us(start), at_us(end))
+    return [words[8] & DIGIT_MASK for _, words, _ in frames]
+
+
+def test_alarm_is_set(alarm_run):
+    assert alarm_run.seen["set"] == (TIME, 12, 1)
+
+
+def test_alarm_rings(alarm_run):
+    assert alarm_run.seen["ringing"][0] == RING
+    assert ALARM_MARK not in d8(alarm_run, RINGS_AT - 2, RINGS_AT)
+    assert ALARM_MARK in d8(alarm_run, RINGS_AT, STOP_AT)
+
+
+def test_a_switch_stops_the_ringing(alarm_run):
+    # and the alarm is set again for tomorrow
+    assert alarm_run.seen["stopped"] == (TIME, 12, 1)
+    registers = alarm_run.simulation.rtc.regs[ALM0SEC : ALM0SEC + 6]
+    # 12:01:00 on the 2nd of january, in bcd
+    assert [registers[index] for index in (0, 1, 2, 4, 5)] == [0, 1, 0x12, 2, 1]
+    assert ALARM_MARK not in d8(alarm_run, STOP_AT + 0.5, END)
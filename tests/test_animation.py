@@ -0,0 +1,56 @@
+import pytest
+
+from conftest import REFRESHES, SLOTS, SimRun, at_us
+from sim import SWITCH_PINS
+
+MIDDLE_SWITCH = SWITCH_PINS[1]  # time / date, with a fade
+DATE_AT = 2.3  # s, between two rollovers
+END = 4.0
+ANIMATION_FRAME = 100000  # us, frames of animations are shorter, the others last
+JITTER = 5  # us, a few calls to the ticks, which take 1 us in the simulator
+
+
+@pytest.fixture(scope="module", params=REFRESHES)
+def timing(request):
+    # the slot periods of main.py while it fades in, rolls on the rollovers
+    # & fades to the date, and while it shows a frame as it is
+    run = SimRun(request.param)
+    run.simulation.press(MIDDLE_SWITCH, DATE_AT)
+    run.run(END)
+    frames = [when for when, _, _ in run.trace.frames()]
+    animated = [
+        (start, end)
+        for start, end in zip(frames, frames[1:])
+        if end - start < ANIMATION_FRAME
+    ]
+    periods = {True: [], False: []}
+    words = [when for when, _ in run.trace.words(frames[0])]
+    for start, end in zip(words, words[1:]):
+        during = any(first <= start < last for first, last in animated)
+        periods[during].append(end - start)
+    return request.param, animated, periods[True], periods[False]
+
+
+def test_animations_were_played(timing):
+    _, animated, _, _ = timing
+    # the fade in, 2 rolls and the fade to the date
+    starts = [start for start, _ in animated]
+    assert starts[0] < at_us(0.1)
+    assert any(at_us(1) < start < at_us(1.1) for start in starts)
+    assert any(at_us(2) < start < at_us(2.1) for start in starts)
+    assert any(at_us(DATE_AT) <= start < at_us(DATE_AT + 0.1) for start in starts)
+
+
+def test_slot_rate_is_kept(timing):
+    refresh, _, animated, steady = timing
+    period = 1000000 / SLOTS[refresh]
+    assert len(animated) > 100
+    assert sum(animated) / len(animated) == pytest.approx(period, rel=0.01)
+    assert sum(steady) / len(steady) == pytest.approx(period, rel=0.01)
+
+
+def test_jitter_is_kept(timing):
+    refresh, _, animated, steady = timing
+    period = 1000000 // SLOTS[refresh]
+    jitter = max(abs(slot - period) for slot in steady)
+    assert max(abs(slot - period) for slot in animated) <= jitter + JITTER
@@ -0,0 +1,38 @@
+import os
+import re
+
+import pytest
+
+from calibration import OSCTRIM, STEP_PPM, trim_for
+from conftest import SimRun
+from settings import FILENAME, SIZE, SRAM
+
+TARGET_PPM = 0.2  # calibrate()'s default
+
+
+def register(trim):
+    # OSCTRIM: the steps, the sign bit set when clocks are added
+    return abs(trim) | (0x80 if trim > 0 else 0)
+
+
+@pytest.mark.parametrize("crystal_ppm", [12.3, -25.7, 3.05])
+def test_calibrates_a_known_crystal(crystal_ppm, capsys):
+    calibration = SimRun(rtc_ppm=crystal_ppm).run(200, "auto_calibration.py")
+    output = capsys.readouterr().out
+    measured = [
+        (float(ppm), float(error))
+        for ppm, error in re.findall(r"s: (-?[\d.]+) ppm \+- ([\d.]+)", output)
+    ]
+    ppm, error = measured[-1]
+    assert error <= TARGET_PPM
+    assert ppm == pytest.approx(crystal_ppm, abs=TARGET_PPM)
+    trim = trim_for(crystal_ppm)
+    assert abs(crystal_ppm + trim * STEP_PPM) <= STEP_PPM / 2
+    assert "trim: {}".format(trim) in output
+    simulation = calibration.simulation
+    regs = simulation.rtc.regs
+    assert regs[OSCTRIM] == register(trim)
+    # saved with the settings, the trim is their 4th byte, and on flash
+    assert regs[SRAM + 3] == trim & 0xFF
+    with open(os.path.join(simulation.directory, FILENAME), "rb") as file:
+        assert file.read() == regs[SRAM : SRAM + SIZE]
@@ -0,0 +1,84 @@
+import random
+
+import pytest
+
+import drift
+from calibration import STEP_PPM, trim_for
+from drift import MAX_TRIM_STEP, MIN_SPAN, DriftEstimator
+
+SAMPLE = 600  # s between samples, DRIFT_SAMPLE in main.py
+JITTER = 2  # ms the pico's ticks are off at a sample
+
+
+def sample(crystal_ppm, hours, estimator=None, seed=1, source=drift.PICO):
+    # samples at the rtc rollovers of a crystal crystal_ppm too fast, against
+    # a reference with some jitter, trimmed whenever the estimator says so.
+    # returns the estimator & the (s since the start, trim) of every change
+    jitter = random.Random(seed)
+    if estimator is None:
+        estimator = DriftEstimator(0)
+    reference = 0.0
+    changes = []
+    for index in range(1, hours * 3600 // SAMPLE + 1):
+        rate = (crystal_ppm + estimator.trim * STEP_PPM) / 1000000
+        reference += SAMPLE * 1000 / (1 + rate)
+        pico_ms = round(reference + jitter.uniform(-JITTER, JITTER))
+        trim = estimator.add(source, pico_ms, index * SAMPLE * 1000)
+        if trim is not None:
+            changes.append((index * SAMPLE, trim))
+    return estimator, changes
+
+
+@pytest.mark.parametrize("crystal_ppm", [7.3, -12.3, 3.05])
+def test_converges_to_the_trim_of_the_crystal(crystal_ppm):
+    estimator, _ = sample(crystal_ppm, 72)
+    assert estimator.trim == trim_for(crystal_ppm)
+    residual = crystal_ppm + estimator.trim * STEP_PPM
+    assert abs(residual) < STEP_PPM / 2
+    assert estimator.ppm == pytest.approx(residual, abs=0.1)
+
+
+def test_plus_7_3_ppm():
+    estimator, _ = sample(7.3, 72)
+    assert estimator.trim == -7
+    assert 7.3 + estimator.trim * STEP_PPM == pytest.approx(0.18, abs=0.01)
+
+
+def test_changes_are_limited_and_spaced():
+    _, changes = sample(-12.3, 72)
+    seconds = [0] + [second for second, _ in changes]
+    trims = [0] + [trim for _, trim in changes]
+    assert trims[-1] == trim_for(-12.3)
+    assert all(b - a >= MIN_SPAN for a, b in zip(seconds, seconds[1:]))
+    assert all(abs(b - a) <= MAX_TRIM_STEP for a, b in zip(trims, trims[1:]))
+
+
+def test_keeps_a_trim_within_the_hysteresis():
+    estimator, changes = sample(0.5, 72)
+    assert changes == []
+    assert estimator.ppm == pytest.approx(0.5, abs=0.1)
+
+
+def test_follows_the_trim_already_set():
+    estimator, changes = sample(7.3, 48, DriftEstimator(-7))
+    assert changes == []
+    assert estimator.ppm == pytest.approx(7.3 - 7 * STEP_PPM, abs=0.1)
+
+
+def test_a_jump_is_an_outlier():
+    estimator = DriftEstimator(0)
+    for index in range(10):
+        estimator.add(drift.PICO, index * 600000, index * 600000)
+    assert estimator.add(drift.PICO, 6000000, 6000000 + 3600000) is None
+    assert estimator.outliers == 1
+    # the rate carries on from the new offset
+    estimator.add(drift.PICO, 6600000, 6600000 + 3600000)
+    assert estimator.ppm == pytest.approx(0, abs=0.1)
+
+
+def test_serial_reference_holds_the_pico_out():
+    estimator, _ = sample(7.3, 2, source=drift.SERIAL)
+    samples = estimator.samples
+    assert estimator.add(drift.PICO, 0, 2 * 3600 * 1000) is None
+    assert estimator.source == drift.SERIAL
+    assert estimator.samples == samples
@@ -0,0 +1,89 @@
+import tracemalloc
+
+import font
+import formatter
+from formatter import date_to_display, time_to_display
+
+# the usual seven segment bytes, bits a - g & the dot from bit 0 on, and the
+# MAX6921 outputs the board wires those segments to, kept apart from font.py
+SEGMENT_BYTES = {
+    " ": 0x00,
+    "0": 0x3F,
+    "1": 0x06,
+    "2": 0x5B,
+    "3": 0x4F,
+    "4": 0x66,
+    "5": 0x6D,
+    "6": 0x7D,
+    "7": 0x07,
+    "8": 0x7F,
+    "9": 0x6F,
+    "-": 0x40,
+    ".": 0x80,
+    "A": 0x77,  # the alarm ringing
+    "t": 0x78,  # the timer ringing
+}
+OUTPUTS = (9, 11, 14, 15, 13, 12, 10, 16)  # a, b, c, d, e, f, g, dot
+
+
+def code(character):
+    byte = SEGMENT_BYTES[character]
+    return sum(1 << output for bit, output in enumerate(OUTPUTS) if byte >> bit & 1)
+
+
+def glyphs(text):
+    # the codes of text, right to left like the tube, a trailing "." lights
+    # the dot of the digit before it
+    codes = []
+    for character in text:
+        if character == ".":
+            codes[-1] |= code(".")
+        else:
+            codes.append(code(character))
+    return codes[::-1]
+
+
+def test_font():
+    for character in SEGMENT_BYTES:
+        assert font.glyph(character) == code(character), character
+    assert font.DOT == code(".")
+
+
+def test_time():
+    codes = time_to_display((2024, 2, 29, 23, 59, 8, 3, 60), [0] * 9)
+    assert codes == glyphs("23-59-08") + [0]
+
+
+def test_date():
+    codes = date_to_display((2024, 2, 9, 12, 0, 0, 4, 40), [0] * 9)
+    assert codes == glyphs("09.02.2024") + [0]
+
+
+def test_fields_left_out_are_dashes():
+    codes = time_to_display((None, None, None, 7, None, 0), [0] * 9, font.DOT)
+    assert codes == glyphs("07----00") + [code(".")]
+    codes = date_to_display((None, 12, None, None, None, None), [0] * 9)
+    assert codes == glyphs("--.12.----") + [0]
+
+
+def test_writes_into_the_codes_given():
+    codes = [0] * 9
+    assert time_to_display((2024, 1, 1, 0, 0, 0, 0, 1), codes) is codes
+
+
+def test_formatting_does_not_allocate():
+    codes = [0] * 9
+    times = [(2024, 12, 31, hour, hour, hour, 1, 366) for hour in range(24)]
+    time_to_display(times[0], codes)
+    date_to_display(times[0], codes)
+    tracemalloc.start()
+    try:
+        for _ in range(50):
+            for datetime in times:
+                time_to_display(datetime, codes)
+                date_to_display(datetime, codes)
+        snapshot = tracemalloc.take_snapshot()
+    finally:
+        tracemalloc.stop()
+    snapshot = snapshot.filter_traces([tracemalloc.Filter(True, formatter.__file__)])
+    assert sum(stat.count for stat in snapshot.statistics("filename")) == 0
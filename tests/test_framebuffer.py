@@ -0,0 +1,153 @@
+import pytest
+
+from conftest import SLOTS, SimRun, at_us
+import font
+from framebuffer import CHIP_BITS, FrameBuffer
+
+CHIP_MASK = (1 << CHIP_BITS) - 1
+GRID_MASK = sum(font.GRIDS)
+
+
+def chain(chips):
+    # iv-18s on chips MAX6921s, all wired the same
+    return ((font.GRIDS, None),) * chips
+
+
+def slot_word(frame, slot):
+    # the words of all chips in a slot of the front buffer, as one number
+    return int.from_bytes(frame.views[frame.front][slot], "big")
+
+
+@pytest.mark.parametrize(
+    "chips, slot_bytes, stride", [(1, 3, 4), (2, 5, 8), (4, 10, 12)]
+)
+def test_sizes(chips, slot_bytes, stride):
+    frame = FrameBuffer(chain(chips))
+    assert frame.digits == 9 * chips
+    assert frame.slots == 9
+    assert frame.slot_bytes == slot_bytes
+    assert frame.stride == stride
+    assert len(frame.buffers[0]) == 9 * stride
+    assert all(len(view) == slot_bytes for view in frame.views[0])
+
+
+@pytest.mark.parametrize("chips", [1, 2, 4])
+def test_every_chip_lights_its_digit_of_the_slot(chips):
+    frame = FrameBuffer(chain(chips))
+    codes = [font.glyph("0123456789"[index % 10]) for index in range(frame.digits)]
+    assert frame.show(codes)
+    for slot in range(frame.slots):
+        expected = 0
+        for chip in range(chips):
+            word = font.GRIDS[slot] | codes[chip * 9 + slot]
+            expected |= word << (chip * CHIP_BITS)
+        assert slot_word(frame, slot) == expected
+
+
+def test_blank_digits_keep_their_grid():
+    frame = FrameBuffer(chain(2))
+    for slot in range(frame.slots):
+        grid = font.GRIDS[slot]
+        assert slot_word(frame, slot) == grid | grid << CHIP_BITS
+
+
+def test_only_changes_are_published():
+    frame = FrameBuffer()
+    codes = [font.glyph("8")] * 9
+    assert frame.show(codes)
+    front = frame.front
+    assert not frame.write(0, codes[0])
+    assert not frame.show(codes)
+    assert frame.front == front
+
+
+def test_set_digit_publishes_one_digit():
+    frame = FrameBuffer()
+    frame.show([font.glyph("0")] * 9)
+    front = frame.front
+    assert frame.set_digit(3, font.glyph("5"))
+    assert frame.front != front
+    assert slot_word(frame, 3) == font.GRIDS[3] | font.glyph("5")
+    assert slot_word(frame, 4) == font.GRIDS[4] | font.glyph("0")
+    assert not frame.set_digit(3, font.glyph("5"))
+    assert frame.front != front
+
+
+def test_back_buffer_catches_up():
+    # each publish flips the buffers, the slots written to the other one
+    # before have to show in both
+    frame = FrameBuffer()
+    frame.write(0, font.glyph("1"))
+    frame.publish()
+    frame.write(8, font.glyph("2"))
+    frame.publish()
+    frame.write(4, font.glyph("3"))
+    frame.publish()
+    for index, character in ((0, "1"), (8, "2"), (4, "3")):
+        word = slot_word(frame, index)
+        assert word == font.GRIDS[index] | font.glyph(character)
+
+
+def test_segments_wired_differently():
+    # the second chip with segments a & g swapped
+    segments = dict(font.SEGMENTS)
+    segments["A"], segments["G"] = segments["G"], segments["A"]
+    frame = FrameBuffer(((font.GRIDS, None), (font.GRIDS, segments)))
+    codes = [font.glyph("7")] * 18
+    frame.show(codes)
+    swapped = font.SEGMENTS["G"] | font.SEGMENTS["B"] | font.SEGMENTS["C"]
+    word = slot_word(frame, 0) >> CHIP_BITS
+    assert word == font.GRIDS[0] | swapped
+
+
+# the chain in the simulator, on the pio and on core 1
+
+SIMULATED = 1.0  # s
+SETTLED = 0.2  # s, from the first frame on
+
+
+@pytest.fixture(
+    scope="module", params=[(1, "pio"), (2, "pio"), (4, "pio"), (2, "core 1")]
+)
+def chain_run(request):
+    # main.py on a chain of iv-18s
+    chips, refresh = request.param
+    files = {"layout.py": "import font\nCHIPS = ((font.GRIDS, None),) * %d\n" % chips}
+    return SimRun(refresh, files, chips=chips).run(SIMULATED)
+
+
+def test_slot_rate(chain_run):
+    slots, _ = chain_run.trace.refresh_rate(at_us(SETTLED))
+    assert slots == pytest.approx(SLOTS[chain_run.refresh], rel=0.005)
+
+
+def test_every_chip_latches_the_same_grid(chain_run):
+    chips = chain_run.simulation.shift_register.chips
+    words = [word for _, word in chain_run.trace.words(at_us(SETTLED))]
+    assert len(words) > 100
+    for word in words:
+        grids = [(word >> (chip * CHIP_BITS)) & GRID_MASK for chip in range(chips)]
+        assert grids[0] in font.GRIDS
+        assert grids == grids[:1] * chips
+        assert word >> (chips * CHIP_BITS) == 0
+
+
+def test_spi_sends_whole_slots(chain_run):
+    chips = chain_run.simulation.shift_register.chips
+    spi = chain_run.trace.select("spi", start=at_us(SETTLED))
+    writes = [data for _, _, _, data in spi]
+    if chain_run.refresh == "pio":
+        assert writes == []
+        return
+    assert {len(data) for data in writes} == {(chips * CHIP_BITS + 7) // 8}
+    slots = SLOTS["core 1"] * (SIMULATED - SETTLED)
+    assert len(writes) == pytest.approx(slots, abs=2)
+
+
+def test_first_chip_shows_the_time(chain_run):
+    # 12:00:00 at the start of the simulation, d2 & d5 are dashes
+    _, words, _ = list(chain_run.trace.frames(at_us(SETTLED)))[-1]
+    digits = [word & CHIP_MASK & ~GRID_MASK for word in words]
+    assert digits[2] == digits[5] == font.glyph("-")
+    assert digits[7] == font.glyph("1")
+    assert digits[6] == font.glyph("2")
@@ -0,0 +1,94 @@
+import os
+
+import pytest
+
+from logger import BLOCK_SIZE, RECORDS_PER_BLOCK, Logger
+from tools import read_drift_log
+
+
+@pytest.fixture(autouse=True)
+def directory(tmp_path, monkeypatch):
+    # the logs go to the current directory
+    monkeypatch.chdir(tmp_path)
+    return tmp_path
+
+
+def record(index):
+    # timestamp, local seconds, rtc seconds & trim of the index-th sample
+    return 1700000000 + index * 600, index * 600, index * 600 - index // 7, -(index % 5)
+
+
+def log(count, **options):
+    logger = Logger(**options)
+    for index in range(count):
+        logger.append(*record(index))
+    logger.flush()
+    return logger
+
+
+def read(sequence):
+    return list(read_drift_log.read("drift-{:04d}.bin".format(sequence)))
+
+
+def test_records_over_several_blocks():
+    count = 3 * RECORDS_PER_BLOCK + 4
+    log(count)
+    assert os.path.getsize("drift-0000.bin") == 5 * BLOCK_SIZE
+    assert read(0) == [(0,) + record(index) for index in range(count)]
+
+
+def test_a_block_per_flush():
+    logger = log(3)
+    logger.append(*record(3))
+    logger.flush()
+    assert os.path.getsize("drift-0000.bin") == 3 * BLOCK_SIZE
+    assert [row[1:] for row in read(0)] == [record(index) for index in range(4)]
+
+
+def test_every_run_starts_a_file():
+    log(2)
+    log(2)
+    assert sorted(os.listdir()) == ["drift-0000.bin", "drift-0001.bin"]
+    assert [row[0] for row in read(1)] == [1, 1]
+
+
+def test_rotation():
+    # 10 full blocks, 2 per file, the newest 3 files are kept
+    log(10 * RECORDS_PER_BLOCK, max_blocks=2, max_files=3)
+    assert sorted(os.listdir()) == [
+        "drift-0002.bin",
+        "drift-0003.bin",
+        "drift-0004.bin",
+    ]
+    rows = read(2) + read(3) + read(4)
+    first = 4 * RECORDS_PER_BLOCK
+    assert [row[1:] for row in rows] == [
+        record(index) for index in range(first, 10 * RECORDS_PER_BLOCK)
+    ]
+    assert [row[0] for row in rows[:: 2 * RECORDS_PER_BLOCK]] == [2, 3, 4]
+
+
+def test_torn_last_block_is_skipped(capsys):
+    log(2 * RECORDS_PER_BLOCK + 3)
+    size = os.path.getsize("drift-0000.bin")
+    with open("drift-0000.bin", "r+b") as file:
+        file.truncate(size - BLOCK_SIZE // 2)
+    rows = read(0)
+    assert [row[1:] for row in rows] == [
+        record(index) for index in range(2 * RECORDS_PER_BLOCK)
+    ]
+    assert "incomplete block at {}".format(3 * BLOCK_SIZE) in capsys.readouterr().err
+
+
+def test_block_with_a_bad_checksum_is_skipped(capsys):
+    log(3 * RECORDS_PER_BLOCK)
+    # half written, the rest of the page still erased
+    with open("drift-0000.bin", "r+b") as file:
+        file.seek(2 * BLOCK_SIZE + BLOCK_SIZE // 2)
+        file.write(b"\xff" * (BLOCK_SIZE // 2))
+    rows = read(0)
+    expected = list(range(RECORDS_PER_BLOCK)) + list(
+        range(2 * RECORDS_PER_BLOCK, 3 * RECORDS_PER_BLOCK)
+    )
+    assert [row[1:] for row in rows] == [record(index) for index in expected]
+    assert "bad block at {}".format(2 * BLOCK_SIZE) in capsys.readouterr().err
@@ -0,0 +1,206 @@
+import pytest
+
+import modes
+from modes import (
+    DATE,
+    EVENTS,
+    MODES,
+    OFF,
+    RING,
+    SET_ALARM_HOUR,
+    SET_ALARM_MINUTE,
+    SET_BRIGHTNESS,
+    SET_DAY,
+    SET_HOUR,
+    SET_MINUTE,
+    SET_MONTH,
+    SET_TIMER,
+    SET_YEAR,
+    SWITCHES,
+    TIME,
+)
+from switches import LONG_PRESS, PRESS, RELEASE, REPEAT
+
+HIGH, MIDDLE, LOW = range(SWITCHES)
+SETTING = (
+    SET_HOUR,
+    SET_MINUTE,
+    SET_DAY,
+    SET_MONTH,
+    SET_YEAR,
+    SET_BRIGHTNESS,
+    SET_ALARM_HOUR,
+    SET_ALARM_MINUTE,
+    SET_TIMER,
+)
+NEXT = {
+    SET_HOUR: SET_MINUTE,
+    SET_MINUTE: SET_DAY,
+    SET_DAY: SET_MONTH,
+    SET_MONTH: SET_YEAR,
+    SET_YEAR: SET_BRIGHTNESS,
+    SET_BRIGHTNESS: TIME,
+    SET_ALARM_HOUR: SET_ALARM_MINUTE,
+    SET_ALARM_MINUTE: SET_TIMER,
+    SET_TIMER: TIME,
+}
+
+
+def expected_transitions():
+    # (mode, switch, event): mode after it, of everything that does something
+    expected = {
+        (TIME, HIGH, PRESS): SET_HOUR,
+        (DATE, HIGH, PRESS): SET_HOUR,
+        (TIME, MIDDLE, PRESS): DATE,
+        (DATE, MIDDLE, PRESS): TIME,
+        (TIME, LOW, PRESS): OFF,
+        (DATE, LOW, PRESS): OFF,
+        (OFF, LOW, PRESS): TIME,
+        (SET_HOUR, HIGH, LONG_PRESS): SET_ALARM_HOUR,
+    }
+    for mode in SETTING:
+        expected[mode, HIGH, PRESS] = NEXT[mode]
+        for switch in (MIDDLE, LOW):
+            for event in (PRESS, REPEAT):
+                expected[mode, switch, event] = mode
+    for switch in range(SWITCHES):
+        expected[RING, switch, PRESS] = DATE
+    return expected
+
+
+class Hooks:
+    def __init__(self):
+        self.calls = []
+
+    def write_time(self, datetime):
+        self.calls.append(("write_time", tuple(datetime)))
+
+    def save(self):
+        self.calls.append(("save",))
+
+    def set_alarm(self, hour, minute):
+        self.calls.append(("set_alarm", hour, minute))
+
+    def set_timer(self, minutes):
+        self.calls.append(("set_timer", minutes))
+
+
+def new_state(mode=TIME):
+    hooks = Hooks()
+    state = modes.State(
+        (2024, 2, 29, 23, 59, 58, 3, 60),
+        60,
+        hooks.write_time,
+        hooks.save,
+        hooks.set_alarm,
+        hooks.set_timer,
+    )
+    state.alarm_hour = 7
+    state.alarm_minute = 30
+    state.mode = mode
+    if mode == RING:
+        state.rang_in = DATE
+        state.ringing = modes.ALARM_BIT
+    return state, hooks
+
+
+def test_every_transition():
+    expected = expected_transitions()
+    for mode in range(MODES):
+        for switch in range(SWITCHES):
+            for event in range(EVENTS):
+                state, _ = new_state(mode)
+                changed = modes.dispatch(state, switch, event)
+                key = mode, switch, event
+                assert changed == (key in expected), key
+                assert state.mode == expected.get(key, mode), key
+                codes = modes.render(state, [0] * 9)
+                assert (codes is None) == (state.mode == OFF), key
+
+
+def test_releases_do_nothing():
+    for mode in range(MODES):
+        for switch in range(SWITCHES):
+            state, hooks = new_state(mode)
+            assert not modes.dispatch(state, switch, RELEASE)
+            assert hooks.calls == []
+
+
+@pytest.mark.parametrize(
+    "mode, switch, field, value",
+    [
+        (SET_HOUR, MIDDLE, 3, 0),  # 23 wraps around
+        (SET_MINUTE, LOW, 4, 58),
+        (SET_DAY, MIDDLE, 2, 1),  # 31 wraps around
+        (SET_YEAR, MIDDLE, 0, 2025),
+        (SET_BRIGHTNESS, MIDDLE, modes.BRIGHTNESS, 61),
+        (SET_ALARM_HOUR, LOW, modes.ALARM_HOUR, 6),
+        (SET_TIMER, LOW, modes.TIMER, modes.MAX_TIMER),  # 0 wraps around
+    ],
+)
+def test_steps(mode, switch, field, value):
+    state, _ = new_state(mode)
+    if mode == SET_DAY:
+        state.set_time[2] = 31
+    modes.dispatch(state, switch, PRESS)
+    assert state.field(field) == value
+
+
+def test_brightness_stops_at_the_ends():
+    state, _ = new_state(SET_BRIGHTNESS)
+    state.brightness = modes.MAX_BRIGHTNESS
+    modes.dispatch(state, MIDDLE, REPEAT)
+    assert state.brightness == modes.MAX_BRIGHTNESS
+
+
+def test_setting_the_time_and_date():
+    state, hooks = new_state()
+    modes.dispatch(state, HIGH, PRESS)
+    modes.dispatch(state, LOW, PRESS)  # 22 h
+    modes.dispatch(state, HIGH, PRESS)
+    modes.dispatch(state, HIGH, PRESS)
+    # the time runs from when its minute is set
+    assert state.mode == SET_DAY
+    assert hooks.calls == [("write_time", (2024, 2, 29, 22, 59, 0, 3, 60))]
+    for _ in range(4):
+        modes.dispatch(state, HIGH, PRESS)
+    assert state.mode == TIME
+    assert hooks.calls[1:] == [
+        ("write_time", (2024, 2, 29, 22, 59, 0, 3, 60)),
+        ("save",),
+    ]
+
+
+def test_setting_the_alarm_and_timer():
+    state, hooks = new_state(SET_HOUR)
+    modes.dispatch(state, HIGH, LONG_PRESS)
+    modes.dispatch(state, MIDDLE, PRESS)  # 8 h
+    modes.dispatch(state, HIGH, PRESS)
+    modes.dispatch(state, HIGH, PRESS)
+    assert hooks.calls == [("set_alarm", 8, 30), ("save",)]
+    for _ in range(5):
+        modes.dispatch(state, MIDDLE, REPEAT)
+    modes.dispatch(state, HIGH, PRESS)
+    assert state.mode == TIME
+    assert hooks.calls[2:] == [("set_timer", 5), ("save",)]
+
+
+def test_no_alarm_skips_its_minute():
+    state, hooks = new_state(SET_ALARM_HOUR)
+    state.alarm_hour = 0
+    modes.dispatch(state, LOW, PRESS)
+    assert state.alarm_hour == -1
+    modes.dispatch(state, HIGH, PRESS)
+    assert state.mode == SET_TIMER
+    assert hooks.calls == [("set_alarm", -1, 30), ("save",)]
+
+
+def test_ringing_goes_back_to_the_mode_it_rang_in():
+    state, _ = new_state(SET_MONTH)
+    modes.ring(state, modes.TIMER_BIT)
+    modes.ring(state, modes.ALARM_BIT)
+    assert state.mode == RING
+    assert state.ringing == modes.ALARM_BIT | modes.TIMER_BIT
+    modes.dispatch(state, LOW, PRESS)
+    assert state.mode == SET_MONTH
+    assert state.ringing == 0
@@ -0,0 +1,86 @@
+import pytest
+
+from conftest import REFRESHES, SLOTS, SimRun, at_us
+from power import ACTIVE, ACTIVE_FREQUENCY, OFF, OFF_FREQUENCY
+from sim import BLANK_PIN, SWITCH_PINS
+
+LOW_SWITCH = SWITCH_PINS[2]  # turns the display off & on
+FILAMENT_PIN = 18
+OFF_AT = 1.0  # s
+ON_AT = 2.5
+END = 4.0
+SAVED_BRIGHTNESS = 7
+
+
+@pytest.fixture(scope="module", params=REFRESHES)
+def power_run(request):
+    # main.py turned off and on again by the low switch, with the state of
+    # its power manager and the rtc reads noted on the way
+    power_run = SimRun(request.param)
+    rtc = power_run.simulation.rtc
+    power_run.simulation.press(LOW_SWITCH, OFF_AT)
+    power_run.simulation.press(LOW_SWITCH, ON_AT)
+    for name, at in (
+        ("on", OFF_AT - 0.1),
+        ("off", OFF_AT + 0.1),
+        ("still off", ON_AT - 0.1),
+        ("end", END - 0.05),
+    ):
+        power_run.note(
+            name, at, lambda main: (main.power.state, main.power.times(), rtc.reads)
+        )
+    # a task that has to run while off
+    power_run.note("saving", OFF_AT + 0.2, save_brightness)
+    power_run.note("saved", OFF_AT + 0.5, lambda main: main.settings.brightness)
+    return power_run.run(END)
+
+
+def save_brightness(main):
+    main.state.brightness = SAVED_BRIGHTNESS
+    main.save.set()
+
+
+def test_states(power_run):
+    seen = power_run.seen
+    assert seen["on"][0] == ACTIVE
+    assert seen["off"][0] == OFF
+    assert seen["end"][0] == ACTIVE
+
+
+def test_time_spent_per_state(power_run):
+    active, dimmed, off = power_run.seen["end"][1]
+    assert dimmed == 0
+    assert off == pytest.approx((ON_AT - OFF_AT) * 1000, abs=20)
+    assert active == pytest.approx((OFF_AT + END - 0.05 - ON_AT) * 1000, abs=20)
+
+
+def test_clock_lowered_while_off(power_run):
+    trace = power_run.trace
+    changes = [(when, hz) for when, _, _, hz in trace.select("freq", start=at_us(0.5))]
+    assert [hz for _, hz in changes] == [OFF_FREQUENCY, ACTIVE_FREQUENCY]
+    assert at_us(OFF_AT) <= changes[0][0] < at_us(OFF_AT + 0.02)
+    assert at_us(ON_AT) <= changes[1][0] < at_us(ON_AT + 0.02)
+
+
+def test_display_dark_while_off(power_run):
+    trace = power_run.trace
+    start, end = at_us(OFF_AT + 0.05), at_us(ON_AT)
+    assert list(trace.words(start, end)) == []
+    assert list(trace.select("pin", BLANK_PIN, start, end)) == []
+    filament = [level for _, _, _, level in trace.select("pin", FILAMENT_PIN)]
+    assert filament[-2:] == [0, 1]
+
+
+def test_refresh_resumes_at_its_rate(power_run):
+    slots = power_run.trace.refresh_rate(at_us(ON_AT + 0.1))[0]
+    assert slots == pytest.approx(SLOTS[power_run.refresh], rel=0.01)
+
+
+def test_tasks_run_while_off(power_run):
+    assert power_run.seen["saved"] == SAVED_BRIGHTNESS
+
+
+def test_rtc_not_read_while_off(power_run):
+    seen = power_run.seen
+    assert seen["still off"][2] == seen["off"][2]
+    assert seen["end"][2] > seen["still off"][2]
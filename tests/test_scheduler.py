@@ -0,0 +1,116 @@
+import os
+
+import pytest
+
+from conftest import SimRun
+
+# tasks on the virtual clock of the simulator, noting the ms they woke at
+TASKS = """
+import time
+import scheduler
+
+log = []
+event = scheduler.Event()
+flag = scheduler.Flag()
+
+
+def note(*what):
+    log.append(what + (time.ticks_ms(),))
+
+
+def every():
+    note("every")
+
+
+async def sleeper():
+    for delay in (5, 20, 100):
+        await scheduler.sleep_ms(delay)
+        note("sleep", delay)
+    await scheduler.sleep_until(time.ticks_add(time.ticks_ms(), 40))
+    note("until")
+    await scheduler.sleep_until(time.ticks_add(time.ticks_ms(), -10))
+    note("until passed")
+
+
+async def waiter():
+    note("wait", await scheduler.wait_for_ms(flag.wait(), 50))
+    # set by setter() before the timeout
+    note("wait", await scheduler.wait_for_ms(flag.wait(), 500))
+    event.set()
+
+
+async def setter():
+    await scheduler.sleep_ms(300)
+    flag.set()
+
+
+scheduler.every(100, every)
+scheduler.spawn(sleeper)
+scheduler.spawn(waiter)
+scheduler.spawn(setter)
+scheduler.on(event, lambda: note("event"))
+scheduler.run()
+"""
+
+
+# a periodic task that once takes longer than its interval
+MISSING = """
+import time
+import scheduler
+
+log = []
+
+
+def slow():
+    log.append(("slow", time.ticks_ms()))
+    if len(log) == 3:
+        time.sleep_ms(35)
+
+
+scheduler.every(10, slow)
+scheduler.run()
+"""
+
+
+def run(script, seconds=1.0):
+    # the log of script, with the ms since its first entry
+    tasks = SimRun(files={"tasks.py": script})
+    tasks.note("log", seconds - 0.05, lambda main: list(main.log))
+    # the simulation runs scripts from pico/, unless given a whole path
+    path = os.path.join(tasks.simulation.directory, "tasks.py")
+    log = tasks.run(seconds, path).seen["log"]
+    start = log[0][-1]
+    return [entry[:-1] + (entry[-1] - start,) for entry in log]
+
+
+@pytest.fixture(scope="module")
+def log():
+    return run(TASKS)
+
+
+def entries(log, name):
+    return [entry[1:] for entry in log if entry[0] == name]
+
+
+def test_sleeps_wake_at_their_deadlines(log):
+    assert entries(log, "sleep") == [(5, 5), (20, 25), (100, 125)]
+    assert entries(log, "until") == [(165,)]
+    # a deadline that passed only yields
+    assert entries(log, "until passed") == [(165,)]
+
+
+def test_every(log):
+    assert entries(log, "every") == [(ms,) for ms in range(0, 901, 100)]
+
+
+def test_every_skips_the_deadlines_it_missed():
+    slow = [ms for ms, in entries(run(MISSING, 0.2), "slow")]
+    assert slow[:6] == [0, 10, 20, 55, 65, 75]
+
+
+def test_wait_for_ms_times_out(log):
+    assert entries(log, "wait") == [(False, 50), (True, 300)]
+
+
+def test_on_event(log):
+    assert entries(log, "event") == [(300,)]
@@ -0,0 +1,154 @@
+import struct
+
+import pytest
+
+import settings
+from checksum import crc16
+from settings import BRIGHTNESS_FILENAME, FILENAME, LAYOUT, SIZE, SRAM, Settings
+from sim.clock import VirtualClock
+from sim.rtc import MCP7940Model
+
+
+class Bus:
+    # the i2c to the simulated mcp7940, with the writes noted
+    def __init__(self):
+        self.rtc = MCP7940Model(VirtualClock())
+        self.writes = []
+
+    def readfrom_mem_into(self, address, register, buffer):
+        buffer[:] = self.rtc.read(register, len(buffer))
+
+    def writeto_mem(self, address, register, buffer):
+        self.writes.append((register, bytes(buffer)))
+        self.rtc.write(register, bytes(buffer))
+
+    def sram(self):
+        return bytes(self.rtc.regs[SRAM : SRAM + SIZE])
+
+
+@pytest.fixture
+def bus(tmp_path, monkeypatch):
+    # the flash copy & brightness.txt go to the current directory
+    monkeypatch.chdir(tmp_path)
+    return Bus()
+
+
+def image(version=settings.VERSION, magic=settings.MAGIC, crc=None):
+    # sram contents of brightness 30, trim -12, the date shown, an alarm at
+    # 6:45 and a 5 minute timer
+    image = bytearray(SIZE)
+    struct.pack_into(LAYOUT, image, 0, magic, version, 30, -12, 2, 6, 45, 5, 0)
+    if crc is None:
+        crc = crc16(image, 0, SIZE - 2)
+    struct.pack_into("<H", image, SIZE - 2, crc)
+    return bytes(image)
+
+
+def fields(loaded):
+    return (
+        loaded.brightness,
+        loaded.trim,
+        loaded.mode,
+        loaded.alarm_hour,
+        loaded.alarm_minute,
+        loaded.timer,
+    )
+
+
+def test_round_trip(bus):
+    saved = Settings(bus)
+    saved.brightness = 45
+    saved.trim = -33
+    saved.mode = 0
+    saved.alarm_hour = 23
+    saved.alarm_minute = 59
+    saved.timer = 90
+    saved.save()
+    loaded = Settings(bus)
+    assert loaded.load() == "sram"
+    assert fields(loaded) == (45, -33, 0, 23, 59, 90)
+
+
+def test_only_changed_bytes_are_written(bus):
+    saved = Settings(bus)
+    assert saved.load() == "defaults"
+    before = bus.sram()
+    bus.writes.clear()
+    saved.save()
+    assert bus.writes == []
+    saved.brightness = 61
+    saved.save()
+    after = bus.sram()
+    # the brightness & the crc, a write per run of changed bytes
+    changed = [index for index in range(SIZE) if before[index] != after[index]]
+    assert changed[0] == 2 and set(changed[1:]) <= {SIZE - 2, SIZE - 1}
+    runs = [(SRAM + 2, after[2:3])]
+    runs.append((SRAM + changed[1], after[changed[1] : changed[-1] + 1]))
+    assert bus.writes == runs
+
+
+def test_version_1_keeps_the_alarm_defaults(bus):
+    bus.writeto_mem(0, SRAM, image(version=1))
+    loaded = Settings(bus)
+    assert loaded.load() == "sram"
+    assert fields(loaded) == (30, -12, 2, -1, 0, 0)
+
+
+@pytest.mark.parametrize(
+    "sram",
+    [
+        image(crc=0x1234),
+        image(version=settings.VERSION + 1),
+        image(version=0),
+        image(magic=0xFF),
+        bytes(SIZE),
+    ],
+)
+def test_bad_sram_falls_back_to_the_flash_copy(bus, sram):
+    flash = Settings(bus, brightness=70, trim=5)
+    flash.save(flash=True)
+    bus.writeto_mem(0, SRAM, sram)
+    loaded = Settings(bus)
+    assert loaded.load() == "flash"
+    assert (loaded.brightness, loaded.trim) == (70, 5)
+    # and the sram is written again
+    assert Settings(bus).load() == "sram"
+
+
+def test_bad_flash_copy_falls_back_to_the_defaults(bus):
+    with open(FILENAME, "wb") as file:
+        file.write(image(crc=0))
+    loaded = Settings(bus, brightness=40)
+    assert loaded.load() == "defaults"
+    assert loaded.brightness == 40
+    assert Settings(bus).load() == "sram"
+
+
+def test_brightness_txt_is_taken_over_once(bus):
+    with open(BRIGHTNESS_FILENAME, "w") as file:
+        file.write("0.35\n")
+    loaded = Settings(bus)
+    assert loaded.load() == BRIGHTNESS_FILENAME
+    assert loaded.brightness == 35
+    # the flash copy has it now, should the sram be lost
+    bus.writeto_mem(0, SRAM, bytes(SIZE))
+    loaded = Settings(bus)
+    assert loaded.load() == "flash"
+    assert loaded.brightness == 35
+
+
+def test_brightness_txt_only_without_settings(bus):
+    Settings(bus, brightness=20).save()
+    with open(BRIGHTNESS_FILENAME, "w") as file:
+        file.write("0.35\n")
+    loaded = Settings(bus)
+    assert loaded.load() == "sram"
+    assert loaded.brightness == 20
+
+
+def test_unreadable_brightness_txt_is_ignored(bus):
+    with open(BRIGHTNESS_FILENAME, "w") as file:
+        file.write("bright\n")
+    loaded = Settings(bus)
+    assert loaded.load() == "defaults"
+    assert loaded.brightness == 60
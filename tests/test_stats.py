@@ -0,0 +1,106 @@
+import pytest
+
+import stats
+from stats import LATE, LATE_SLOTS, MAX_COUNT, REFRESH, SLOTS, Histogram
+
+
+@pytest.fixture(autouse=True)
+def reset():
+    # the counters are module globals
+    stats.reset()
+    yield
+    stats.reset()
+
+
+def test_histogram_buckets():
+    histogram = Histogram((0, 10, 100))
+    for value in (0, 0, 1, 10, 11, 100, 101, 5000, -3):
+        histogram.add(value)
+    # the limits are inclusive, everything above the last one goes to a last bucket
+    assert list(histogram.buckets) == [3, 2, 2, 2]
+    assert histogram.count == 9
+    assert list(histogram.extremes) == [-3, 5000]
+    assert histogram.report() == "n=9 min=-3 max=5000 | <=0:3 <=10:2 <=100:2 >100:2"
+
+
+def test_histogram_reset():
+    histogram = Histogram((5,))
+    histogram.add(7)
+    histogram.reset()
+    assert histogram.report() == "-"
+    histogram.add(3)
+    assert list(histogram.extremes) == [3, 3]
+
+
+def test_refresh_counts_slots_and_late_ones():
+    for delay in (20, 0, -LATE, -LATE - 1, -400):
+        stats.refresh(delay)
+    assert list(stats.counters) == [5, 2]
+    refresh = stats.histograms[REFRESH]
+    assert refresh.count == 5
+    assert list(refresh.extremes) == [0, 400]
+    assert refresh.buckets[0] == 2
+
+
+def test_scan_counts_its_slots():
+    stats.scan(9)
+    stats.scan(9)
+    assert stats.counters[SLOTS] == 18
+    assert stats.counters[LATE_SLOTS] == 0
+
+
+@pytest.mark.parametrize(
+    "start, amount, expected",
+    [
+        (MAX_COUNT - 9, 9, MAX_COUNT),
+        (MAX_COUNT - 8, 9, 0),
+        (MAX_COUNT - 3, 9, 5),
+        (MAX_COUNT, 1, 0),
+    ],
+)
+def test_counters_wrap_at_2_to_the_30(start, amount, expected):
+    # the largest small int on the pico is 2^30 - 1
+    assert MAX_COUNT == (1 << 30) - 1
+    stats.counters[SLOTS] = start
+    stats.scan(amount)
+    assert stats.counters[SLOTS] == expected
+
+
+def test_histogram_count_wraps():
+    histogram = Histogram((0,))
+    histogram.count = MAX_COUNT
+    histogram.buckets[1] = MAX_COUNT
+    histogram.add(1)
+    assert histogram.count == 0
+    assert histogram.buckets[1] == 0
+
+
+def test_timed():
+    calls = []
+
+    def function(*args):
+        calls.append(args)
+        return len(calls)
+
+    timed = stats.timed(stats.LOOP, function)
+    assert timed(1, 2) == 1
+    assert timed() == 2
+    assert calls == [(1, 2), ()]
+    loop = stats.histograms[stats.LOOP]
+    assert loop.count == 2
+    assert 0 <= loop.extremes[0] <= loop.extremes[1]
+
+
+def test_report():
+    stats.scan(9)
+    stats.add(stats.I2C_READ, 120)
+    stats.watch("answer", lambda: 42)
+    try:
+        lines = stats.report().splitlines()
+    finally:
+        stats._watched.clear()
+    assert lines[0].startswith("seconds: ")
+    assert lines[1:3] == ["slots: 9", "late slots: 0"]
+    assert any(line.startswith("i2c read us: n=1 min=120 max=120") for line in lines)
+    assert "loop us: -" in lines
+    assert lines[-1] == "answer: 42"
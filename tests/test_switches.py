@@ -0,0 +1,141 @@
+import time
+
+import pytest
+
+import scheduler
+from switches import (
+    DEBOUNCE,
+    LONG_PRESS,
+    LONG_PRESS_TIME,
+    PRESS,
+    QUEUE_SIZE,
+    RELEASE,
+    REPEAT,
+    REPEAT_MIN,
+    REPEAT_START,
+    Switches,
+)
+
+
+class Pin:
+    # a switch that isn't pressed, its edges are injected
+    IRQ_FALLING = 1
+    IRQ_RISING = 2
+
+    def value(self):
+        return 1
+
+    def irq(self, handler, trigger):
+        pass
+
+
+class Events:
+    def __init__(self):
+        self.events = []
+
+    def __call__(self, switch, event):
+        self.events.append((switch, event))
+
+
+@pytest.fixture(autouse=True)
+def ticks(monkeypatch):
+    # micropython's ticks, which switches.py takes from time
+    for name in ("ticks_ms", "ticks_add", "ticks_diff"):
+        monkeypatch.setattr(time, name, getattr(scheduler, name), raising=False)
+
+
+def poll(switches, *times):
+    # the events of polls at the given ms
+    events = Events()
+    for now in times:
+        switches.poll(events, now)
+    return events.events
+
+
+def test_bouncing_contacts_give_one_event():
+    switches = Switches([Pin(), Pin()])
+    for ticks, level in ((0, 0), (2, 1), (5, 0), (9, 1), (12, 0)):
+        switches.edge(1, level, ticks)
+    assert poll(switches, 20, DEBOUNCE + 10) == [(1, PRESS)]
+    for ticks, level in ((300, 1), (301, 0), (304, 1)):
+        switches.edge(1, level, ticks)
+    assert poll(switches, 310, 300 + DEBOUNCE) == [(1, RELEASE)]
+    assert switches.value(1) == 1
+    assert not switches.busy()
+
+
+def test_change_while_debouncing_is_taken_after_it():
+    switches = Switches([Pin()])
+    switches.edge(0, 0, 0)
+    switches.edge(0, 1, 20)
+    assert poll(switches, 30) == [(0, PRESS)]
+    assert switches.timeout(30) == DEBOUNCE - 30
+    assert poll(switches, DEBOUNCE - 1, DEBOUNCE) == [(0, RELEASE)]
+
+
+def test_press_is_taken_on_its_first_edge():
+    switches = Switches([Pin()])
+    switches.edge(0, 0, 0)
+    assert poll(switches, 0) == [(0, PRESS)]
+
+
+@pytest.mark.parametrize(
+    "released, expected",
+    [
+        (LONG_PRESS_TIME - 1, [(0, PRESS), (0, RELEASE)]),
+        (LONG_PRESS_TIME + 1, [(0, PRESS), (0, LONG_PRESS), (0, REPEAT), (0, RELEASE)]),
+    ],
+)
+def test_long_press_at_the_threshold(released, expected):
+    switches = Switches([Pin()])
+    switches.edge(0, 0, 0)
+    events = poll(switches, *range(released))
+    switches.edge(0, 1, released)
+    events += poll(switches, *range(released, released + 100))
+    assert events == expected
+
+
+def test_long_press_timeout():
+    switches = Switches([Pin()])
+    switches.edge(0, 0, 0)
+    poll(switches, DEBOUNCE)
+    assert switches.timeout(DEBOUNCE) == LONG_PRESS_TIME - DEBOUNCE
+    assert poll(switches, LONG_PRESS_TIME - 1) == []
+    assert poll(switches, LONG_PRESS_TIME) == [(0, LONG_PRESS), (0, REPEAT)]
+    assert switches.timeout(LONG_PRESS_TIME) == REPEAT_START
+
+
+def test_repeats_speed_up_while_held():
+    switches = Switches([Pin()])
+    switches.edge(0, 0, 0)
+    repeats = []
+    for now in range(5000):
+        events = poll(switches, now)
+        repeats.extend(now for _, event in events if event == REPEAT)
+    expected = [LONG_PRESS_TIME]
+    interval = REPEAT_START
+    while True:
+        following = expected[-1] + interval
+        if following >= 5000:
+            break
+        expected.append(following)
+        interval = max(REPEAT_MIN, interval * 3 // 4)
+    assert repeats == expected
+    assert [b - a for a, b in zip(repeats, repeats[1:])][:4] == [250, 187, 140, 105]
+    assert repeats[-1] - repeats[-2] == REPEAT_MIN
+
+
+def test_ring_overflow():
+    switches = Switches([Pin()])
+    # pressed, released ... pressed, then the last release doesn't fit
+    for index in range(QUEUE_SIZE + 4):
+        switches.edge(0, index % 2, index * 10)
+    # one place stays free to tell a full ring from an empty one
+    assert switches.overflows == 5
+    end = (QUEUE_SIZE + 4) * 10
+    assert poll(switches, end) == [(0, PRESS)]
+    assert switches.value(0) == 0
+    # the ring is empty again
+    switches.edge(0, 1, end + 10)
+    assert poll(switches, end + 10) == [(0, RELEASE)]
+    assert switches.overflows == 5
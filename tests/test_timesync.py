@@ -0,0 +1,63 @@
+import os
+import re
+
+import pytest
+
+from timesync import TimeSync, whole_ms
+from tools import timesync as host
+
+# ms the simulator may be off after a step. it runs in real time on the pty,
+# but only keeps from running ahead of the wall clock, so it lags it by a few
+# ms whenever it is busy
+SIM_TOLERANCE = 10
+YEAR_MS = 365 * 86400 * 1000
+
+
+def test_whole_ms():
+    assert whole_ms("-1234.5") == -1234
+    assert whole_ms("88158643550") == 88158643550
+
+
+class Clock:
+    # an RTCClock that isn't locked to the rtc second yet
+    def precise(self):
+        return False
+
+
+def test_not_locked():
+    timesync = TimeSync(Clock(), None)
+    assert timesync.sync("123") == "sync not locked to the rtc"
+
+
+@pytest.mark.skipif(not hasattr(os, "openpty"), reason="needs a pty")
+def test_sync_the_simulator_over_a_pty():
+    # main.py from 2024-01-01 12:00:00, synced by the host side of
+    # tools/timesync.py --sim --reference
+    fd, process = host.simulate(host.LOCK_TIMEOUT)
+    port = host.Port(fd)
+    try:
+        offset, delay = host.measure(port, 8, False)
+        assert abs(offset) > YEAR_MS
+        assert 0 <= delay <= SIM_TOLERANCE
+
+        port.write_line("step {}".format(round(offset)))
+        reply = port.read_line("step ", 2 + host.REPLY_TIMEOUT)
+        stepped, late = map(
+            int, re.fullmatch(r"(-?\d+) ms, (\d+) ms late", reply).groups()
+        )
+        assert stepped == -round(offset)
+        assert late <= SIM_TOLERANCE
+
+        offset, _ = host.measure(port, 8, False)
+        assert abs(offset) <= SIM_TOLERANCE
+
+        # the offset left is a drift reference, which holds the pico's own
+        # samples out from then on (see test_drift.py)
+        for samples in (1, 2):
+            port.write_line("offset {}".format(round(offset)))
+            report = port.read_line("", host.REPLY_TIMEOUT)
+            assert report.endswith(" {} samples over 0 h (serial)".format(samples))
+    finally:
+        os.close(fd)
+        process.terminate()
+        process.wait()
@@ -0,0 +1,372 @@
+"""Fit the drift of the rtc from the logs of the pico and recommend a trim.
+
+    python tools/analyse_drift.py drift-*.bin serial.txt
+    python tools/analyse_drift.py --window 24 kitchen/drift-*.bin hall/drift-*.bin
+
+Reads the binary logs of test_deviation.py (see pico/logger.py) and text
+captured from the serial output of test_deviation.py and
+auto_calibration.py. Logs of several clocks are told apart by the directory
+they are in. The logs are streamed in chunks into NumPy arrays and only the
+sums of the least squares fits are kept, so the memory doesn't grow with
+the length of the logs.
+
+Every run (a start of test_deviation.py, or a change of the trim) gets a
+fit of its drift. The runs are turned into the ppm of the crystal without
+trim and combined into a recommended trim with a 95% confidence interval.
+Needs NumPy.
+"""
+
+import argparse
+import itertools
+import os
+import re
+import struct
+import sys
+
+import numpy as np
+
+import read_drift_log
+from read_drift_log import (
+    BLOCK_HEADER,
+    BLOCK_MAGIC,
+    FILE_HEADER,
+    MAGIC,
+    MAX_TRIM,
+    STEP_PPM,
+    VERSION,
+)
+
+# read_drift_log.RECORD, as the fields of a numpy array
+RECORD = np.dtype(
+    [("timestamp", "<u4"), ("local", "<i4"), ("rtc", "<i4"), ("trim", "i1"), ("", "V3")]
+)
+
+CHUNK_BLOCKS = 4096  # blocks of a binary log per chunk, 1 MB
+CHUNK_LINES = 65536  # lines of a text log per chunk
+QUANTISATION = 1 / 6  # s², both clocks are logged in whole seconds
+Z95 = 1.96
+
+# test_deviation.py, the trim is only on the start line
+DEVIATION_LINE = re.compile(
+    rb"(START - )?sec local: (-?\d+), sec rtc: (-?\d+)(?:.*?trim: (-?\d+))?"
+)
+# auto_calibration.py, measured without trim
+CALIBRATION_LINE = re.compile(rb"\d+ s: (-?[\d.]+) ppm \+- ([\d.]+)")
+
+
+# the crc of every byte from 0, to take a byte of every row at once
+CRC_TABLE = np.array(
+    [read_drift_log.crc16(bytes([byte]), 0) for byte in range(256)], np.uint16
+)
+
+
+def crc16(rows):
+    # crc-16/ccitt-false of every row of a 2d uint8 array, like pico/checksum.py
+    crc = np.full(len(rows), 0xFFFF, np.uint16)
+    for column in rows.T:
+        crc = (crc << 8) ^ CRC_TABLE[(crc >> 8) ^ column]
+    return crc
+
+
+class Fit:
+    # sums of a least squares line, around the means so they can be combined
+    # without losing precision over long logs
+    def __init__(self):
+        self.n = 0
+        self.mean_x = self.mean_y = 0.0
+        self.sxx = self.sxy = self.syy = 0.0
+
+    def add(self, n, mean_x, mean_y, sxx, sxy, syy):
+        total = self.n + n
+        if not total:
+            return
+        dx = mean_x - self.mean_x
+        dy = mean_y - self.mean_y
+        weight = self.n * n / total
+        self.mean_x += dx * n / total
+        self.mean_y += dy * n / total
+        self.sxx += sxx + dx * dx * weight
+        self.sxy += sxy + dx * dy * weight
+        self.syy += syy + dy * dy * weight
+        self.n = total
+
+    def result(self):
+        # ppm the rtc runs too fast & its standard error, or None
+        if self.n < 3 or self.sxx <= 0:
+            return None
+        slope = self.sxy / self.sxx
+        residual = max(QUANTISATION, (self.syy - slope * self.sxy) / (self.n - 2))
+        # the whole seconds don't average out like noise: the drift shows up
+        # as steps of a second, which only place the line to about half a
+        # second over the span, divided by the number of steps
+        span = self.span()
+        steps = max(1.0, abs(slope) * span)
+        error = residual / self.sxx + (0.5 / (span * steps)) ** 2
+        return slope * 1000000, error**0.5 * 1000000
+
+    def span(self):
+        # s the samples cover, if spread evenly
+        return (12 * self.sxx / self.n) ** 0.5 if self.n else 0.0
+
+
+def segment_sums(x, y, starts):
+    # per segment beginning at the indices in starts: n, means & sums of the
+    # squared deviations, all vectorised
+    counts = np.diff(np.append(starts, len(x)))
+    mean_x = np.add.reduceat(x, starts) / counts
+    mean_y = np.add.reduceat(y, starts) / counts
+    dx = x - np.repeat(mean_x, counts)
+    dy = y - np.repeat(mean_y, counts)
+    return zip(
+        counts.tolist(),
+        mean_x.tolist(),
+        mean_y.tolist(),
+        np.add.reduceat(dx * dx, starts).tolist(),
+        np.add.reduceat(dx * dy, starts).tolist(),
+        np.add.reduceat(dy * dy, starts).tolist(),
+    )
+
+
+class Run:
+    def __init__(self, clock, source, trim):
+        self.clock = clock
+        self.source = source
+        self.trim = trim
+        self.fit = Fit()
+        self.windows = {}  # window index: Fit
+        self.result = None  # ppm & standard error, if measured directly
+
+    def ppm(self):
+        return self.result or self.fit.result()
+
+
+class Analysis:
+    def __init__(self, window_hours=0):
+        self.window = int(window_hours * 3600)
+        self.runs = []
+        self.bad_blocks = 0
+        self._run = None
+        self._last_x = None
+        self._sequence = None  # of the runs in a file
+
+    def _start(self, clock, source, trim):
+        self._sequence += 1
+        self._run = Run(clock, f"{source}:{self._sequence}", trim)
+        self.runs.append(self._run)
+        self._last_x = None
+
+    def _samples(self, clock, source, x, y, trim, start):
+        # x: local seconds, y: rtc - local seconds, trim, start: a run began.
+        # a run also ends with a trim change or a restart of the local seconds
+        if not len(x):
+            return
+        previous_x = np.empty_like(x)
+        previous_x[0] = x[0] if self._last_x is None else self._last_x
+        previous_x[1:] = x[:-1]
+        previous_trim = np.empty_like(trim)
+        previous_trim[0] = trim[0] if self._run is None else self._run.trim
+        previous_trim[1:] = trim[:-1]
+        new_run = start | (trim != previous_trim) | (x < previous_x)
+        if self._run is None or self._run.clock != clock:
+            new_run[0] = True
+        if self.window:
+            window = x // self.window
+            boundary = new_run | (window != np.append(-1, window[:-1]))
+            boundary[0] = True
+        else:
+            window = np.zeros_like(x)
+            boundary = new_run.copy()
+            boundary[0] = True
+        starts = np.flatnonzero(boundary)
+        for index, sums in zip(starts.tolist(), segment_sums(x, y, starts)):
+            if new_run[index]:
+                self._start(clock, source, int(trim[index]))
+            self._run.fit.add(*sums)
+            key = int(window[index])
+            self._run.windows.setdefault(key, Fit()).add(*sums)
+        self._last_x = int(x[-1])
+
+    def read_binary(self, path, clock):
+        with open(path, "rb") as file:
+            header = file.read(struct.calcsize(FILE_HEADER))
+            magic, version, record_size, block_size, sequence, _ = struct.unpack(
+                FILE_HEADER, header
+            )
+            if magic != MAGIC:
+                raise ValueError(f"{path}: not a drift log")
+            if version != VERSION or record_size != RECORD.itemsize:
+                raise ValueError(f"{path}: unsupported version {version}")
+            header_size = struct.calcsize(BLOCK_HEADER)
+            per_block = (block_size - header_size) // record_size
+            blocks = np.dtype(
+                {
+                    "names": ["magic", "count", "records"],
+                    "formats": ["S2", "<u2", (RECORD, per_block)],
+                    "offsets": [0, 2, header_size],
+                    "itemsize": block_size,
+                }
+            )
+            self._sequence = 0
+            source = os.path.basename(path)
+            file.seek(block_size)
+            while True:
+                data = file.read(CHUNK_BLOCKS * block_size)
+                if not data:
+                    break
+                whole = len(data) // block_size * block_size
+                if whole != len(data):
+                    print(f"{path}: incomplete block at the end", file=sys.stderr)
+                chunk = np.frombuffer(data, blocks, whole // block_size)
+                raw = np.frombuffer(data, np.uint8, whole).reshape(-1, block_size)
+                checksums = raw[:, 4:6].copy().view("<u2")[:, 0]
+                valid = (chunk["magic"] == BLOCK_MAGIC) & (
+                    crc16(raw[:, header_size:]) == checksums
+                )
+                valid &= chunk["count"] <= per_block
+                self.bad_blocks += int(np.count_nonzero(~valid))
+                chunk = chunk[valid]
+                used = np.arange(per_block) < chunk["count"][:, None]
+                records = chunk["records"][used]
+                x = records["local"].astype(np.int64)
+                y = records["rtc"] - x
+                self._samples(
+                    clock, source, x, y, records["trim"], np.zeros(len(x), bool)
+                )
+
+    def read_text(self, path, clock, trim):
+        self._sequence = 0
+        source = os.path.basename(path)
+        with open(path, "rb") as file:
+            while True:
+                lines = list(itertools.islice(file, CHUNK_LINES))
+                if not lines:
+                    break
+                text = b"".join(lines)
+                samples = DEVIATION_LINE.findall(text)
+                if samples:
+                    start, local, rtc, trims = zip(*samples)
+                    start = np.array(start, bool)
+                    x = np.array(local, np.int64)
+                    y = np.array(rtc, np.int64) - x
+                    # the trim of the start line holds for the lines after it
+                    given = np.array([int(value or 0) for value in trims])
+                    has_trim = start & np.array(trims, bool)
+                    current = self._run.trim if self._run is not None else trim
+                    last = np.maximum.accumulate(
+                        np.where(has_trim, np.arange(len(x)), -1)
+                    )
+                    trims = np.where(last >= 0, given[last], current)
+                    self._samples(clock, source, x, y, trims, start)
+                for ppm, error in CALIBRATION_LINE.findall(text):
+                    self._sequence += 1
+                    run = Run(clock, f"{source}:{self._sequence}", 0)
+                    run.result = float(ppm), max(float(error), 1e-3)
+                    self.runs.append(run)
+
+    def read(self, paths, trim=0):
+        # per clock, the binary logs in the order they were written
+        logs = []
+        for path in paths:
+            clock = os.path.basename(os.path.dirname(os.path.abspath(path)))
+            with open(path, "rb") as file:
+                header = file.read(struct.calcsize(FILE_HEADER))
+            binary = header[: len(MAGIC)] == MAGIC
+            sequence = struct.unpack(FILE_HEADER, header)[4] if binary else 0
+            logs.append((clock, sequence, path, binary))
+
+        for clock, _, path, binary in sorted(logs):
+            if binary:
+                self.read_binary(path, clock)
+            else:
+                self.read_text(path, clock, trim)
+                # a run doesn't go on in the next text file
+                self._run = None
+
+    def recommendations(self):
+        # per clock: crystal ppm, its standard error, reduced chi² of the
+        # runs against each other, trim & its 95% interval
+        clocks = {}
+        for run in self.runs:
+            result = run.ppm()
+            if result is not None:
+                clocks.setdefault(run.clock, []).append((run, result))
+        for clock, runs in clocks.items():
+            ppm = np.array([result[0] - run.trim * STEP_PPM for run, result in runs])
+            weight = np.array([result[1] ** -2 for _, result in runs])
+            crystal = float(np.sum(weight * ppm) / np.sum(weight))
+            error = float(np.sum(weight) ** -0.5)
+            chi2 = (
+                float(np.sum(weight * (ppm - crystal) ** 2)) / (len(runs) - 1)
+                if len(runs) > 1
+                else 1.0
+            )
+            # runs that disagree (temperature, ageing) widen the interval
+            error *= max(1.0, chi2) ** 0.5
+            yield (
+                clock,
+                crystal,
+                error,
+                chi2,
+                trim_for(crystal),
+                (trim_for(crystal + Z95 * error), trim_for(crystal - Z95 * error)),
+            )
+
+
+def trim_for(ppm):
+    # like pico/calibration.py
+    return max(-MAX_TRIM, min(MAX_TRIM, -round(ppm / STEP_PPM)))
+
+
+def report(analysis, output=sys.stdout):
+    print("clock,run,trim,samples,hours,ppm,ci95,crystal_ppm", file=output)
+    for run in analysis.runs:
+        result = run.ppm()
+        if result is None:
+            continue
+        hours = run.fit.span() / 3600
+        print(
+            f"{run.clock},{run.source},{run.trim},{run.fit.n},{hours:.1f},"
+            f"{result[0]:.3f},{Z95 * result[1]:.3f},"
+            f"{result[0] - run.trim * STEP_PPM:.3f}",
+            file=output,
+        )
+    if analysis.window:
+        print(file=output)
+        print("clock,run,window_start_h,samples,ppm,ci95", file=output)
+        for run in analysis.runs:
+            for index, fit in sorted(run.windows.items()):
+                result = fit.result()
+                if result is not None:
+                    print(
+                        f"{run.clock},{run.source},{index * analysis.window / 3600:g},"
+                        f"{fit.n},{result[0]:.3f},{Z95 * result[1]:.3f}",
+                        file=output,
+                    )
+    print(file=output)
+    for clock, crystal, error, chi2, trim, (low, high) in analysis.recommendations():
+        print(
+            f"{clock}: crystal {crystal:+.3f} ppm +- {Z95 * error:.3f}"
+            f" (chi2/dof {chi2:.2f}), trim {trim} ({low} to {high})",
+            file=output,
+        )
+    if analysis.bad_blocks:
+        print(f"{analysis.bad_blocks} bad blocks skipped", file=sys.stderr)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("logs", nargs="+", help="binary drift logs or serial text")
+    parser.add_argument(
+        "--window", type=float, default=0, help="also fit every this many hours"
+    )
+    parser.add_argument(
+        "--trim", type=int, default=0, help="trim of text logs without a start line"
+    )
+    args = parser.parse_args()
+    analysis = Analysis(args.window)
+    analysis.read(args.logs, args.trim)
+    report(analysis)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,157 @@
+"""Benchmark the display and time hot paths of the firmware, against a baseline.
+
+    python tools/benchmark.py                  # run on cpython, compare
+    python tools/benchmark.py --save           # ... and keep it as the baseline
+    python tools/benchmark.py --report pico.txt --baseline tools/benchmark_pico.json
+
+Runs the cases of pico/benchmark.py on CPython, with the fake `machine`,
+`micropython` and `mcp7940` modules of the simulator, and reports ns and
+bytes allocated per call. On CPython that is the most memory a call had
+allocated at once (tracemalloc), as it frees as it goes. On the pico,
+`mpremote run pico/benchmark.py > pico.txt` prints the same report for
+`--report`, there with every byte allocated per call.
+
+Exits with 1 if a case got slower than `--threshold` times its baseline or
+allocates more than it did. The times only compare on one computer, so the
+baseline isn't kept in git: the first run saves it.
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+import tracemalloc
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BASELINE = os.path.join(ROOT, "tools", "benchmark_baseline.json")
+REPEATS = 5  # of every case, the fastest counts
+TRACED_CALLS = 100  # calls per case traced for allocations
+
+
+def load_firmware():
+    # the firmware modules with the fake hardware modules of the simulator
+    sys.path.insert(0, ROOT)
+    from sim import machine, mcp7940, micropython
+
+    sys.modules.update(machine=machine, mcp7940=mcp7940, micropython=micropython)
+    sys.path.insert(0, os.path.join(ROOT, "pico"))
+    if not hasattr(time, "ticks_ms"):
+        # for switches.py, the ticks of micropython's time
+        import scheduler
+
+        for name in ("ticks_ms", "ticks_add", "ticks_diff"):
+            setattr(time, name, getattr(scheduler, name))
+    import benchmark
+
+    return benchmark
+
+
+def measure(function, iterations):
+    # ns per call, the fastest of REPEATS, and the most bytes allocated at once
+    best = None
+    for _ in range(REPEATS):
+        start = time.perf_counter_ns()
+        for _ in range(iterations):
+            function()
+        elapsed = time.perf_counter_ns() - start
+        start = time.perf_counter_ns()
+        for _ in range(iterations):
+            nothing()
+        elapsed -= time.perf_counter_ns() - start
+        best = elapsed if best is None else min(best, elapsed)
+
+    tracemalloc.start()
+    allocated = 0
+    try:
+        for _ in range(TRACED_CALLS):
+            tracemalloc.reset_peak()
+            before = tracemalloc.get_traced_memory()[0]
+            function()
+            allocated = max(allocated, tracemalloc.get_traced_memory()[1] - before)
+    finally:
+        tracemalloc.stop()
+    return max(0, best) // iterations, allocated
+
+
+def nothing():
+    pass
+
+
+def read_report(path):
+    # a baseline, or the json line of the output of pico/benchmark.py
+    with open(path) as file:
+        text = file.read()
+    try:
+        report = json.loads(text)
+    except ValueError:
+        lines = [line for line in text.splitlines() if line.startswith("{")]
+        if not lines:
+            raise ValueError(f"{path}: no results") from None
+        report = json.loads(lines[-1])
+    results = {name: tuple(result) for name, result in report["results"].items()}
+    return report["platform"], results
+
+
+def compare(results, baseline, threshold):
+    # returns the regressions, as lines
+    regressions = []
+    for name, (ns, allocated) in results.items():
+        if name not in baseline:
+            continue
+        base_ns, base_allocated = baseline[name]
+        if ns > base_ns * threshold:
+            regressions.append(f"{name}: {ns} ns/op, was {base_ns} ns/op")
+        if allocated > base_allocated:
+            regressions.append(f"{name}: {allocated} B/op, was {base_allocated} B/op")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument(
+        "--report", help="output of pico/benchmark.py, instead of running here"
+    )
+    parser.add_argument(
+        "--baseline", default=BASELINE, help="json baseline to compare with"
+    )
+    parser.add_argument(
+        "--save", action="store_true", help="keep the results as the baseline"
+    )
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        default=1.5,
+        help="slowdown that counts as a regression, 1.5 for 50%% (default)",
+    )
+    parser.add_argument("--iterations", type=int, default=10000, help="calls per case")
+    args = parser.parse_args()
+
+    benchmark = load_firmware()
+    if args.report:
+        platform, results = read_report(args.report)
+    else:
+        platform = sys.implementation.name
+        results = benchmark.run(lambda function: measure(function, args.iterations))
+    print(benchmark.report(results, platform))
+
+    if args.save or not os.path.exists(args.baseline):
+        with open(args.baseline, "w") as file:
+            json.dump({"platform": platform, "results": results}, file, indent=2)
+            file.write("\n")
+        print(f"saved as the baseline in {os.path.relpath(args.baseline)}")
+        return 0
+    base_platform, baseline = read_report(args.baseline)
+    if base_platform != platform:
+        print(f"the baseline is from {base_platform}, not {platform}")
+        return 1
+    regressions = compare(results, baseline, args.threshold)
+    for line in regressions:
+        print("regression:", line)
+    if not regressions:
+        print(f"no regressions against {os.path.relpath(args.baseline)}")
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,176 @@
+"""Time tools/analyse_drift.py on synthetic logs of clocks with known crystals.
+
+    python tools/benchmark_analyse_drift.py --clocks 5 --weeks 4
+
+Writes binary logs like pico/logger.py (a sample a minute, a file per run)
+and one serial text log like test_deviation.py into a scratch directory,
+analyses them and checks the recommended trims against the crystals.
+Needs NumPy.
+"""
+
+import argparse
+import os
+import shutil
+import struct
+import tempfile
+import time
+
+import numpy as np
+
+import analyse_drift
+from analyse_drift import (
+    BLOCK_MAGIC,
+    FILE_HEADER,
+    MAGIC,
+    RECORD,
+    STEP_PPM,
+    VERSION,
+    crc16,
+    trim_for,
+)
+
+BLOCK_SIZE = 256
+MAX_BLOCKS = 256  # data blocks per file, see Logger
+INTERVAL = 60  # s between samples
+TEMPERATURE_PPM = 0.5  # daily swing of the crystal
+
+
+def samples(crystal, trim, seconds, random):
+    # local & rtc seconds of a run, both whole seconds like the pico logs them
+    local = np.arange(0, seconds, INTERVAL, dtype=np.int64)
+    day = 2 * np.pi * local / 86400
+    ppm = (
+        crystal + trim * STEP_PPM + TEMPERATURE_PPM * np.sin(day + random.uniform(0, 6))
+    )
+    # integrate the rate, from a random phase within the first second
+    rtc = random.uniform(0, 1) + local + np.cumsum(ppm * INTERVAL / 1000000)
+    return local, np.floor(rtc).astype(np.int64)
+
+
+def write_binary(directory, sequence, local, rtc, trim):
+    per_block = (BLOCK_SIZE - 8) // RECORD.itemsize
+    records = np.zeros(len(local), RECORD)
+    records["timestamp"] = 1700000000 + local
+    records["local"] = local
+    records["rtc"] = rtc
+    records["trim"] = trim
+    count = -(-len(records) // per_block)
+    blocks = np.zeros((count, BLOCK_SIZE), np.uint8)
+    body = blocks[:, 8 : 8 + per_block * RECORD.itemsize]
+    padded = np.zeros(count * per_block, RECORD)
+    padded[: len(records)] = records
+    body[:] = padded.view(np.uint8).reshape(count, -1)
+    blocks[:, :2] = np.frombuffer(BLOCK_MAGIC, np.uint8)
+    counts = np.full(count, per_block, "<u2")
+    counts[-1] = len(records) - (count - 1) * per_block
+    blocks[:, 2:4] = counts.view(np.uint8).reshape(count, 2)
+    checksums = crc16(blocks[:, 8:]).astype("<u2")
+    blocks[:, 4:6] = checksums.view(np.uint8).reshape(count, 2)
+
+    paths = []
+    for start in range(0, count, MAX_BLOCKS):
+        header = struct.pack(
+            FILE_HEADER[:-1], MAGIC, VERSION, RECORD.itemsize, BLOCK_SIZE, sequence
+        )
+        checksum = int(crc16(np.frombuffer(header, np.uint8)[None, :])[0])
+        path = os.path.join(directory, f"drift-{sequence:04d}.bin")
+        with open(path, "wb") as file:
+            file.write((header + struct.pack("<H", checksum)).ljust(BLOCK_SIZE, b"\0"))
+            file.write(blocks[start : start + MAX_BLOCKS].tobytes())
+        paths.append(path)
+        sequence += 1
+    return paths
+
+
+def write_text(path, runs):
+    with open(path, "w") as file:
+        for local, rtc, trim in runs:
+            file.write(
+                f"START - sec local: 0, sec rtc: {rtc[0]}, "
+                f"delta (rtc_sec - local_sec): {rtc[0]}, trim: {trim}\n"
+            )
+            for local_sec, rtc_sec in zip(local[1:].tolist(), rtc[1:].tolist()):
+                ppm = (local_sec - rtc_sec) / local_sec * 1000000
+                trimval = ppm * (32768 * 60) / (1000000 * 2)
+                file.write(
+                    f"sec local: {local_sec}, sec rtc: {rtc_sec}, "
+                    f"delta (rtc_sec - local_sec): {rtc_sec - local_sec}, "
+                    f"ppm: {ppm}, trimval: {trimval}\n"
+                )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--clocks", type=int, default=5)
+    parser.add_argument("--weeks", type=float, default=4)
+    parser.add_argument("--runs", type=int, default=3, help="trim runs per clock")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--keep", action="store_true", help="keep the logs")
+    args = parser.parse_args()
+
+    random = np.random.default_rng(args.seed)
+    directory = tempfile.mkdtemp(prefix="drift-benchmark-")
+    seconds = int(args.weeks * 7 * 86400 / args.runs)
+    crystals = {}
+    paths = []
+    records = 0
+    for index in range(args.clocks):
+        clock = f"clock{index}"
+        os.mkdir(os.path.join(directory, clock))
+        crystal = random.uniform(-60, 60)
+        crystals[clock] = crystal
+        sequence = 0
+        text_runs = []
+        for run in range(args.runs):
+            # the first run untrimmed, then around the right trim
+            trim = 0 if run == 0 else trim_for(crystal) + int(random.integers(-5, 6))
+            local, rtc = samples(crystal, trim, seconds, random)
+            records += len(local)
+            if index == 0:
+                text_runs.append((local, rtc, trim))
+            written = write_binary(
+                os.path.join(directory, clock), sequence, local, rtc, trim
+            )
+            sequence += len(written)
+            paths += written
+        if index == 0:
+            # the same runs as captured serial output, as another clock
+            clock = "serial"
+            os.mkdir(os.path.join(directory, clock))
+            crystals[clock] = crystal
+            path = os.path.join(directory, clock, "serial.txt")
+            write_text(path, text_runs)
+            paths.append(path)
+            records += sum(len(run[0]) for run in text_runs)
+
+    size = sum(os.path.getsize(path) for path in paths)
+    start = time.perf_counter()
+    analysis = analyse_drift.Analysis()
+    analysis.read(paths)
+    results = list(analysis.recommendations())
+    elapsed = time.perf_counter() - start
+
+    print(
+        f"{records} samples of {len(crystals)} clocks over {args.weeks:g} weeks"
+        f" ({size / 1e6:.1f} MB) in {elapsed:.2f} s,"
+        f" {records / elapsed / 1e6:.1f} M samples/s"
+    )
+    misses = 0
+    for clock, crystal, error, _, trim, (low, high) in results:
+        expected = trim_for(crystals[clock])
+        within = low <= expected <= high
+        misses += not within
+        print(
+            f"{clock}: crystal {crystals[clock]:+.3f} ppm, fit {crystal:+.3f}"
+            f" +- {analyse_drift.Z95 * error:.3f}, trim {trim} ({low} to {high}),"
+            f" expected {expected} {'ok' if within else 'MISS'}"
+        )
+    if args.keep:
+        print(f"logs in {directory}")
+    else:
+        shutil.rmtree(directory)
+    raise SystemExit(1 if misses else 0)
+
+
+if __name__ == "__main__":
+    main()
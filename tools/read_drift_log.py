@@ -0,0 +1,81 @@
+"""Decode the drift logs written by pico/logger.py into csv rows.
+
+    python tools/read_drift_log.py drift-0000.bin drift-0001.bin > drift.csv
+
+Blocks with a bad checksum (e.g. torn by a power loss) are skipped with a
+warning on stderr.
+"""
+
+import struct
+import sys
+
+# see pico/logger.py
+MAGIC = b"DRFT"
+VERSION = 1
+FILE_HEADER = "<4sBBHIH"
+BLOCK_MAGIC = b"DB"
+BLOCK_HEADER = "<2sHH2x"
+RECORD = "<Iiib3x"
+
+# see pico/calibration.py
+MAX_TRIM = 127
+STEP_PPM = 2 / (32768 * 60) * 1000000
+
+COLUMNS = ("file", "timestamp", "local_seconds", "rtc_seconds", "trim", "ppm")
+
+
+def crc16(data, crc=0xFFFF):
+    # crc-16/ccitt-false, like pico/checksum.py
+    for byte in data:
+        crc ^= byte << 8
+        for _ in range(8):
+            crc = ((crc << 1) ^ 0x1021 if crc & 0x8000 else crc << 1) & 0xFFFF
+    return crc
+
+
+def read(path):
+    # yields (sequence, timestamp, local seconds, rtc seconds, trim)
+    with open(path, "rb") as file:
+        data = file.read()
+
+    header_size = struct.calcsize(FILE_HEADER)
+    magic, version, record_size, block_size, sequence, checksum = struct.unpack_from(
+        FILE_HEADER, data
+    )
+    if magic != MAGIC or crc16(data[: header_size - 2]) != checksum:
+        raise ValueError(f"{path}: not a drift log")
+    if version != VERSION or record_size != struct.calcsize(RECORD):
+        raise ValueError(f"{path}: unsupported version {version}")
+
+    block_header_size = struct.calcsize(BLOCK_HEADER)
+    for offset in range(block_size, len(data), block_size):
+        block = data[offset : offset + block_size]
+        if len(block) < block_size:
+            print(f"{path}: incomplete block at {offset}", file=sys.stderr)
+            break
+        magic, count, checksum = struct.unpack_from(BLOCK_HEADER, block)
+        if magic != BLOCK_MAGIC or crc16(block[block_header_size:]) != checksum:
+            print(f"{path}: bad block at {offset}", file=sys.stderr)
+            continue
+        for index in range(count):
+            yield (sequence,) + struct.unpack_from(
+                RECORD, block, block_header_size + index * record_size
+            )
+
+
+def main():
+    print(",".join(COLUMNS))
+    for path in sys.argv[1:]:
+        for sequence, timestamp, local_seconds, rtc_seconds, trim in read(path):
+            ppm = (
+                (local_seconds - rtc_seconds) / local_seconds * 1000000
+                if local_seconds
+                else 0.0
+            )
+            print(
+                f"{sequence},{timestamp},{local_seconds},{rtc_seconds},{trim},{ppm:.3f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,183 @@
+"""Set the time of the clock over its usb serial, compensating the latency.
+
+    python tools/timesync.py /dev/ttyACM0
+    python tools/timesync.py --reference /dev/ttyACM0   # ... and follow the drift
+    python tools/timesync.py --sim                      # the simulator, on a pty
+
+Exchanges ntp like timestamps with pico/timesync.py: every `sync` takes the
+host time t1 when it is sent, the pico's times t2 & t3 when it came in and
+was answered, and the host time t4 when the answer came back. The
+exchange with the shortest round trip (t4 - t1) - (t3 - t2) gives the
+offset ((t2 - t1) + (t3 - t4)) / 2 of the rtc, as the delays there and back
+were the most alike. If it is more than `--tolerance` ms, the rtc is stepped
+at the host's next second and the offset measured again.
+
+`--reference` also sends the offset left as a reference for the drift
+estimate, e.g. from cron every hour. `--sim` runs pico/main.py in the
+simulator in real time on a pty instead of talking to the clock. Exits with
+1 if the rtc is still off by more than the tolerance.
+"""
+
+import argparse
+import os
+import select
+import subprocess
+import sys
+import time
+import tty
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+EPOCH = 946684800  # 2000-01-01 in unix time, the pico's epoch
+LOCK_TIMEOUT = 30.0  # s to wait for the pico to lock to the rtc
+REPLY_TIMEOUT = 1.0  # s to wait for an answer
+SPACING = 0.05  # s between the exchanges
+
+# pico/main.py in the simulator, with the refresh of core 1 (the emulated pio
+# is slower than real time)
+SIMULATION = """
+import sys
+sys.path.insert(0, {root!r})
+from sim import Simulation
+simulation = Simulation(
+    start=(2024, 1, 1, 12, 0, 0),
+    realtime=True,
+    files={{"pio_refresh.py": "raise ImportError('not in real time')"}},
+)
+simulation.run("main.py", {seconds})
+"""
+
+
+class Port:
+    # lines to & from a serial port or pty
+    def __init__(self, fd):
+        self.fd = fd
+        self._buffer = b""
+
+    def write_line(self, line):
+        os.write(self.fd, line.encode() + b"\r\n")
+
+    def read_line(self, prefix, timeout):
+        # the next line starting with prefix (without it), None after timeout
+        deadline = time.monotonic() + timeout
+        while True:
+            while b"\n" in self._buffer:
+                line, self._buffer = self._buffer.split(b"\n", 1)
+                line = line.decode(errors="replace").strip()
+                if line.startswith(prefix):
+                    return line[len(prefix) :]
+            remaining = deadline - time.monotonic()
+            if remaining <= 0 or not select.select([self.fd], [], [], remaining)[0]:
+                return None
+            self._buffer += os.read(self.fd, 1024)
+
+
+def host_ms(utc):
+    # ms since 2000-01-01 00:00:00, in local time unless utc
+    zone = 0 if utc else time.localtime().tm_gmtoff
+    return time.time_ns() // 1000000 + (zone - EPOCH) * 1000
+
+
+def exchange(port, utc):
+    # (offset, round trip) in ms, None if the pico isn't locked to the rtc yet
+    t1 = host_ms(utc)
+    port.write_line(f"sync {t1}")
+    deadline = time.monotonic() + REPLY_TIMEOUT
+    while True:
+        reply = port.read_line("sync ", max(0, deadline - time.monotonic()))
+        t4 = host_ms(utc)
+        if reply is None:
+            raise TimeoutError("no answer to sync, is main.py running?")
+        words = reply.split()
+        if words[0] == "not":
+            return None
+        if int(words[0]) == t1:
+            break
+        # the answer to an earlier one that timed out
+    t2, t3 = int(words[1]), int(words[2])
+    return ((t2 - t1) + (t3 - t4)) / 2, (t4 - t1) - (t3 - t2)
+
+
+def measure(port, samples, utc):
+    # the (offset, round trip) of the exchange with the shortest round trip
+    results = []
+    deadline = time.monotonic() + LOCK_TIMEOUT
+    while len(results) < samples:
+        result = exchange(port, utc)
+        if result is not None:
+            results.append(result)
+        elif time.monotonic() > deadline:
+            raise TimeoutError("the pico didn't lock to the rtc")
+        time.sleep(SPACING)
+    return min(results, key=lambda result: result[1])
+
+
+def simulate(seconds):
+    # (pty, process) of the simulator, on the other end of the pty
+    pty, terminal = os.openpty()
+    tty.setraw(terminal)
+    process = subprocess.Popen(
+        [sys.executable, "-c", SIMULATION.format(root=ROOT, seconds=seconds)],
+        stdin=terminal,
+        stdout=terminal,
+        env=dict(os.environ, PYTHONUNBUFFERED="1"),
+    )
+    os.close(terminal)
+    return pty, process
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument(
+        "port", nargs="?", help="serial port of the clock, e.g. /dev/ttyACM0"
+    )
+    parser.add_argument("--sim", action="store_true", help="sync the simulator instead")
+    parser.add_argument(
+        "--samples", type=int, default=8, help="exchanges per measurement"
+    )
+    parser.add_argument(
+        "--tolerance", type=float, default=2.0, help="ms the rtc may be off (default 2)"
+    )
+    parser.add_argument(
+        "--utc", action="store_true", help="set utc instead of local time"
+    )
+    parser.add_argument(
+        "--reference",
+        action="store_true",
+        help="send the offset for the drift estimate",
+    )
+    args = parser.parse_args()
+    if args.sim == bool(args.port):
+        parser.error("give a port or --sim")
+
+    process = None
+    if args.sim:
+        fd, process = simulate(LOCK_TIMEOUT * 2)
+    else:
+        fd = os.open(args.port, os.O_RDWR | os.O_NOCTTY)
+        if os.isatty(fd):
+            tty.setraw(fd)
+    port = Port(fd)
+    try:
+        offset, delay = measure(port, args.samples, args.utc)
+        print(f"rtc ahead by {offset:.1f} ms, round trip {delay} ms")
+        if abs(offset) > args.tolerance:
+            port.write_line(f"step {round(offset)}")
+            reply = port.read_line("step ", 2 + REPLY_TIMEOUT)
+            if reply is None:
+                raise TimeoutError("no answer to step")
+            print("step", reply)
+            offset, delay = measure(port, args.samples, args.utc)
+            print(f"rtc ahead by {offset:.1f} ms, round trip {delay} ms")
+        if args.reference:
+            port.write_line(f"offset {round(offset)}")
+            print("drift", port.read_line("", REPLY_TIMEOUT))
+    finally:
+        os.close(fd)
+        if process is not None:
+            process.terminate()
+            process.wait()
+    return 0 if abs(offset) <= args.tolerance else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())